@@ -1,10 +1,7 @@
+import json
 import semantic_kernel as sk
 import asyncio
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery, VectorFilterMode
-from langchain_community.embeddings import AzureOpenAIEmbeddings
-from openai import AzureOpenAI
 from semantic_kernel.plugin_definition import kernel_function, kernel_function_context_parameter
 from semantic_kernel import KernelContext
 from semantic_kernel import Kernel, ContextVariables
@@ -14,6 +11,10 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+from plugins.AISearch.clients import get_search_client, get_search_executor
+from plugins.AISearch.embeddings import get_embedding_service
+from plugins.AISearch.fusion import FusionConfig, hybrid_search
+from plugins.AISearch.context_packer import get_context_packer
 
 AZURE_AISEARCH_ENDPOINT = os.getenv("AZURE_AISEARCH_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
@@ -21,7 +22,10 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 AZURE_OPENAI_EMBEDDINGS_MODEL_NAME = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NAME")
 AZURE_AISEARCH_INDEX_NAME = os.getenv("AZURE_AISEARCH_INDEX_NAME")
-credential = AzureKeyCredential(os.getenv("AZURE_AISEARCH_API_KEY"))
+AZURE_AISEARCH_API_KEY = os.getenv("AZURE_AISEARCH_API_KEY")
+
+# Hybrid ranking of both plugins: fused by Azure (default) or client-side, see AISEARCH_FUSION_* in fusion.FusionConfig
+AISEARCH_FUSION = FusionConfig.from_env("AISEARCH", top=4, list_size=5)
 
 
 class AISearch:
@@ -33,63 +37,11 @@ class AISearch:
     async def search(self, ask: str) -> str:
         try:
             def format_hybrid_search_results(hybrid_search_results):
-                formatted_results = [
-                    f"""ID: {result['Id']}
-                        Text: {result['Text']}
-                        ExternalSourceName: {result['ExternalSourceName']}
-                        Source: {result['Description']}
-                        AdditionalMetadata: {result['AdditionalMetadata']}
-                        """
-                    for result in hybrid_search_results
-                ]
-                formatted_string = ""
-                for i, doc in enumerate(formatted_results):
-                    # formatted_string += f"\n<document {i+1}>\n\n {doc}\n"
-                    formatted_string += f'\n""" {doc}\n"""\n\n'
-                return formatted_string
-
-            def generate_embeddings(text):
-                openai_client = AzureOpenAI(
-                    api_key=AZURE_OPENAI_API_KEY,
-                    api_version=AZURE_OPENAI_API_VERSION,
-                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-                )
-                embeddings = AzureOpenAIEmbeddings(
-                    azure_deployment="text-embedding-ada-002",
-                    openai_api_version=AZURE_OPENAI_API_VERSION,
-                    chunk_size=1000,
-                )
-
-                return (
-                    openai_client.embeddings.create(
-                        input=[text], model=AZURE_OPENAI_EMBEDDINGS_MODEL_NAME
-                    )
-                    .data[0]
-                    .embedding
-                )
-
-            search_client = SearchClient(
-                AZURE_AISEARCH_ENDPOINT, AZURE_AISEARCH_INDEX_NAME, credential=credential
-            )
-
-            vquery = generate_embeddings(ask)
-
-            vector_query = VectorizedQuery(
-                vector=vquery, k_nearest_neighbors=5, fields="Embedding"
-            )
-
-            results = search_client.search(
-                search_text=ask,
-                vector_queries=[vector_query],           
-                select=[
-                    "Text",
-                    "Id",
-                    "ExternalSourceName",
-                    "Description",
-                    "AdditionalMetadata",
-                ],
-                top=4,
-            )
+                # Fit the results into the prompt budget (context_packer) before formatting
+                hybrid_search_results = pack_hybrid_search_results([list(hybrid_search_results)])[0]
+                return "".join(format_hybrid_search_result(result) for result in hybrid_search_results)
+
+            results = await self.search_results(ask)
 
             results = format_hybrid_search_results(results)
 
@@ -99,6 +51,54 @@ class AISearch:
             print(f"Error: {e}")            
             raise e
 
+    async def search_results(self, ask: str):
+        """
+        Hybrid search for the ask; returns the ranked result dicts.
+        """
+        search_client = get_search_client(
+            AZURE_AISEARCH_ENDPOINT, AZURE_AISEARCH_INDEX_NAME, AZURE_AISEARCH_API_KEY
+        )
+
+        vquery = await get_embedding_service().embed(ask)
+
+        vector_query = VectorizedQuery(
+            vector=vquery, k_nearest_neighbors=5, fields="Embedding"
+        )
+
+        return hybrid_search(
+            search_client,
+            ask,
+            vector_query,
+            AISEARCH_FUSION,
+            select=[
+                "Text",
+                "Id",
+                "ExternalSourceName",
+                "Description",
+                "AdditionalMetadata",
+            ],
+            executor=get_search_executor(),
+        )
+
+def format_hybrid_search_result(result) -> str:
+    doc = f"""ID: {result['Id']}
+                Text: {result['Text']}
+                ExternalSourceName: {result['ExternalSourceName']}
+                Source: {result['Description']}
+                AdditionalMetadata: {result['AdditionalMetadata']}
+                """
+    return f'\n""" {doc}\n"""\n\n'
+
+
+def pack_hybrid_search_results(groups):
+    """
+    Fit groups of search results (one per filter) into the CONTEXT_MAX_TOKENS prompt budget:
+    duplicates dropped, the budget shared fairly between the groups, the last chunk cut at a sentence boundary.
+    """
+    packed, _ = get_context_packer().pack(groups, "Text", format_hybrid_search_result, source_field="ExternalSourceName")
+    return packed
+
+
 def build_query_filter(json_object):
     try:
         # Initialize a list to hold filter strings
@@ -148,6 +148,64 @@ def build_query_filter(json_object):
 
 
 class AISearchWF:
+    """
+    Hybrid search with metadata filter. The query vector can be passed in (context variable 'vector', JSON list)
+    and several filters can be searched in one call (context variable 'filters', JSON list), so a multi-company ask
+    is embedded once and fanned out to every filtered search.
+    """
+
+    # Auxiliary Functions
+
+    def format_hybrid_search_results(self, hybrid_search_results):
+        return "".join(format_hybrid_search_result(result) for result in hybrid_search_results)
+
+    def search_filter_results(self, ask, vector, metadata_filter):
+        """
+        Blocking hybrid search for one filter; returns the result dicts.
+        """
+        search_client = get_search_client(
+            AZURE_AISEARCH_ENDPOINT, AZURE_AISEARCH_INDEX_NAME, AZURE_AISEARCH_API_KEY
+        )
+
+        vector_query = VectorizedQuery(
+            vector=vector, k_nearest_neighbors=5, fields="Embedding"
+        )
+
+        # if metadata filter is none do not use filter!!!!!!!!!!
+
+        results = hybrid_search(
+            search_client,
+            ask,
+            vector_query,
+            AISEARCH_FUSION,
+            filter=metadata_filter,
+            select=[
+                "Text",
+                "Id",
+                "ExternalSourceName",
+                "Description",
+                "AdditionalMetadata",
+            ],
+            executor=get_search_executor(),
+        )
+
+        return results
+
+    async def search_filters(self, ask, filters, vector=None):
+        """
+        Search every filter with the same query vector, concurrently on the shared search pool.
+        The ask is embedded only if no vector is given. Results keep the order of `filters`, and all of them
+        together are packed into one prompt budget, shared fairly between the filters.
+        """
+        if vector is None:
+            vector = await get_embedding_service().embed(ask)
+        loop = asyncio.get_running_loop()
+        executor = get_search_executor()
+        groups = await asyncio.gather(
+            *(loop.run_in_executor(executor, self.search_filter_results, ask, vector, f) for f in filters)
+        )
+        formatted = [self.format_hybrid_search_results(results) for results in pack_hybrid_search_results(list(groups))]
+        return [results if results != '' else "No documents found" for results in formatted]
 
     @kernel_function(
         description="This function search for finance information stored in knowledge data base",
@@ -156,82 +214,22 @@ class AISearchWF:
     )
     @kernel_function_context_parameter(name="ask",description="Ask from the user")
     @kernel_function_context_parameter(name="filter",description="The filter to apply for the search")
+    @kernel_function_context_parameter(name="filters",description="Optional JSON list of filters to search in one call")
+    @kernel_function_context_parameter(name="vector",description="Optional JSON list with the precomputed embedding of the ask")
     async def searchwf(self, context: KernelContext) -> str:
 
         try:
-            
-            metadata_filter = str(context['filter'])
+
             ask = str(context['ask'])
+            vector = context.variables.get("vector")
+            vector = json.loads(vector) if vector else None
+            filters = context.variables.get("filters")
+            filters = json.loads(filters) if filters else [str(context['filter'])]
 
+            results = await self.search_filters(ask, filters, vector)
 
-            def format_hybrid_search_results(hybrid_search_results):
-                formatted_results = [
-                    f"""ID: {result['Id']}
-                        Text: {result['Text']}
-                        ExternalSourceName: {result['ExternalSourceName']}
-                        Source: {result['Description']}
-                        AdditionalMetadata: {result['AdditionalMetadata']}
-                        """
-                    for result in hybrid_search_results
-                ]
-                formatted_string = ""
-                for i, doc in enumerate(formatted_results):
-                    # formatted_string += f"\n<document {i+1}>\n\n {doc}\n"
-                    formatted_string += f'\n""" {doc}\n"""\n\n'
-                return formatted_string
-
-            def generate_embeddings(text):
-                openai_client = AzureOpenAI(
-                    api_key=AZURE_OPENAI_API_KEY,
-                    api_version=AZURE_OPENAI_API_VERSION,
-                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-                )
-                embeddings = AzureOpenAIEmbeddings(
-                    azure_deployment="text-embedding-ada-002",
-                    openai_api_version=AZURE_OPENAI_API_VERSION,
-                    chunk_size=1000,
-                )
-
-                return (
-                    openai_client.embeddings.create(
-                        input=[text], model=AZURE_OPENAI_EMBEDDINGS_MODEL_NAME
-                    )
-                    .data[0]
-                    .embedding
-                )
-
-            search_client = SearchClient(
-                AZURE_AISEARCH_ENDPOINT, AZURE_AISEARCH_INDEX_NAME, credential=credential
-            )
-
-            vquery = generate_embeddings(ask)
-
-            vector_query = VectorizedQuery(
-                vector=vquery, k_nearest_neighbors=5, fields="Embedding"
-            )
-
-            # if metadata filter is none do not use filter!!!!!!!!!!
-            
-            results = search_client.search(
-                search_text=ask,
-                vector_queries=[vector_query],
-                vector_filter_mode=VectorFilterMode.PRE_FILTER,
-                filter=metadata_filter,                
-                select=[
-                    "Text",
-                    "Id",
-                    "ExternalSourceName",
-                    "Description",
-                    "AdditionalMetadata",
-                ],
-                top=4,
-            )
+            return "".join(results)
 
-            results = format_hybrid_search_results(results)
-            
-            return "No documents found" if results == '' else results
-
-        
         except ValueError as e:
             print(f"Error: {e}")            
-            raise e
\ No newline at end of file
+            raise e
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+from plugins.AISearch.vsearch import VSearch
+from plugins.AISearch.semantic_cache import get_semantic_cache, scope_from_entities
+from plugins.registry import get_kernel, get_semantic_plugin
+
+# Document fields reported as sources
+CITATION_FIELDS = ["filename", "referenced_entity", "referenced_year", "referenced_location"]
+
+_vsearch: Optional[VSearch] = None
+
+
+def get_vsearch() -> VSearch:
+    global _vsearch
+    if _vsearch is None:
+        _vsearch = VSearch()
+    return _vsearch
+
+
+def elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+
+def citations_from_documents(documents) -> list:
+    """
+    One citation per distinct source document, in retrieval order.
+    """
+    citations = []
+    for document in documents or []:
+        for result in document.get("retrieved_info") or []:
+            citation = {field: result[field] for field in CITATION_FIELDS if result.get(field) is not None}
+            if citation and citation not in citations:
+                citations.append(citation)
+    return citations
+
+
+def consultant_context(ask: str, context: str):
+    kernel = get_kernel()
+    consultant_response = get_semantic_plugin("FinanceGenerator")["OneCompanyQuestion"]
+    my_context = kernel.create_new_context()
+    my_context["ask"] = ask
+    my_context["context"] = context
+    return kernel, consultant_response, my_context
+
+
+async def generate_answer(ask: str, context: str) -> str:
+    """
+    Run FinanceGenerator/OneCompanyQuestion on the ask and the retrieved context.
+    """
+    kernel, consultant_response, my_context = consultant_context(ask, context)
+    response = await kernel.run(consultant_response, input_context=my_context)
+    return response["input"]
+
+
+async def stream_generate_answer(ask: str, context: str) -> AsyncIterator[str]:
+    """
+    Same as generate_answer, yielding the answer chunks as the model produces them.
+    """
+    kernel, consultant_response, my_context = consultant_context(ask, context)
+    async for chunk in kernel.run_stream(consultant_response, input_context=my_context):
+        yield chunk
+
+
+async def retrieve_or_hit(ask: str, use_cache: bool = True) -> dict:
+    """
+    Shared first half of answer() and stream_answer(): extract entities while the ask is embedded, then either
+    find the ask in the semantic cache or retrieve documents. Returns {"entities", "scope", "vector", "hit", "retrieval"}.
+    """
+    vsearch = get_vsearch()
+    cache = get_semantic_cache()
+    state = {"hit": None, "retrieval": None, "vector": None}
+
+    embedding = asyncio.create_task(vsearch.generate_embeddings(ask))
+    state["entities"] = await vsearch.extract_entities({"input": {"ask": ask}})
+    state["scope"] = scope_from_entities(state["entities"])
+
+    if use_cache:
+        state["hit"] = cache.get_exact(state["scope"], ask)
+        if state["hit"] is not None:
+            # Not cancelled: the embedding may be shared with a concurrent ask; only its outcome is dropped
+            embedding.add_done_callback(lambda task: task.cancelled() or task.exception())
+            return state
+
+    state["vector"] = await embedding
+    if use_cache and state["vector"] is not None:
+        state["hit"] = cache.get(state["scope"], state["vector"])
+        if state["hit"] is not None:
+            return state
+
+    state["retrieval"] = await vsearch.retrieve(ask, entities=state["entities"], vector=state["vector"])
+    return state
+
+
+def remember(ask: str, state: dict, response: str):
+    """
+    Store a generated answer. Failed searches are not cached, so the next ask retries them.
+    """
+    retrieval = state["retrieval"]
+    failed = any("error" in document for document in retrieval["documents"])
+    if state["vector"] is None or not retrieval["documents"] or failed:
+        return
+    value = {"answer": response, "documents": retrieval["documents"], "filters": retrieval["filters"]}
+    get_semantic_cache().put(state["scope"], ask, state["vector"], value)
+
+
+async def answer(ask: str, score_include: bool = False, use_cache: bool = True) -> dict:
+    """
+    Retrieve documents for the ask (VSearch) and answer it with FinanceGenerator/OneCompanyQuestion,
+    behind the semantic cache. Returns {"answer", "context", "documents", "filters", "entities", "cached", "timings"}.
+    A cache hit (same scope, similar ask) skips Azure AI Search and the chat model; an ask already seen verbatim
+    is answered as soon as its entities are extracted, without waiting for the embedding.
+    """
+    started_at = time.perf_counter()
+    vsearch = get_vsearch()
+    state = await retrieve_or_hit(ask, use_cache)
+
+    if state["hit"] is not None:
+        value, timings = state["hit"], {}
+    else:
+        retrieval = state["retrieval"]
+        context = vsearch.format_search_results(retrieval["documents"], retrieval["filters"], score_include=score_include)
+        generation_start = time.perf_counter()
+        response = await generate_answer(ask, context)
+        timings = dict(retrieval["timings"])
+        timings["generate"] = {"duration_ms": elapsed_ms(generation_start)}
+        if use_cache:
+            remember(ask, state, response)
+        value = {"answer": response, "documents": retrieval["documents"], "filters": retrieval["filters"]}
+
+    context = vsearch.format_search_results(value["documents"], value["filters"], score_include=score_include)
+    timings["total"] = {"duration_ms": elapsed_ms(started_at)}
+    return {**value, "context": context, "entities": state["entities"], "cached": state["hit"] is not None, "timings": timings}
+
+
+async def stream_answer(ask: str, score_include: bool = False, use_cache: bool = True) -> AsyncIterator[dict]:
+    """
+    Streaming version of answer(). Yields events:
+        {"type": "citations", "citations": [...], "cached": bool, "timings": {...}}   once, as soon as retrieval is done
+        {"type": "token", "text": "..."}                                              for every answer chunk
+        {"type": "done", "answer": "...", "timings": {...}}                           once, at the end
+    so the first words reach the user after retrieval plus the first chunk instead of the full completion.
+    """
+    started_at = time.perf_counter()
+    vsearch = get_vsearch()
+    state = await retrieve_or_hit(ask, use_cache)
+    hit = state["hit"]
+    documents = hit["documents"] if hit is not None else state["retrieval"]["documents"]
+    timings = {} if hit is not None else dict(state["retrieval"]["timings"])
+    timings["retrieval"] = {"duration_ms": elapsed_ms(started_at)}
+
+    yield {"type": "citations", "citations": citations_from_documents(documents), "cached": hit is not None, "timings": dict(timings)}
+
+    if hit is not None:
+        yield {"type": "token", "text": hit["answer"]}
+        response = hit["answer"]
+    else:
+        retrieval = state["retrieval"]
+        context = vsearch.format_search_results(retrieval["documents"], retrieval["filters"], score_include=score_include)
+        chunks = []
+        async for chunk in stream_generate_answer(ask, context):
+            if not chunks:
+                timings["first_token"] = {"duration_ms": elapsed_ms(started_at)}
+            chunks.append(chunk)
+            yield {"type": "token", "text": chunk}
+        response = "".join(chunks)
+        if use_cache:
+            remember(ask, state, response)
+
+    timings["total"] = {"duration_ms": elapsed_ms(started_at)}
+    yield {"type": "done", "answer": response, "timings": timings}
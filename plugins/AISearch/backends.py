@@ -0,0 +1,571 @@
+import os
+import re
+import json
+import math
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from plugins.AISearch.fusion import fuse_positions
+from plugins.AISearch.bitmap_index import MetadataBitmapIndex
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Where open_local_index finds the indexes written by LocalSearchIndex.save (one directory per index name)
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(ROOT_DIR, ".cache", "indexes"))
+# Approximate kNN kicks in above this many documents (exact search below it)
+LOCAL_INDEX_IVF_MIN_DOCUMENTS = int(os.getenv("LOCAL_INDEX_IVF_MIN_DOCUMENTS", "20000"))
+LOCAL_INDEX_IVF_PROBES = int(os.getenv("LOCAL_INDEX_IVF_PROBES", "8"))
+
+# Same default page size as Azure AI Search
+DEFAULT_TOP = 50
+RRF_K = 60
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have", "how",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "which", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"[a-z0-9]+", str(text).lower()) if token not in STOPWORDS]
+
+
+class SearchBackend(ABC):
+    """
+    Retriever interface used by VSearch, AISearch and AISearchWF. It is the subset of
+    azure.search.documents.SearchClient the plugins call, so a SearchClient is itself a backend
+    (registered as a virtual subclass in clients.py):
+
+        search(search_text, vector_queries, filter, vector_filter_mode, select, top) -> iterable of dicts
+        upload_documents(documents)
+        delete_documents(documents)
+        close()
+    """
+    @abstractmethod
+    def search(self, search_text: Optional[str] = None, vector_queries: Optional[list] = None, filter: Optional[str] = None,
+               vector_filter_mode=None, select: Optional[List[str]] = None, top: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def upload_documents(self, documents: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def delete_documents(self, documents: List[Dict[str, Any]]):
+        ...
+
+    def close(self):
+        pass
+
+
+# Filters: the OData subset used by the plugins ----------------------------------------------------------
+
+FILTER_TOKEN = re.compile(r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+(?:\.\d+)?)|(?P<punct>[(),])|(?P<word>[A-Za-z_][\w./]*))")
+COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+class FilterParser:
+    """
+    Compile an OData filter ("referenced_entity eq 'MMM' and referenced_year eq '2021'") into a function
+    column accessor -> boolean numpy mask. Supports eq/ne/gt/ge/lt/le, and/or/not, parentheses,
+    search.in(field, 'a,b[,...]'[, ',']), null, true and false.
+    """
+    def __init__(self, expression: str):
+        self.tokens = self._tokenize(expression)
+        self.position = 0
+
+    @staticmethod
+    def _tokenize(expression: str):
+        tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = FILTER_TOKEN.match(expression, position)
+            if not match or match.end() == position:
+                raise ValueError(f"Invalid filter near: {expression[position:]!r}")
+            position = match.end()
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "string":
+                value = value[1:-1].replace("''", "'")
+            elif kind == "number":
+                value = float(value) if "." in value else int(value)
+            tokens.append((kind, value))
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _expect(self, value):
+        kind, token = self._next()
+        if token != value:
+            raise ValueError(f"Expected {value!r} in filter, got {token!r}")
+
+    def _literal(self):
+        kind, value = self._next()
+        if kind in ("string", "number"):
+            return value
+        if kind == "word" and value.lower() in ("null", "true", "false"):
+            return {"null": None, "true": True, "false": False}[value.lower()]
+        raise ValueError(f"Expected a literal in filter, got {value!r}")
+
+    def parse(self) -> Callable[[Callable[[str], np.ndarray]], np.ndarray]:
+        predicate = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token in filter: {self._peek()[1]!r}")
+        return predicate
+
+    def _or(self):
+        left = self._and()
+        while self._peek() == ("word", "or"):
+            self._next()
+            right = self._and()
+            left = (lambda l, r: lambda column: l(column) | r(column))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._peek() == ("word", "and"):
+            self._next()
+            right = self._not()
+            left = (lambda l, r: lambda column: l(column) & r(column))(left, right)
+        return left
+
+    def _not(self):
+        if self._peek() == ("word", "not"):
+            self._next()
+            inner = self._not()
+            return lambda column: ~inner(column)
+        return self._primary()
+
+    def _primary(self):
+        kind, value = self._next()
+        if (kind, value) == ("punct", "("):
+            inner = self._or()
+            self._expect(")")
+            return inner
+        if kind == "word" and value.lower() == "search.in":
+            self._expect("(")
+            _, field = self._next()
+            self._expect(",")
+            values = self._literal()
+            separator = ","
+            if self._peek() == ("punct", ","):
+                self._next()
+                separator = self._literal() or ","
+            self._expect(")")
+            allowed = [item.strip() if separator.strip() else item for item in str(values).split(separator)]
+            allowed = set(allowed)
+
+            def matches(cell):
+                # Collection fields match when any of their values is allowed
+                return bool(allowed.intersection(cell)) if isinstance(cell, (list, tuple)) else cell in allowed
+
+            return lambda column: np.fromiter((matches(cell) for cell in column(field)), dtype=bool, count=len(column(field)))
+        if kind == "word" and value.lower() in ("true", "false"):
+            constant = value.lower() == "true"
+            return lambda column: np.full(column(None).shape, constant)
+        if kind != "word":
+            raise ValueError(f"Expected a field name in filter, got {value!r}")
+        field = value
+        _, operator = self._next()
+        if operator not in COMPARISONS:
+            raise ValueError(f"Unsupported filter operator: {operator!r}")
+        literal = self._literal()
+        compare = COMPARISONS[operator]
+        if operator in ("eq", "ne"):
+            return lambda column: np.asarray(compare(column(field), literal), dtype=bool)
+        return lambda column: np.array(
+            [cell is not None and literal is not None and compare(cell, literal) for cell in column(field)], dtype=bool
+        )
+
+
+def compile_filter(expression: Optional[str]):
+    return FilterParser(expression).parse() if expression else None
+
+
+# BM25 ------------------------------------------------------------------------------------------------------
+
+class BM25Index:
+    """
+    Inverted index over the searchable text fields, scored with Okapi BM25.
+    Postings are compiled to numpy arrays (doc ids, term frequencies) on first search after a change.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)
+        self._compiled = {}
+        self._lengths = []
+
+    def add(self, text: str):
+        document = len(self._lengths)
+        tokens = tokenize(text)
+        self._lengths.append(len(tokens))
+        for token in tokens:
+            self._postings[token][document] = self._postings[token].get(document, 0) + 1
+        self._compiled = {}
+
+    def _compile(self):
+        if not self._compiled and self._postings:
+            self._compiled = {
+                term: (np.fromiter(postings.keys(), dtype=np.int64), np.fromiter(postings.values(), dtype=np.float32))
+                for term, postings in self._postings.items()
+            }
+            self._length_array = np.asarray(self._lengths, dtype=np.float32)
+            self._average_length = float(self._length_array.mean()) if len(self._lengths) else 0.0
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every document for the query (0 where no term matches).
+        """
+        self._compile()
+        scores = np.zeros(len(self._lengths), dtype=np.float32)
+        if not self._compiled:
+            return scores
+        n = len(self._lengths)
+        for term in set(tokenize(query)):
+            if term not in self._compiled:
+                continue
+            documents, frequencies = self._compiled[term]
+            idf = math.log(1 + (n - len(documents) + 0.5) / (len(documents) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._length_array[documents] / max(self._average_length, 1e-9))
+            scores[documents] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+        return scores
+
+
+# Vectors ---------------------------------------------------------------------------------------------------
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate kNN: k-means centroids over the unit vectors, and for every query only the
+    documents of the `probes` closest centroids are scored exactly.
+    """
+    def __init__(self, vectors: np.ndarray, lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        n = len(vectors)
+        lists = lists or max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, size=min(lists, n), replace=False)].astype(np.float32)
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = vectors[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = unit_rows(centroids)
+        self.centroids = centroids
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assignment == c) for c in range(len(centroids))]
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        closest = np.argsort(-(self.centroids @ query))[:probes]
+        return np.concatenate([self.lists[c] for c in closest])
+
+
+class LocalSearchIndex(SearchBackend):
+    """
+    In-process drop-in for an Azure AI Search index.
+    Documents are plain dicts; every vector field is one contiguous float32 matrix of unit rows (memory-mapped
+    when loaded from disk), text fields feed a BM25 inverted index, and filters use the same OData subset and
+    pre-/post-filter semantics as Azure. Hybrid queries fuse the text and vector rankings with RRF, like Azure.
+    """
+    def __init__(self, key_field: str = "id", vector_fields: Iterable[str] = ("embedding",), text_fields: Iterable[str] = ("document",),
+                 ivf_min_documents: int = LOCAL_INDEX_IVF_MIN_DOCUMENTS, ivf_probes: int = LOCAL_INDEX_IVF_PROBES):
+        self.key_field = key_field
+        self.vector_fields = list(vector_fields)
+        self.text_fields = list(text_fields)
+        self.ivf_min_documents = ivf_min_documents
+        self.ivf_probes = ivf_probes
+        self.documents: List[Dict[str, Any]] = []
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.bm25 = BM25Index()
+        self._columns = {}
+        self._ivf = {}
+        self._positions = {}
+        self._metadata = None
+
+    # Auxiliary Functions
+
+    def _column(self, field: Optional[str]) -> np.ndarray:
+        """
+        Metadata column as an object array (None where a document has no such field), built once per change.
+        """
+        if field is None:
+            return np.empty(len(self.documents), dtype=object)
+        if field not in self._columns:
+            column = np.empty(len(self.documents), dtype=object)
+            column[:] = [document.get(field) for document in self.documents]
+            self._columns[field] = column
+        return self._columns[field]
+
+    def _mask(self, filter: Optional[str]) -> Optional[np.ndarray]:
+        predicate = compile_filter(filter)
+        return predicate(self._column) if predicate else None
+
+    def _vector_scores(self, vector_query, mask: Optional[np.ndarray]):
+        """
+        Cosine scores of the candidate documents (all, or the IVF probes) that pass `mask`: (candidates, scores).
+        A pre-filter that keeps fewer than `ivf_min_documents` documents is scanned exactly: probing the IVF lists
+        first would leave few of its documents to score.
+        """
+        field = getattr(vector_query, "fields", None) or self.vector_fields[0]
+        matrix = self.vectors.get(field)
+        if matrix is None or not len(matrix):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(vector_query.vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        if mask is not None:
+            selected = np.flatnonzero(mask)
+            if len(selected) < self.ivf_min_documents:
+                return selected, np.asarray(matrix[selected]) @ query
+
+        candidates = np.arange(len(matrix))
+        if len(matrix) >= self.ivf_min_documents:
+            if field not in self._ivf:
+                self._ivf[field] = IVFIndex(np.asarray(matrix))
+            candidates = self._ivf[field].candidates(query, self.ivf_probes)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        return candidates, np.asarray(matrix[candidates]) @ query
+
+    @staticmethod
+    def _top(candidates: np.ndarray, scores: np.ndarray, k: int) -> List[int]:
+        if not len(candidates):
+            return []
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        return [int(i) for i in candidates[best[np.argsort(-scores[best])]]]
+
+    def _vector_ranking(self, vector_query, mask: Optional[np.ndarray], post_filter: bool) -> List[int]:
+        k = getattr(vector_query, "k_nearest_neighbors", None) or DEFAULT_TOP
+        candidates, scores = self._vector_scores(vector_query, None if post_filter else mask)
+        ranking = self._top(candidates, scores, k)
+        if mask is not None and post_filter:
+            ranking = [i for i in ranking if mask[i]]
+        return ranking
+
+    def _text_ranking(self, search_text: str, mask: Optional[np.ndarray], top: int) -> List[int]:
+        scores = self.bm25.scores(search_text)
+        if mask is not None:
+            scores = np.where(mask, scores, 0)
+        matching = np.flatnonzero(scores > 0)
+        return [int(i) for i in matching[np.argsort(-scores[matching])][:top]]
+
+    def _invalidate(self):
+        self._columns = {}
+        self._ivf = {}
+        self._metadata = None
+
+    @property
+    def metadata(self) -> MetadataBitmapIndex:
+        """
+        Bitmap index of the metadata fields, built on first use after a change.
+        """
+        if self._metadata is None:
+            self._metadata = MetadataBitmapIndex.from_documents(self.documents)
+        return self._metadata
+
+    # Main functions
+
+    def upload_documents(self, documents: List[Dict[str, Any]]):
+        """
+        Add or replace documents (by key). Vectors are normalized for cosine similarity.
+        """
+        new_rows = {field: [] for field in self.vector_fields}
+        # A key repeated within the batch: the last document wins
+        batch = {document.get(self.key_field): document for document in documents}
+        # Replacing documents rebuilds the text index once per call; the common path (new keys) is append-only
+        replacing = any(key in self._positions for key in batch)
+        for key, document in batch.items():
+            document = dict(document)
+            if key in self._positions:
+                self._replace(self._positions[key], document)
+                continue
+            vectors = {field: document.pop(field, None) for field in self.vector_fields}
+            self._positions[key] = len(self.documents)
+            self.documents.append(document)
+            if not replacing:
+                self.bm25.add(self._text(document))
+            for field, vector in vectors.items():
+                new_rows[field].append(vector)
+        if replacing:
+            self._rebuild_bm25()
+        for field, rows in new_rows.items():
+            existing = self.vectors.get(field)
+            dimensions = existing.shape[1] if existing is not None else len(next((row for row in rows if row is not None), []))
+            if not rows or not dimensions:
+                continue
+            # Documents without a vector (or uploaded before the field had one) get a zero row, which never matches
+            missing = len(self.documents) - len(rows) - (len(existing) if existing is not None else 0)
+            rows = [None] * missing + rows
+            block = unit_rows(np.asarray([row if row is not None else np.zeros(dimensions) for row in rows], dtype=np.float32))
+            self.vectors[field] = np.vstack([existing, block]) if existing is not None else block
+        self._invalidate()
+        return [{"key": document.get(self.key_field), "succeeded": True} for document in documents]
+
+    def delete_documents(self, documents: List[Dict[str, Any]]):
+        """
+        Remove documents by key (only the key field of each document is read); unknown keys are ignored.
+        """
+        removed = {self._positions[document.get(self.key_field)] for document in documents if document.get(self.key_field) in self._positions}
+        if removed:
+            keep = [i for i in range(len(self.documents)) if i not in removed]
+            self.documents = [self.documents[i] for i in keep]
+            self.vectors = {field: np.asarray(matrix)[keep] for field, matrix in self.vectors.items()}
+            self._positions = {document.get(self.key_field): i for i, document in enumerate(self.documents)}
+            self._rebuild_bm25()
+            self._invalidate()
+        return [{"key": document.get(self.key_field), "succeeded": True} for document in documents]
+
+    def _replace(self, position: int, document: Dict[str, Any]):
+        for field in self.vector_fields:
+            vector = document.pop(field, None)
+            if vector is not None and field in self.vectors:
+                if not self.vectors[field].flags.writeable:
+                    self.vectors[field] = np.array(self.vectors[field])
+                self.vectors[field][position] = unit_rows(np.asarray([vector], dtype=np.float32))[0]
+        self.documents[position] = document
+
+    def _text(self, document: Dict[str, Any]) -> str:
+        return " ".join(str(document.get(field) or "") for field in self.text_fields)
+
+    def _rebuild_bm25(self):
+        self.bm25 = BM25Index()
+        for document in self.documents:
+            self.bm25.add(self._text(document))
+
+    def search(self, search_text: Optional[str] = None, vector_queries: Optional[list] = None, filter: Optional[str] = None,
+               vector_filter_mode=None, select: Optional[List[str]] = None, top: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Same arguments and result shape as SearchClient.search: dicts with the selected fields and "@search.score".
+        """
+        top = top or DEFAULT_TOP
+        mask = self._mask(filter)
+        post_filter = str(getattr(vector_filter_mode, "value", vector_filter_mode) or "preFilter") == "postFilter"
+
+        rankings = [self._vector_ranking(vector_query, mask, post_filter) for vector_query in vector_queries or []]
+        if search_text and search_text != "*":
+            rankings.append(self._text_ranking(search_text, mask, max(top, DEFAULT_TOP)))
+
+        if not rankings:
+            ordered = [(int(i), 1.0) for i in (np.flatnonzero(mask) if mask is not None else range(len(self.documents)))]
+        else:
+            # Reciprocal rank fusion of the text and vector rankings
+            ordered = fuse_positions(rankings, len(self.documents), RRF_K)
+
+        return [self._result(i, score, select) for i, score in ordered[:top]]
+
+    def search_groups(self, search_text: Optional[str], vector_query, groups: Dict[Any, np.ndarray],
+                      select: Optional[List[str]] = None, top: Optional[int] = None) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        Hybrid search of several filters in one pass: `groups` maps a label to a packed bitmap (MetadataBitmapIndex).
+        Vector and text scores are computed once over the union of the groups; every group then gets its own
+        top results, fused with RRF, so a multi-ticker ask still returns documents for each ticker.
+        """
+        top = top or DEFAULT_TOP
+        metadata = self.metadata
+        masks = {label: metadata.mask(bitmap) for label, bitmap in groups.items()}
+        union = np.logical_or.reduce(list(masks.values())) if masks else np.zeros(len(self.documents), dtype=bool)
+
+        candidates, vector_scores = (
+            self._vector_scores(vector_query, union) if vector_query is not None else (np.empty(0, dtype=np.int64), None)
+        )
+        k = getattr(vector_query, "k_nearest_neighbors", None) or DEFAULT_TOP
+        text_scores = self.bm25.scores(search_text) if search_text and search_text != "*" else None
+
+        results = {}
+        for label, mask in masks.items():
+            rankings = []
+            if vector_scores is not None:
+                in_group = mask[candidates]
+                rankings.append(self._top(candidates[in_group], vector_scores[in_group], k))
+            if text_scores is not None:
+                matching = np.flatnonzero(mask & (text_scores > 0))
+                rankings.append([int(i) for i in matching[np.argsort(-text_scores[matching])][: max(top, DEFAULT_TOP)]])
+            ordered = fuse_positions(rankings, len(self.documents), RRF_K) if rankings else [(int(i), 1.0) for i in np.flatnonzero(mask)]
+            results[label] = [self._result(i, score, select) for i, score in ordered[:top]]
+        return results
+
+    def search_entities(self, search_text: Optional[str], vector_query, entities: Optional[dict],
+                        select: Optional[List[str]] = None, top: Optional[int] = None) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        search_groups() with one group per extracted ticker, constrained by the location(s) and every year of the dates interval.
+        """
+        return self.search_groups(search_text, vector_query, self.metadata.groups(entities), select=select, top=top)
+
+    def _result(self, position: int, score: float, select: Optional[List[str]]) -> Dict[str, Any]:
+        document = self.documents[position]
+        result = {field: document.get(field) for field in select} if select else dict(document)
+        result["@search.score"] = score
+        return result
+
+    def save(self, directory: str):
+        """
+        Write documents.jsonl, one <field>.npy float32 matrix per vector field and index.json (schema).
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "documents.jsonl"), "w", encoding="utf-8") as file:
+            for document in self.documents:
+                file.write(json.dumps(document, ensure_ascii=False) + "\n")
+        for field, matrix in self.vectors.items():
+            np.save(os.path.join(directory, f"{field}.npy"), np.asarray(matrix, dtype=np.float32))
+        schema = {"key_field": self.key_field, "vector_fields": self.vector_fields, "text_fields": self.text_fields}
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as file:
+            json.dump(schema, file, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, **kwargs) -> "LocalSearchIndex":
+        """
+        Load an index written by save(). With mmap=True the vector matrices are memory-mapped, not read into memory.
+        """
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as file:
+            schema = json.load(file)
+        index = cls(schema["key_field"], schema["vector_fields"], schema["text_fields"], **kwargs)
+        with open(os.path.join(directory, "documents.jsonl"), encoding="utf-8") as file:
+            for line in file:
+                document = json.loads(line)
+                index._positions[document.get(index.key_field)] = len(index.documents)
+                index.documents.append(document)
+                index.bm25.add(index._text(document))
+        for field in index.vector_fields:
+            path = os.path.join(directory, f"{field}.npy")
+            if os.path.exists(path):
+                index.vectors[field] = np.load(path, mmap_mode="r" if mmap else None)
+        return index
+
+
+def local_index_path(index_name: str) -> str:
+    return os.path.join(LOCAL_INDEX_DIR, index_name)
+
+
+def open_local_index(index_name: str) -> LocalSearchIndex:
+    """
+    The local index saved under LOCAL_INDEX_DIR/<index_name>, or an empty one to upload documents into.
+    """
+    directory = local_index_path(index_name)
+    if os.path.exists(os.path.join(directory, "index.json")):
+        return LocalSearchIndex.load(directory)
+    print(f"Local index not found at {directory}, starting empty")
+    return LocalSearchIndex()
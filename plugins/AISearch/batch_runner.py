@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Runner knobs, overridable from .env
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "120"))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "2"))
+BATCH_RETRY_BACKOFF = float(os.getenv("BATCH_RETRY_BACKOFF", "2"))
+
+# Where the id and the question of an input line are looked up, in order (FinanceBench, requests.jsonl, ...)
+ID_FIELDS = ["id", "request_id", "financebench_id", "question_id"]
+QUESTION_FIELDS = ["question", "ask", "query", "body"]
+
+WorkerFn = Callable[[str], Awaitable[Any]]
+
+
+def first_present(row: Dict[str, Any], fields: List[str]) -> Optional[Any]:
+    for field in fields:
+        if row.get(field) not in (None, ""):
+            return row[field]
+    return None
+
+
+def read_questions(path: str, id_field: Optional[str] = None, question_field: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream {"id", "question", "row"} from a JSONL file without loading it; lines without an id use their line number.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            question_id = row.get(id_field) if id_field else first_present(row, ID_FIELDS)
+            question = row.get(question_field) if question_field else first_present(row, QUESTION_FIELDS)
+            yield {"id": str(question_id if question_id is not None else line_number), "question": question, "row": row}
+
+
+def answered_ids(path: str) -> set:
+    """
+    Ids already answered in an output file. Failed lines are retried, and a line cut by a crash is ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict) and "error" not in row and row.get("id") is not None:
+                done.add(str(row["id"]))
+    return done
+
+
+class BatchRunner:
+    """
+    Answer a JSONL of questions with a bounded pool of async workers.
+
+    Every result is appended to `output_path` as one JSON line as soon as it completes, so a crash loses
+    at most the questions in flight, and a restart skips the ids already answered. A failed question is
+    retried `retries` times with exponential backoff (throttling) and otherwise written with an "error".
+    """
+    def __init__(
+        self,
+        worker: WorkerFn,
+        output_path: str,
+        concurrency: int = BATCH_CONCURRENCY,
+        timeout: float = BATCH_TIMEOUT,
+        retries: int = BATCH_RETRIES,
+        backoff: float = BATCH_RETRY_BACKOFF,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        progress_every: int = 50,
+    ):
+        self.worker = worker
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.progress = progress
+        self.progress_every = progress_every
+        self.stats = {"answered": 0, "failed": 0, "skipped": 0, "retries": 0, "seconds": 0.0, "questions_per_second": 0.0}
+        self._started_at = None
+        self._file = None
+
+    # Auxiliary Functions
+
+    def _open_output(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        # A crash can leave a cut last line: start on a fresh line so the next result stays parseable
+        needs_newline = False
+        if os.path.exists(self.output_path) and os.path.getsize(self.output_path) > 0:
+            with open(self.output_path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) != b"\n"
+        self._file = open(self.output_path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def _write(self, row: Dict[str, Any]):
+        self._file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def _update_throughput(self):
+        self.stats["seconds"] = round(time.perf_counter() - self._started_at, 2)
+        done = self.stats["answered"] + self.stats["failed"]
+        self.stats["questions_per_second"] = round(done / self.stats["seconds"], 2) if self.stats["seconds"] else 0.0
+
+    async def _answer(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                result = await asyncio.wait_for(self.worker(item["question"]), self.timeout)
+                return {"id": item["id"], "question": item["question"], "result": result,
+                        "duration_ms": round((time.perf_counter() - started_at) * 1000, 2), "attempts": attempt + 1}
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                if attempt < self.retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        return {"id": item["id"], "question": item["question"], "error": error,
+                "duration_ms": round((time.perf_counter() - started_at) * 1000, 2), "attempts": self.retries + 1}
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row = await self._answer(item)
+            self._write(row)
+            self.stats["failed" if "error" in row else "answered"] += 1
+            done = self.stats["answered"] + self.stats["failed"]
+            if self.progress is not None and done % self.progress_every == 0:
+                self._update_throughput()
+                self.progress(dict(self.stats))
+
+    # Main functions
+
+    async def run(self, questions) -> Dict[str, Any]:
+        """
+        Answer every question (an iterable of {"id", "question"}) not answered in the output file yet.
+        """
+        done = answered_ids(self.output_path)
+        self._started_at = time.perf_counter()
+        self._open_output()
+        # Small queue: the input is streamed, never loaded whole
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._work(queue)) for _ in range(self.concurrency)]
+        try:
+            for item in questions:
+                if item["id"] in done:
+                    self.stats["skipped"] += 1
+                    continue
+                if not item.get("question"):
+                    self._write({"id": item["id"], "question": item.get("question"), "error": "No question"})
+                    self.stats["failed"] += 1
+                    continue
+                # Do not answer an id twice when the input repeats it
+                done.add(item["id"])
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._file.close()
+        self._update_throughput()
+        return self.stats
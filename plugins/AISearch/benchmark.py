@@ -0,0 +1,225 @@
+import os
+import json
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from plugins.AISearch.context_packer import count_tokens, shingles
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# FinanceBench open source set (question, doc_name, evidence[{evidence_text, evidence_page_num}]) or the same shape
+BENCH_QUESTIONS = os.getenv("BENCH_QUESTIONS", os.path.join(ROOT_DIR, "data", "financebench_open_source.jsonl"))
+BENCH_KS = [int(k) for k in os.getenv("BENCH_KS", "1,3,5,10").split(",")]
+# A chunk holds a piece of evidence when it contains this share of the evidence's word 5-grams
+BENCH_EVIDENCE_OVERLAP = float(os.getenv("BENCH_EVIDENCE_OVERLAP", "0.3"))
+
+# Where the document name and the text of a result live, in the vsearch and aisearch schemas
+DOCUMENT_FIELDS = ["filename", "ExternalSourceName", "doc_name", "source"]
+TEXT_FIELDS = ["document", "Text", "text", "content"]
+
+# A strategy answers one question with {"results": ranked dicts, "context": prompt text, "timings": {stage: ms}}
+StrategyFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def document_name(value) -> str:
+    """
+    Comparable document name: '/filings/3M_2018_10K.pdf' and '3m_2018_10k' are the same document.
+    """
+    name = os.path.basename(str(value or "")).strip()
+    return os.path.splitext(name)[0].upper()
+
+
+def first_field(result: Dict[str, Any], fields: List[str]) -> str:
+    for field in fields:
+        if result.get(field):
+            return str(result[field])
+    return ""
+
+
+def load_questions(path: str = BENCH_QUESTIONS) -> List[Dict[str, Any]]:
+    """
+    Read a labeled question set (JSONL or a JSON list) into [{"id", "question", "evidence": [{"doc", "text", "page"}]}].
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        content = file.read()
+    rows = json.loads(content) if content.lstrip().startswith("[") else [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    questions = []
+    for position, row in enumerate(rows):
+        evidence = []
+        for item in row.get("evidence") or []:
+            evidence.append({
+                "doc": document_name(item.get("doc_name") or row.get("doc_name")),
+                "text": item.get("evidence_text") or item.get("text") or "",
+                "page": item.get("evidence_page_num", item.get("page")),
+            })
+        if not evidence and row.get("doc_name"):
+            evidence.append({"doc": document_name(row["doc_name"]), "text": "", "page": None})
+        questions.append({"id": row.get("financebench_id") or row.get("id") or str(position), "question": row["question"], "evidence": evidence})
+    return questions
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))], 2)
+
+
+def stage_durations(timings: Dict[str, Any]) -> Dict[str, float]:
+    """
+    {stage: ms} from Pipeline.timings ({"duration_ms": ...}, total as {"end_ms": ...}) or plain numbers.
+    """
+    durations = {}
+    for stage, value in (timings or {}).items():
+        if isinstance(value, dict):
+            value = value.get("duration_ms", value.get("end_ms"))
+        if isinstance(value, (int, float)):
+            durations[stage] = float(value)
+    return durations
+
+
+class EvidenceMatcher:
+    """
+    Decides whether a retrieved chunk holds a piece of evidence: same document, and (when the label has
+    an evidence text) at least `overlap` of the evidence's word 5-grams in the chunk.
+    """
+    def __init__(self, overlap: float = BENCH_EVIDENCE_OVERLAP):
+        self.overlap = overlap
+        self._signatures = {}
+
+    def _signature(self, text: str) -> set:
+        signature = self._signatures.get(text)
+        if signature is None:
+            signature = self._signatures[text] = shingles(text)
+        return signature
+
+    def matches(self, result: Dict[str, Any], evidence: Dict[str, Any]) -> bool:
+        if evidence["doc"] and document_name(first_field(result, DOCUMENT_FIELDS)) != evidence["doc"]:
+            return False
+        if not evidence["text"]:
+            return True
+        expected = self._signature(evidence["text"])
+        return bool(expected) and len(expected & shingles(first_field(result, TEXT_FIELDS))) >= self.overlap * len(expected)
+
+    def score(self, results: List[Dict[str, Any]], evidence: List[Dict[str, Any]], ks: List[int]) -> Dict[str, float]:
+        """
+        recall@k (share of the evidence found in the top k) and reciprocal rank of the first relevant result.
+        """
+        found_at = {}
+        first_relevant = None
+        for rank, result in enumerate(results, start=1):
+            for index, item in enumerate(evidence):
+                if index not in found_at and self.matches(result, item):
+                    found_at[index] = rank
+                    first_relevant = first_relevant or rank
+        scores = {f"recall@{k}": sum(rank <= k for rank in found_at.values()) / len(evidence) if evidence else 0.0 for k in ks}
+        scores["rr"] = 1.0 / first_relevant if first_relevant else 0.0
+        return scores
+
+
+class RetrievalBenchmark:
+    """
+    Run a labeled question set through several retrieval strategies and report, per strategy:
+    recall@k, MRR, latency percentiles per stage, tokens of context handed to the model and embedding calls per question.
+
+    `embedding_calls` returns a running count of embedding requests; the benchmark reports its increase per question.
+    """
+    def __init__(
+        self,
+        strategies: Dict[str, StrategyFn],
+        ks: List[int] = BENCH_KS,
+        matcher: Optional[EvidenceMatcher] = None,
+        counter: Callable[[str], int] = count_tokens,
+        embedding_calls: Optional[Callable[[], int]] = None,
+    ):
+        self.strategies = strategies
+        self.ks = ks
+        self.matcher = matcher or EvidenceMatcher()
+        self.counter = counter
+        self.embedding_calls = embedding_calls
+
+    # Auxiliary Functions
+
+    async def _run_question(self, strategy: StrategyFn, question: Dict[str, Any]) -> Dict[str, Any]:
+        calls_before = self.embedding_calls() if self.embedding_calls else 0
+        started_at = time.perf_counter()
+        try:
+            output = await strategy(question["question"])
+        except Exception as e:
+            print(f"Error occurred while retrieving for question {question['id']}: {e}")
+            return {"id": question["id"], "error": str(e)}
+        total_ms = (time.perf_counter() - started_at) * 1000
+
+        results = list(output.get("results") or [])
+        timings = stage_durations(output.get("timings"))
+        timings["total"] = total_ms
+        row = {
+            "id": question["id"],
+            **self.matcher.score(results, question["evidence"], self.ks),
+            "timings": timings,
+            "context_tokens": self.counter(output.get("context") or ""),
+            "results": len(results),
+        }
+        if self.embedding_calls:
+            row["embedding_calls"] = self.embedding_calls() - calls_before
+        return row
+
+    def summarize(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        scored = [row for row in rows if "error" not in row]
+        summary = {"questions": len(rows), "errors": len(rows) - len(scored)}
+        if not scored:
+            return summary
+        for k in self.ks:
+            summary[f"recall@{k}"] = round(sum(row[f"recall@{k}"] for row in scored) / len(scored), 4)
+        summary["mrr"] = round(sum(row["rr"] for row in scored) / len(scored), 4)
+
+        stages = defaultdict(list)
+        for row in scored:
+            for stage, ms in row["timings"].items():
+                stages[stage].append(ms)
+        summary["latency_ms"] = {
+            stage: {f"p{q}": percentile(values, q) for q in (50, 95, 99)} for stage, values in stages.items()
+        }
+        tokens = [row["context_tokens"] for row in scored]
+        summary["context_tokens"] = {"mean": round(sum(tokens) / len(tokens), 1), "p95": percentile(tokens, 95)}
+        if self.embedding_calls:
+            summary["embedding_calls_per_question"] = round(sum(row["embedding_calls"] for row in scored) / len(scored), 2)
+        return summary
+
+    # Main functions
+
+    async def run(self, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Questions are asked one at a time, so latencies are not skewed by the other strategies.
+        Returns {"strategies": {name: summary}, "questions": {name: [per-question rows]}}.
+        """
+        report = {"strategies": {}, "questions": {}}
+        for name, strategy in self.strategies.items():
+            rows = [await self._run_question(strategy, question) for question in questions]
+            report["questions"][name] = rows
+            report["strategies"][name] = self.summarize(rows)
+        return report
+
+
+def format_report(report: Dict[str, Any], ks: List[int] = BENCH_KS) -> str:
+    """
+    One line per strategy with the quality, latency, context and embedding figures.
+    """
+    header = ["strategy", *[f"R@{k}" for k in ks], "MRR", "p50 ms", "p95 ms", "ctx tok", "emb/q", "err"]
+    lines = [header]
+    for name, summary in report["strategies"].items():
+        total = summary.get("latency_ms", {}).get("total", {})
+        lines.append([
+            name,
+            *[f"{summary.get(f'recall@{k}', 0):.2f}" for k in ks],
+            f"{summary.get('mrr', 0):.3f}",
+            f"{total.get('p50', 0):.0f}",
+            f"{total.get('p95', 0):.0f}",
+            f"{summary.get('context_tokens', {}).get('mean', 0):.0f}",
+            str(summary.get("embedding_calls_per_question", "-")),
+            str(summary["errors"]),
+        ])
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in lines)
@@ -0,0 +1,144 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Metadata fields of the VSearch index, and the entity keys they are filtered by
+ENTITY_FIELD = "referenced_entity"
+YEAR_FIELD = "referenced_year"
+LOCATION_FIELD = "referenced_location"
+METADATA_FIELDS = (ENTITY_FIELD, YEAR_FIELD, LOCATION_FIELD)
+# Filter on the country of the ask too. Off by default: filings are not tagged with the countries asks name
+# ("Adobe's revenue in Italy" is in a 10-K without referenced_location 'IT'), so the filter would drop them.
+VSEARCH_LOCATION_FILTER = os.getenv("VSEARCH_LOCATION_FILTER", "false").lower() in ("1", "true", "yes")
+
+
+def years_from_dates(dates) -> List[str]:
+    """
+    Every year of the extracted interval: ["2015-01-01", "2017-12-31"] -> ["2015", "2016", "2017"].
+    """
+    years = []
+    for date in dates or []:
+        try:
+            years.append(int(str(date)[:4]))
+        except ValueError:
+            continue
+    if not years:
+        return []
+    return [str(year) for year in range(min(years), max(years) + 1)]
+
+
+def locations_from_entities(entities: dict) -> List[str]:
+    # The prompt names the key "location", the local extractor "country"
+    locations = entities.get("location") or entities.get("country") or []
+    return [locations] if isinstance(locations, str) else list(locations)
+
+
+class MetadataBitmapIndex:
+    """
+    Inverted index of metadata values. Filters become bitwise OR within a field and AND across fields on packed
+    bitmaps (np.packbits, one bit per document position), evaluated once for the whole ask before the kNN scan
+    instead of one OData search per ticker.
+
+    Like the array/bitmap containers of Roaring bitmaps, each (field, value) is stored in the smaller of two forms:
+    a packed bitmap (N/8 bytes) for common values (years, countries) or its sorted int32 positions (4 bytes per
+    document) for rare ones (most tickers), which are expanded only when a filter uses them.
+    """
+    def __init__(self, fields: Iterable[str] = METADATA_FIELDS, filter_locations: bool = VSEARCH_LOCATION_FILTER):
+        self.fields = list(fields)
+        self.filter_locations = filter_locations
+        self.size = 0
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {field: {} for field in self.fields}
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict[str, Any]], fields: Iterable[str] = METADATA_FIELDS) -> "MetadataBitmapIndex":
+        index = cls(fields)
+        index.size = len(documents)
+        for field in index.fields:
+            positions: Dict[str, List[int]] = {}
+            for position, document in enumerate(documents):
+                values = document.get(field)
+                # Collection fields set the bit of every value they hold
+                for value in values if isinstance(values, (list, tuple)) else [values]:
+                    if value is not None:
+                        positions.setdefault(str(value), []).append(position)
+            for value, rows in positions.items():
+                if 4 * len(rows) < (index.size + 7) // 8:
+                    index.bitmaps[field][value] = np.asarray(rows, dtype=np.int32)
+                else:
+                    index.bitmaps[field][value] = index.pack(rows)
+        return index
+
+    def nbytes(self) -> int:
+        return sum(stored.nbytes for values in self.bitmaps.values() for stored in values.values())
+
+    # Bitmap algebra
+
+    def pack(self, positions) -> np.ndarray:
+        bits = np.zeros(self.size, dtype=bool)
+        bits[positions] = True
+        return np.packbits(bits)
+
+    def empty(self) -> np.ndarray:
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def full(self) -> np.ndarray:
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def value(self, field: str, value) -> np.ndarray:
+        stored = self.bitmaps.get(field, {}).get(str(value))
+        if stored is None:
+            return self.empty()
+        return stored if stored.dtype == np.uint8 else self.pack(stored)
+
+    def any_of(self, field: str, values: Iterable) -> np.ndarray:
+        stored = [self.bitmaps.get(field, {}).get(str(value)) for value in values]
+        # Positions of the sparse values are merged first and packed once
+        bitmaps = [bitmap for bitmap in stored if bitmap is not None and bitmap.dtype == np.uint8]
+        positions = [rows for rows in stored if rows is not None and rows.dtype != np.uint8]
+        if positions:
+            bitmaps.append(self.pack(np.concatenate(positions)))
+        return np.bitwise_or.reduce(bitmaps) if bitmaps else self.empty()
+
+    def all_of(self, bitmaps: List[np.ndarray]) -> np.ndarray:
+        return np.bitwise_and.reduce(bitmaps) if bitmaps else self.full()
+
+    def mask(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmap, count=self.size).astype(bool)
+
+    def count(self, bitmap: np.ndarray) -> int:
+        return int(np.unpackbits(bitmap, count=self.size).sum())
+
+    # Entities
+
+    def constraints(self, entities: Optional[dict]) -> List[np.ndarray]:
+        """
+        One bitmap per constrained field except the ticker: every year of the dates interval (OR) and,
+        with `filter_locations`, the locations (OR).
+        """
+        if not isinstance(entities, dict):
+            return []
+        constraints = []
+        locations = locations_from_entities(entities) if self.filter_locations else []
+        if locations:
+            constraints.append(self.any_of(LOCATION_FIELD, locations))
+        years = years_from_dates(entities.get("dates"))
+        if years:
+            constraints.append(self.any_of(YEAR_FIELD, years))
+        return constraints
+
+    def groups(self, entities: Optional[dict]) -> Dict[Optional[str], np.ndarray]:
+        """
+        {ticker: bitmap of its matching documents}, or {None: bitmap} when the ask names no ticker.
+        The union of the groups is the multi-ticker OR filter; each group keeps its own top-k in the scan.
+        """
+        shared = self.all_of(self.constraints(entities))
+        tickers = [ticker.upper() for ticker in (entities or {}).get("ticker") or []] if isinstance(entities, dict) else []
+        if not tickers:
+            return {None: shared}
+        return {ticker: self.value(ENTITY_FIELD, ticker) & shared for ticker in dict.fromkeys(tickers)}
+
+    def for_entities(self, entities: Optional[dict]) -> np.ndarray:
+        return np.bitwise_or.reduce(list(self.groups(entities).values()))
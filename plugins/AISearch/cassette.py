@@ -0,0 +1,238 @@
+import io
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# "live" (default), "record" (call Azure and save every exchange) or "replay" (answer from the cassette, no network)
+GENAI_SERVICE_MODE = os.getenv("GENAI_SERVICE_MODE", "live").lower()
+GENAI_CASSETTE = os.getenv("GENAI_CASSETTE", os.path.join(ROOT_DIR, ".cache", "cassettes", "genai.jsonl"))
+# Replay only: simulated service latency and failures
+GENAI_FAKE_LATENCY_MS = float(os.getenv("GENAI_FAKE_LATENCY_MS", "0"))
+GENAI_FAKE_JITTER_MS = float(os.getenv("GENAI_FAKE_JITTER_MS", "0"))
+GENAI_FAKE_ERROR_RATE = float(os.getenv("GENAI_FAKE_ERROR_RATE", "0"))
+GENAI_FAKE_ERROR_STATUS = int(os.getenv("GENAI_FAKE_ERROR_STATUS", "503"))
+GENAI_FAKE_SEED = int(os.getenv("GENAI_FAKE_SEED", "0"))
+
+# Placeholders so clients can be built in replay mode without any Azure settings
+REPLAY_ENDPOINT = "https://replay.invalid"
+REPLAY_API_KEY = "replay"
+REPLAY_API_VERSION = "2023-05-15"
+
+# Never part of the request key (and never written to the cassette)
+SECRET_PARAMS = {"api-key", "api_key", "code", "sig"}
+# Describe the body as received; it is stored and replayed decoded
+ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def decoded_headers(headers) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in ENCODING_HEADERS}
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """
+    Host-independent key of a request: method, path, query without secrets, and the body with JSON keys sorted,
+    so recordings replay against any endpoint and regardless of how the client ordered its JSON.
+    """
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query) if name.lower() not in SECRET_PARAMS)
+    body = body or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{method.upper()} {parts.path}?{query}\n".encode("utf-8") + body)
+    return digest.hexdigest()
+
+
+class Cassette:
+    """
+    Recorded HTTP exchanges (JSONL, one per line), shared by the OpenAI and Azure AI Search clients.
+
+    In replay mode every request is answered from the cassette after `latency_ms` (+ uniform `jitter_ms`),
+    a fraction `error_rate` of them fails with `error_status`, and a request never recorded gets a 404.
+    The random draws come from `seed`, so a benchmark replays the same latencies and failures every run.
+    """
+    def __init__(
+        self,
+        path: str = GENAI_CASSETTE,
+        mode: str = GENAI_SERVICE_MODE,
+        latency_ms: float = GENAI_FAKE_LATENCY_MS,
+        jitter_ms: float = GENAI_FAKE_JITTER_MS,
+        error_rate: float = GENAI_FAKE_ERROR_RATE,
+        error_status: int = GENAI_FAKE_ERROR_STATUS,
+        seed: int = GENAI_FAKE_SEED,
+    ):
+        self.path = path
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0, "injected_errors": 0}
+        self._random = random.Random(seed)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # The first recording of a request wins, so replays are deterministic
+                        self._entries.setdefault(entry["key"], entry)
+
+    # Auxiliary Functions
+
+    def _draw(self):
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+        return delay, failed
+
+    # Main functions
+
+    def record(self, method: str, url: str, body: Optional[bytes], status: int, headers: Dict[str, str], content: bytes):
+        """
+        Save a successful exchange; failures (throttling, outages) are not worth replaying.
+        """
+        if status >= 400:
+            return
+        key = request_key(method, url, body)
+        entry = {
+            "key": key,
+            "method": method.upper(),
+            "path": urlsplit(url).path,
+            "status": status,
+            "content_type": headers.get("content-type", "application/json"),
+            "body": content.decode("utf-8", errors="replace"),
+        }
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+            self.stats["recorded"] += 1
+
+    def replay(self, method: str, url: str, body: Optional[bytes]):
+        """
+        Return (delay seconds, status, content type, body bytes) for a request.
+        """
+        delay, failed = self._draw()
+        if failed:
+            self.stats["injected_errors"] += 1
+            return delay, self.error_status, "application/json", json.dumps({"error": {"code": "InjectedFailure", "message": "Injected failure"}}).encode("utf-8")
+        entry = self._entries.get(request_key(method, url, body))
+        if entry is None:
+            self.stats["misses"] += 1
+            message = f"No recording for {method.upper()} {urlsplit(url).path} in {self.path}"
+            return delay, 404, "application/json", json.dumps({"error": {"code": "NotRecorded", "message": message}}).encode("utf-8")
+        self.stats["hits"] += 1
+        return delay, entry["status"], entry["content_type"], entry["body"].encode("utf-8")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Transports: httpx (openai clients, semantic-kernel services) and requests (azure-search-documents)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.BaseTransport] = None):
+        self.cassette = cassette
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        if self.cassette.mode == "replay":
+            delay, status, content_type, content = self.cassette.replay(request.method, str(request.url), body)
+            time.sleep(delay)
+            return httpx.Response(status, headers={"content-type": content_type}, content=content, request=request)
+        response = self.transport.handle_request(request)
+        content = response.read()
+        self.cassette.record(request.method, str(request.url), body, response.status_code, response.headers, content)
+        return httpx.Response(response.status_code, headers=decoded_headers(response.headers), content=content, request=request)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        if self.cassette.mode == "replay":
+            delay, status, content_type, content = self.cassette.replay(request.method, str(request.url), body)
+            await asyncio.sleep(delay)
+            return httpx.Response(status, headers={"content-type": content_type}, content=content, request=request)
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        self.cassette.record(request.method, str(request.url), body, response.status_code, response.headers, content)
+        return httpx.Response(response.status_code, headers=decoded_headers(response.headers), content=content, request=request)
+
+    async def aclose(self):
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self, cassette: Cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        if self.cassette.mode != "replay":
+            response = super().send(request, **kwargs)
+            self.cassette.record(request.method, request.url, body, response.status_code, response.headers, response.content)
+            return response
+        delay, status, content_type, content = self.cassette.replay(request.method, request.url, body)
+        time.sleep(delay)
+        # A urllib3 response, so the requests.Response is the same as one read from a socket
+        raw = HTTPResponse(
+            body=io.BytesIO(content), headers={"content-type": content_type, "content-length": str(len(content))},
+            status=status, reason="OK" if status < 400 else "Error", preload_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    The process-wide cassette when GENAI_SERVICE_MODE is record or replay, None when live.
+    """
+    global _cassette
+    if GENAI_SERVICE_MODE not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        _cassette = Cassette()
+    return _cassette
+
+
+def replay_settings(api_key=None, endpoint=None, api_version=None):
+    """
+    Fill missing Azure settings with placeholders in replay mode (no .env needed offline).
+    """
+    if GENAI_SERVICE_MODE != "replay":
+        return api_key, endpoint, api_version
+    return api_key or REPLAY_API_KEY, endpoint or REPLAY_ENDPOINT, api_version or REPLAY_API_VERSION
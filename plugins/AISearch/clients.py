@@ -0,0 +1,259 @@
+import os
+import atexit
+import asyncio
+import weakref
+import threading
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from dotenv import load_dotenv
+from plugins.AISearch.backends import SearchBackend, open_local_index
+from plugins.AISearch.cassette import AsyncCassetteTransport, CassetteAdapter, CassetteTransport, get_cassette, replay_settings
+
+load_dotenv()
+
+# SearchClient has every SearchBackend method; the plugins use both interchangeably
+SearchBackend.register(SearchClient)
+
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+
+# Pool sizing, overridable from .env
+CLIENT_MAX_CONNECTIONS = int(os.getenv("CLIENT_MAX_CONNECTIONS", "20"))
+CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CLIENT_MAX_KEEPALIVE_CONNECTIONS", "10"))
+CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("CLIENT_KEEPALIVE_EXPIRY", "30"))
+CLIENT_TIMEOUT = float(os.getenv("CLIENT_TIMEOUT", "60"))
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "8"))
+# "azure" or "local" (in-process LocalSearchIndex loaded from LOCAL_INDEX_DIR/<index name>)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "azure").lower()
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of Azure OpenAI and Azure AI Search clients.
+    Every client is created once per (endpoint, index/version, key) and keeps its HTTP connection pool alive,
+    so retrieval plugins stop paying a TLS handshake and a new pool on every question.
+    With GENAI_SERVICE_MODE=record or replay, every client goes through the cassette (see cassette.py).
+    """
+    def __init__(
+        self,
+        max_connections: int = CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = CLIENT_KEEPALIVE_EXPIRY,
+        timeout: float = CLIENT_TIMEOUT,
+        search_max_workers: int = SEARCH_MAX_WORKERS,
+        search_backend: str = SEARCH_BACKEND,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.search_max_workers = search_max_workers
+        self.search_backend = search_backend
+        self._executor = None
+        self._clients = {}
+        # Client key -> weak reference to the event loop an async client is bound to
+        self._loops = {}
+        self._lock = threading.Lock()
+
+    # Auxiliary Functions
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _transport(self) -> Optional[httpx.BaseTransport]:
+        cassette = get_cassette()
+        if cassette is None:
+            return None
+        return CassetteTransport(cassette, httpx.HTTPTransport(limits=self._limits()))
+
+    def _async_transport(self) -> Optional[httpx.AsyncBaseTransport]:
+        cassette = get_cassette()
+        if cassette is None:
+            return None
+        return AsyncCassetteTransport(cassette, httpx.AsyncHTTPTransport(limits=self._limits()))
+
+    def _get_or_create(self, key, factory):
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            # Another thread may have created it while we were waiting
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+            return client
+
+    def _drop_closed_loops(self, loop: asyncio.AbstractEventLoop):
+        """
+        Forget the async clients of event loops that are gone (every asyncio.run() makes a new loop), and of a dead
+        loop whose id the running `loop` reuses, so their pools are garbage collected instead of kept forever.
+        """
+        with self._lock:
+            for key, owner in list(self._loops.items()):
+                owner_loop = owner()
+                if owner_loop is None or owner_loop.is_closed() or (key[-1] == id(loop) and owner_loop is not loop):
+                    del self._loops[key]
+                    self._clients.pop(key, None)
+
+    # Clients
+
+    def openai(self, api_key=None, azure_endpoint=None, api_version=None) -> AzureOpenAI:
+        """
+        Return the shared synchronous AzureOpenAI client for the given endpoint.
+        """
+        api_key, azure_endpoint, api_version = replay_settings(
+            api_key or AZURE_OPENAI_API_KEY, azure_endpoint or AZURE_OPENAI_ENDPOINT, api_version or AZURE_OPENAI_API_VERSION
+        )
+        return self._get_or_create(
+            ("openai", azure_endpoint, api_version, api_key),
+            lambda: AzureOpenAI(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=azure_endpoint,
+                http_client=httpx.Client(limits=self._limits(), timeout=self.timeout, transport=self._transport()),
+            ),
+        )
+
+    def async_openai(self, api_key=None, azure_endpoint=None, api_version=None) -> AsyncAzureOpenAI:
+        """
+        Return the shared AsyncAzureOpenAI client for the given endpoint and the running event loop.
+        Async connection pools are bound to the loop that opened them, so each loop gets its own client.
+        """
+        api_key, azure_endpoint, api_version = replay_settings(
+            api_key or AZURE_OPENAI_API_KEY, azure_endpoint or AZURE_OPENAI_ENDPOINT, api_version or AZURE_OPENAI_API_VERSION
+        )
+        loop = asyncio.get_running_loop()
+        self._drop_closed_loops(loop)
+        key = ("async_openai", azure_endpoint, api_version, api_key, id(loop))
+        client = self._get_or_create(
+            key,
+            lambda: AsyncAzureOpenAI(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=azure_endpoint,
+                http_client=httpx.AsyncClient(limits=self._limits(), timeout=self.timeout, transport=self._async_transport()),
+            ),
+        )
+        self._loops.setdefault(key, weakref.ref(loop))
+        return client
+
+    def search(self, endpoint: str, index_name: str, api_key: str) -> SearchBackend:
+        """
+        Return the shared SearchClient for the given endpoint and index,
+        or the in-process LocalSearchIndex of that index when SEARCH_BACKEND=local.
+        """
+        if self.search_backend == "local":
+            return self._get_or_create(("local_search", index_name), lambda: open_local_index(index_name))
+
+        api_key, endpoint, _ = replay_settings(api_key, endpoint)
+
+        def factory():
+            session = requests.Session()
+            cassette = get_cassette()
+            if cassette is not None:
+                adapter = CassetteAdapter(cassette, pool_connections=1, pool_maxsize=self.max_connections)
+            else:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            transport = RequestsTransport(
+                session=session,
+                session_owner=True,
+                connection_timeout=self.timeout,
+                read_timeout=self.timeout,
+            )
+            return SearchClient(endpoint, index_name, credential=AzureKeyCredential(api_key), transport=transport)
+
+        return self._get_or_create(("search", endpoint, index_name, api_key), factory)
+
+    def search_executor(self) -> ThreadPoolExecutor:
+        """
+        Return the bounded thread pool used to run blocking SearchClient queries concurrently.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.search_max_workers, thread_name_prefix="aisearch"
+                    )
+        return self._executor
+
+    def _shutdown_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def aclose(self):
+        """
+        Close every pooled client from inside a running event loop.
+        """
+        self._shutdown_executor()
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._loops.clear()
+        for client in clients:
+            try:
+                if isinstance(client, AsyncAzureOpenAI):
+                    await client.close()
+                else:
+                    client.close()
+            except Exception as e:
+                print(f"Error closing client {type(client).__name__}: {e}")
+
+    def close(self):
+        """
+        Close every pooled client. Safe to call more than once.
+        """
+        self._shutdown_executor()
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._loops.clear()
+        for client in clients:
+            try:
+                if isinstance(client, AsyncAzureOpenAI):
+                    # Outside of any loop (e.g. at exit) the async pool is closed on a throwaway loop
+                    asyncio.run(client.close())
+                else:
+                    client.close()
+            except Exception as e:
+                print(f"Error closing client {type(client).__name__}: {e}")
+
+
+registry = ClientRegistry()
+atexit.register(registry.close)
+
+
+def get_openai_client(api_key=None, azure_endpoint=None, api_version=None) -> AzureOpenAI:
+    return registry.openai(api_key=api_key, azure_endpoint=azure_endpoint, api_version=api_version)
+
+
+def get_async_openai_client(api_key=None, azure_endpoint=None, api_version=None) -> AsyncAzureOpenAI:
+    return registry.async_openai(api_key=api_key, azure_endpoint=azure_endpoint, api_version=api_version)
+
+
+def get_search_client(endpoint: str, index_name: str, api_key: str) -> SearchBackend:
+    return registry.search(endpoint, index_name, api_key)
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    return registry.search_executor()
+
+
+def close_clients():
+    registry.close()
@@ -0,0 +1,227 @@
+import os
+import re
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:
+    # Without tiktoken, tokens are approximated with TOKEN_PATTERN
+    tiktoken = None
+
+load_dotenv()
+
+# Packing knobs, overridable from .env
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+# A chunk is dropped when this share of its word 5-grams is already in the context
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# A chunk is only truncated (instead of dropped) if at least this many tokens of it fit
+CONTEXT_MIN_TRUNCATED_TOKENS = int(os.getenv("CONTEXT_MIN_TRUNCATED_TOKENS", "40"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+
+# Close to cl100k_base on English filings: words, numbers in groups of 3 digits, punctuation
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]*(?:[.!?]+|\n+|$)\s*")
+WORD_PATTERN = re.compile(r"\w+")
+SHINGLE_SIZE = 5
+# Overlapping chunks (ingestion overlap) are detected on a prefix of this many characters
+OVERLAP_PROBE = 40
+
+_encoding = None
+
+
+def get_encoding():
+    """
+    The CONTEXT_TOKENIZER tiktoken encoding, or None without tiktoken or if the encoding cannot be loaded
+    (tiktoken downloads it on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+            except Exception as e:
+                print(f"Error occurred while loading the {CONTEXT_TOKENIZER} encoding, tokens are approximated: {e}")
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens of `text` with the local tiktoken encoding, or the regex approximation without it.
+    """
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_PATTERN.findall(text) if sentence]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, counter: Callable[[str], int] = count_tokens) -> str:
+    """
+    The longest run of whole leading sentences of `text` within `max_tokens` ("" if not even the first fits).
+    """
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = counter(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept).rstrip()
+
+
+def shingles(text: str) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def trim_overlap(previous: str, text: str) -> str:
+    """
+    Drop the start of `text` that repeats the end of `previous` (consecutive chunks of one filing overlap).
+    """
+    probe = text[:OVERLAP_PROBE]
+    if len(probe) < OVERLAP_PROBE:
+        return text
+    start = previous.find(probe, max(0, len(previous) - len(text)))
+    while start != -1:
+        if text.startswith(previous[start:]):
+            return text[len(previous) - start:].lstrip()
+        start = previous.find(probe, start + 1)
+    return text
+
+
+def fair_shares(demands: List[int], budget: int) -> List[int]:
+    """
+    Max-min fair split of `budget`: every group gets an equal share, and what a group does not need
+    is shared again among the groups that need more.
+    """
+    shares = [0] * len(demands)
+    open_groups = [i for i, demand in enumerate(demands) if demand > 0]
+    while open_groups and budget > 0:
+        share = budget // len(open_groups)
+        if share == 0:
+            break
+        still_open = []
+        for i in open_groups:
+            grant = min(share, demands[i] - shares[i])
+            shares[i] += grant
+            budget -= grant
+            if shares[i] < demands[i]:
+                still_open.append(i)
+        if len(still_open) == len(open_groups):
+            break
+        open_groups = still_open
+    return shares
+
+
+class ContextPacker:
+    """
+    Fit retrieved chunks into a prompt budget of `max_tokens`:
+
+        1. dedup: drop chunks mostly contained in a chunk already kept (word 5-grams), and trim
+           the part of a chunk that repeats the end of the previous chunk of the same file;
+        2. allocate: split the budget fairly (max-min) between groups, e.g. one group per ticker,
+           so one verbose company cannot crowd out the others;
+        3. truncate: keep chunks in rank order while they fit, and cut the first one that does not
+           at a sentence boundary.
+
+    pack() returns the packed groups with the stats of that call, so a shared packer can serve concurrent requests.
+    """
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_MAX_TOKENS,
+        dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+        min_truncated_tokens: int = CONTEXT_MIN_TRUNCATED_TOKENS,
+        counter: Callable[[str], int] = count_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.min_truncated_tokens = min_truncated_tokens
+        self.counter = counter
+
+    # Auxiliary Functions
+
+    def _dedup(self, groups: List[List[Dict[str, Any]]], text_field: str, source_field: Optional[str], stats: Dict[str, int]) -> List[List[Dict[str, Any]]]:
+        kept_shingles = []
+        last_text_by_source = {}
+        deduped = [[] for _ in groups]
+        # Rank-major order: the best chunk of every group is seen before any group's second chunk
+        for rank in range(max((len(group) for group in groups), default=0)):
+            for index, group in enumerate(groups):
+                if rank >= len(group):
+                    continue
+                item = dict(group[rank])
+                text = str(item.get(text_field) or "")
+                source = item.get(source_field) if source_field else None
+                if source is not None and source in last_text_by_source:
+                    text = trim_overlap(last_text_by_source[source], text)
+                signature = shingles(text)
+                if signature and any(len(signature & seen) >= self.dedup_threshold * len(signature) for seen in kept_shingles):
+                    stats["duplicates"] += 1
+                    continue
+                kept_shingles.append(signature)
+                if source is not None:
+                    last_text_by_source[source] = text
+                item[text_field] = text
+                deduped[index].append(item)
+        return deduped
+
+    # Main functions
+
+    def pack(
+        self,
+        groups: List[List[Dict[str, Any]]],
+        text_field: str,
+        render: Callable[[Dict[str, Any]], str],
+        source_field: Optional[str] = None,
+    ) -> Tuple[List[List[Dict[str, Any]]], Dict[str, int]]:
+        """
+        Return copies of `groups` (lists of result dicts in rank order) whose rendered size fits the budget,
+        and the stats of this call ({"tokens_in", "tokens_out", "duplicates", "truncated", "dropped"}).
+        `render` turns a result into the text sent to the model; only `text_field` is ever shortened.
+        """
+        stats = {"tokens_in": 0, "tokens_out": 0, "duplicates": 0, "truncated": 0, "dropped": 0}
+        groups = self._dedup(groups, text_field, source_field, stats)
+        costs = [[self.counter(render(item)) for item in group] for group in groups]
+        stats["tokens_in"] = sum(map(sum, costs))
+        shares = fair_shares([sum(group_costs) for group_costs in costs], self.max_tokens)
+
+        packed = []
+        for group, group_costs, share in zip(groups, costs, shares):
+            kept = []
+            remaining = share
+            for position, (item, cost) in enumerate(zip(group, group_costs)):
+                if cost <= remaining:
+                    kept.append(item)
+                    remaining -= cost
+                    continue
+                overhead = cost - self.counter(str(item.get(text_field) or ""))
+                room = remaining - overhead
+                text = truncate_to_tokens(str(item.get(text_field) or ""), room, self.counter) if room >= self.min_truncated_tokens else ""
+                if text:
+                    kept.append({**item, text_field: text})
+                    remaining -= self.counter(render(kept[-1]))
+                    stats["truncated"] += 1
+                stats["dropped"] += len(group) - position - (1 if text else 0)
+                break
+            stats["tokens_out"] += share - remaining
+            packed.append(kept)
+        return packed, stats
+
+
+_packer: Optional[ContextPacker] = None
+
+
+def get_context_packer() -> ContextPacker:
+    global _packer
+    if _packer is None:
+        _packer = ContextPacker()
+    return _packer
@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cache knobs, overridable from .env. An empty EMBEDDING_CACHE_PATH keeps the cache in memory only.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(ROOT_DIR, ".cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "2048"))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "200000"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a text so trivially different asks share one cache entry:
+    unicode NFKC, case folding, collapsed whitespace and no trailing punctuation.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by deployment name + normalized text.
+    An in-memory LRU answers hot asks; a SQLite file (float32 blobs) survives restarts and is shared by workers.
+    Both tiers are size bounded and `stats` counts hits per tier and misses.
+    Reads never write to disk: the access time of disk hits is recorded with the next put_many, one transaction per batch.
+    Vectors are returned as new lists, so a caller changing one cannot corrupt the cache.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        max_memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+        max_disk_entries: int = EMBEDDING_CACHE_DISK_ENTRIES,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        # Keys read from disk since the last write, with their access time
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts_since_trim = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT, vector BLOB, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+            self._db.commit()
+
+    # Auxiliary Functions
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x1f{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector):
+        self._memory[key] = tuple(vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _flush_touched(self):
+        # Access times of disk hits, written in the caller's transaction
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            self._db.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(at, key) for key, at in touched.items()])
+
+    def _trim_disk(self, puts: int = 1):
+        # Amortized: only count rows every few hundred writes
+        self._puts_since_trim += puts
+        if self._puts_since_trim < 256:
+            return
+        self._puts_since_trim = 0
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            self.stats["evictions"] += excess
+
+    # Main functions
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return list(vector)
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array.array("f", row[0]).tolist()
+                    self._touched[key] = time.time()
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, model: str, text: str, vector: List[float]):
+        self.put_many(model, {text: vector})
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """
+        Store several embeddings of one model in a single transaction (one commit per embedding batch).
+        """
+        now = time.time()
+        rows = [(self.make_key(model, text), model, array.array("f", vector).tobytes(), now) for text, vector in vectors.items()]
+        with self._lock:
+            for (key, _, _, _), vector in zip(rows, vectors.values()):
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)", rows
+                )
+                self._flush_touched()
+                self._trim_disk(len(rows))
+                self._db.commit()
+
+    def get_or_compute(self, model: str, text: str, compute) -> List[float]:
+        """
+        Synchronous helper for callers that embed with a blocking client.
+        """
+        vector = self.get(model, text)
+        if vector is None:
+            vector = compute(text)
+            self.put(model, text, vector)
+        return vector
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush_touched()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache shared by every retrieval plugin.
+    """
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
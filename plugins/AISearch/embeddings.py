@@ -0,0 +1,141 @@
+import os
+import asyncio
+import weakref
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+from plugins.AISearch.clients import get_async_openai_client
+from plugins.AISearch.embedding_cache import EmbeddingCache, get_embedding_cache
+
+AZURE_OPENAI_EMBEDDINGS_MODEL_NAME = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NAME")
+
+# Batching knobs, overridable from .env
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "16"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+
+class _LoopState:
+    """Pending requests and in-flight limit of one event loop."""
+
+    def __init__(self, max_concurrency: int):
+        self.pending = []
+        self.timer = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.tasks = set()
+
+
+class EmbeddingService:
+    """
+    Async embedding service on top of the async Azure OpenAI client.
+    Concurrent `embed` calls (e.g. many chat sessions on one worker) are coalesced into a single
+    `input=[...]` request per batch window, in-flight requests are capped and each caller gets its own vector back.
+    With a cache, repeated asks are answered locally and never reach the batch.
+    """
+    def __init__(
+        self,
+        model: str = AZURE_OPENAI_EMBEDDINGS_MODEL_NAME,
+        batch_window: float = EMBEDDING_BATCH_WINDOW_MS / 1000,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        client_factory: Callable = get_async_openai_client,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.client_factory = client_factory
+        self.cache = cache
+        self.stats = {"requests": 0, "batches": 0, "texts_sent": 0}
+        self._states = weakref.WeakKeyDictionary()
+
+    # Auxiliary Functions
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = _LoopState(self.max_concurrency)
+            self._states[loop] = state
+        return state
+
+    def _flush(self, state: _LoopState):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if not state.pending:
+            return
+        batch, state.pending = state.pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(state, batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _run_batch(self, state: _LoopState, batch):
+        # Identical texts in the same window are sent once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        async with state.semaphore:
+            try:
+                client = self.client_factory()
+                response = await client.embeddings.create(input=texts, model=self.model)
+                vectors = {texts[item.index]: item.embedding for item in response.data}
+                self.stats["batches"] += 1
+                self.stats["texts_sent"] += len(texts)
+                for text, future in batch:
+                    if not future.done():
+                        future.set_result(vectors[text])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        if self.cache is not None:
+            # One transaction per batch, written off the event loop once the callers have their vectors
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.cache.put_many, self.model, vectors)
+            except Exception as e:
+                print(f"Error caching embeddings: {e}")
+
+    # Main functions
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Return the embedding of `text`, sharing the request with any other text queued in the same window.
+        """
+        self.stats["requests"] += 1
+        if self.cache is not None:
+            vector = self.cache.get(self.model, text)
+            if vector is not None:
+                return vector
+
+        state = self._state()
+        future = asyncio.get_running_loop().create_future()
+        state.pending.append((text, future))
+
+        if len(state.pending) >= self.max_batch_size:
+            self._flush(state)
+        elif state.timer is None:
+            state.timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush, state)
+
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several texts, returning the vectors in the same order.
+        """
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+
+_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Return the process-wide embedding service shared by every retrieval plugin.
+    """
+    global _service
+    if _service is None:
+        _service = EmbeddingService(cache=get_embedding_cache())
+    return _service
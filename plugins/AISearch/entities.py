@@ -0,0 +1,431 @@
+import os
+import re
+import calendar
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COMPANIES_PATH = os.getenv("COMPANIES_PATH", os.path.join(ROOT_DIR, "data", "companies.txt"))
+# Below this confidence the local result is discarded and the extractEntities prompt is called
+ENTITY_CONFIDENCE_THRESHOLD = float(os.getenv("ENTITY_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Trailing words dropped (repeatedly) from the names in companies.txt to build the short aliases
+COMPANY_SUFFIXES = {"incorporated", "corporation", "company", "inc", "co", "ltd", "limited", "plc", "group", "industries", "and", "&"}
+
+# Extra names people use for the companies in companies.txt (alias -> ticker)
+COMPANY_ALIASES = {
+    "3m": "MMM",
+    "abbott": "ABT",
+    "bausch lomb": "BLCO",
+    "baxter": "BAX",
+    "bio rad": "BIO",
+    "bms": "BMY",
+    "bristol myers": "BMY",
+    "edgewell": "EPC",
+    "lilly": "LLY",
+    "ge": "GE",
+    "honeywell": "HON",
+    "j&j": "JNJ",
+    "merck": "MRK",
+    "mondelez": "MDLZ",
+    "teva": "TEVA",
+    "cooper companies": "COO",
+    "estee lauder": "EL",
+    "hain celestial": "HAIN",
+    "hershey": "HSY",
+    "hershey's": "HSY",
+    "p&g": "PG",
+    "procter & gamble": "PG",
+    "procter and gamble": "PG",
+    "thermo fisher": "TMO",
+    "unitedhealth": "UNH",
+    "vertex": "VRTX",
+    "viatris": "VTRS",
+}
+
+# ISO 3166-1 alpha-2 codes by country name and adjective.
+# EU is an ISO "exceptionally reserved" code, kept because the index tags European documents with it.
+COUNTRY_CODES = {
+    "united states": "US", "united states of america": "US", "america": "US", "american": "US",
+    "united kingdom": "GB", "great britain": "GB", "britain": "GB", "british": "GB", "england": "GB",
+    "germany": "DE", "german": "DE",
+    "canada": "CA", "canadian": "CA",
+    "france": "FR", "french": "FR",
+    "india": "IN", "indian": "IN",
+    "china": "CN", "chinese": "CN",
+    "australia": "AU", "australian": "AU",
+    "brazil": "BR", "brazilian": "BR",
+    "japan": "JP", "japanese": "JP",
+    "south africa": "ZA", "south african": "ZA",
+    "mexico": "MX", "mexican": "MX",
+    "italy": "IT", "italian": "IT",
+    "spain": "ES", "spanish": "ES",
+    "russia": "RU", "russian": "RU",
+    "switzerland": "CH", "swiss": "CH",
+    "netherlands": "NL", "dutch": "NL",
+    "ireland": "IE", "irish": "IE",
+    "israel": "IL", "israeli": "IL",
+    "south korea": "KR", "korea": "KR", "korean": "KR",
+    "singapore": "SG",
+    "sweden": "SE", "swedish": "SE",
+    "belgium": "BE", "belgian": "BE",
+    "denmark": "DK", "danish": "DK",
+    "argentina": "AR", "argentinian": "AR",
+    "chile": "CL", "chilean": "CL",
+    "europe": "EU", "european": "EU",
+}
+# Upper-case abbreviations are matched case-sensitively ("US" the country, not "us" the pronoun)
+COUNTRY_ABBREVIATIONS = {"US": "US", "USA": "US", "U.S.": "US", "U.S.A.": "US", "UK": "GB", "U.K.": "GB", "EU": "EU"}
+
+# Capitalised words that are not entities and must not lower the confidence
+NON_ENTITY_WORDS = {
+    "fy", "q", "h", "usd", "eur", "eps", "roa", "roe", "roi", "ebit", "ebitda", "capex", "cagr", "yoy", "r", "d",
+    "p", "l", "ceo", "cfo", "ipo", "esg", "gaap", "sec", "i", "ai", "year", "quarter", "fiscal", "total", "net",
+    "annual", "quarterly", "revenue", "sales", "income", "profit", "cash", "flow", "statement", "balance", "sheet",
+} | {month.lower() for month in calendar.month_name if month} | {month.lower() for month in calendar.month_abbr if month}
+
+# Words that open the company slot of an ask ("revenue of ...", "sales for ...")
+COMPANY_SLOT_WORDS = {"of", "for", "by", "at", "from"}
+# Lower-case words that can fill that slot without naming a company
+SLOT_FILLERS = {
+    "the", "a", "an", "its", "their", "his", "her", "our", "my", "your", "this", "that", "these", "those", "each",
+    "every", "all", "any", "both", "some", "it", "them", "which", "what", "whom", "who", "whose", "one", "last", "next",
+    "previous", "same", "company", "companies", "firm", "firms", "business", "businesses", "market", "markets", "segment",
+}
+
+MONTHS = {month.lower(): index for index, month in enumerate(calendar.month_name) if month}
+MONTHS.update({month.lower(): index for index, month in enumerate(calendar.month_abbr) if month})
+MONTHS["sept"] = 9
+ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+MONTH = r"(?P<month>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+YEAR = r"(?P<year>(?:19|20)\d{2})"
+DATE_PATTERNS = [
+    # 2020-07-15
+    ("day", re.compile(r"\b(?P<year>(?:19|20)\d{2})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")),
+    # 15th July 2020, 15 July, 2020
+    ("day", re.compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)?(?:\s+of)?\s+" + MONTH + r",?\s+" + YEAR + r"\b", re.I)),
+    # July 15, 2020
+    ("day", re.compile(r"\b" + MONTH + r"\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?,?\s+" + YEAR + r"\b", re.I)),
+    # Q3 2019, Q3 FY2019, 3Q19, 2021 Q3
+    ("quarter", re.compile(r"\b[Qq](?P<n>[1-4])\s*(?:of\s+)?(?:FY\s?|fiscal\s+year\s+)?'?" + YEAR + r"\b")),
+    ("quarter", re.compile(r"\b(?:FY\s?)?" + YEAR + r"\s*[Qq](?P<n>[1-4])\b")),
+    # third quarter of 2022
+    ("quarter", re.compile(r"\b(?P<n>first|second|third|fourth|1st|2nd|3rd|4th)\s+quarter\s+(?:of\s+)?(?:FY\s?|fiscal\s+year\s+)?" + YEAR + r"\b", re.I)),
+    # H1 2022, first half of 2022
+    ("half", re.compile(r"\b[Hh](?P<n>[12])\s*(?:of\s+)?(?:FY\s?)?" + YEAR + r"\b")),
+    ("half", re.compile(r"\b(?P<n>first|second|1st|2nd)\s+half\s+(?:of\s+)?(?:FY\s?|fiscal\s+year\s+)?" + YEAR + r"\b", re.I)),
+    # June 2020
+    ("month", re.compile(r"\b" + MONTH + r",?\s+(?:of\s+)?" + YEAR + r"\b", re.I)),
+    # (as of the) end of 2022, end of FY2022
+    ("year_end", re.compile(r"\bend\s+of\s+(?:the\s+)?(?:FY\s?|fiscal\s+(?:year\s+)?|year\s+)?" + YEAR + r"\b", re.I)),
+    # FY2018, FY 2018, FY18, fiscal year 2021, 2021
+    ("year", re.compile(r"\bFY\s?'?(?P<short>\d{2})\b", re.I)),
+    ("year", re.compile(r"\b(?:FY\s?|fiscal\s+(?:year\s+)?)?" + YEAR + r"\b", re.I)),
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'s)?|&|\+")
+CAPITALISED_PATTERN = re.compile(r"\b[A-Z][A-Za-z0-9&\-]*")
+
+
+def normalize_countries(countries) -> Optional[List[str]]:
+    """
+    Country codes from either extraction path as ISO 3166-1 alpha-2, so both filter on the same values:
+    the prompt's "UK" becomes "GB", names and adjectives ("Germany", "german") their code, other codes are upper-cased.
+    """
+    if not countries:
+        return None
+    codes = []
+    for country in [countries] if isinstance(countries, str) else countries:
+        text = str(country).strip()
+        code = COUNTRY_ABBREVIATIONS.get(text.upper()) or COUNTRY_CODES.get(text.lower()) or text.upper()
+        if code and code not in codes:
+            codes.append(code)
+    return codes or None
+
+
+def normalize_entities(entities):
+    """
+    Entities of the extractEntities prompt with their country codes normalized (see normalize_countries).
+    Anything that is not a dict (a parse error message) is returned as it is.
+    """
+    if isinstance(entities, dict) and "country" in entities:
+        entities = dict(entities, country=normalize_countries(entities["country"]))
+    return entities
+
+
+def fold(text: str) -> str:
+    """
+    Lower-case and strip accents one character at a time, so offsets still point into the original ask.
+    """
+    return "".join(unicodedata.normalize("NFKD", c)[0].lower()[0] for c in text.replace("’", "'"))
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """
+    Lower-cased word tokens with their character spans. Possessive "'s" is dropped from the token
+    so "Pfizer's" matches "pfizer".
+    """
+    text = fold(text)
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token.endswith("'s") and token not in COMPANY_ALIASES:
+            token = token[:-2]
+        tokens.append((token, match.start(), match.end()))
+    return tokens
+
+
+class PhraseTrie:
+    """
+    Token-level trie compiled once from the alias tables. `find` scans the text left to right and
+    returns the longest phrase starting at each position, without overlaps.
+    """
+    def __init__(self, phrases: Dict[str, str] = None):
+        self.root = {}
+        self.max_depth = 0
+        for phrase, value in (phrases or {}).items():
+            self.add(phrase, value)
+
+    def add(self, phrase: str, value: str):
+        tokens = [token for token, _, _ in tokenize(phrase)]
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # The first value registered for a phrase wins
+        node.setdefault(None, value)
+        self.max_depth = max(self.max_depth, len(tokens))
+
+    def find(self, tokens: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        """
+        Return (value, start_char, end_char) for every match.
+        """
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node = self.root
+            best = None
+            for j in range(i, min(len(tokens), i + self.max_depth)):
+                node = node.get(tokens[j][0])
+                if node is None:
+                    break
+                if None in node:
+                    best = (node[None], j)
+            if best is None:
+                i += 1
+                continue
+            value, j = best
+            matches.append((value, tokens[i][1], tokens[j][2]))
+            i = j + 1
+        return matches
+
+
+def period_bounds(kind: str, match: re.Match) -> Tuple[str, str]:
+    """
+    Convert a date regex match into the ["YYYY-MM-DD", "YYYY-MM-DD"] interval used by the prompt.
+    """
+    groups = match.groupdict()
+    year = int(groups["year"]) if groups.get("year") else 2000 + int(groups["short"])
+    if kind == "day":
+        month = int(groups["month"]) if groups["month"].isdigit() else MONTHS[groups["month"].lower()]
+        day = f"{year:04d}-{month:02d}-{int(groups['day']):02d}"
+        return day, day
+    if kind == "year_end":
+        return f"{year:04d}-12-31", f"{year:04d}-12-31"
+    if kind == "month":
+        first_month = last_month = MONTHS[groups["month"].lower()]
+    elif kind == "quarter":
+        n = ORDINALS.get(groups["n"].lower()) or int(groups["n"])
+        first_month, last_month = 3 * n - 2, 3 * n
+    elif kind == "half":
+        n = ORDINALS.get(groups["n"].lower()) or int(groups["n"])
+        first_month, last_month = 6 * n - 5, 6 * n
+    else:
+        first_month, last_month = 1, 12
+    last_day = calendar.monthrange(year, last_month)[1]
+    return f"{year:04d}-{first_month:02d}-01", f"{year:04d}-{last_month:02d}-{last_day:02d}"
+
+
+class EntityExtractor:
+    """
+    Deterministic fast path for ASKProcess/extractEntities.
+    Returns the same {"ticker", "country", "dates"} object as the prompt, plus a confidence in [0, 1]:
+    capitalised words that are not explained by a company, country or date (an unknown company, a holiday...)
+    lower it, as do lower-case words in the company slot of an ask that names no known company, so those asks
+    still go to the LLM.
+    """
+    def __init__(self, companies_path: str = COMPANIES_PATH, aliases: Dict[str, str] = COMPANY_ALIASES):
+        self.tickers = {}
+        self.companies = PhraseTrie()
+        self.load_companies(companies_path)
+        for alias, ticker in aliases.items():
+            self.companies.add(alias, ticker)
+        self.countries = PhraseTrie(COUNTRY_CODES)
+        self.ticker_pattern = re.compile(r"\b(" + "|".join(sorted(map(re.escape, self.tickers), key=len, reverse=True)) + r")\b") if self.tickers else None
+        self.country_pattern = re.compile(r"(?<![\w.])(" + "|".join(sorted(map(re.escape, COUNTRY_ABBREVIATIONS), key=len, reverse=True)) + r")(?![\w])")
+
+    # Auxiliary Functions
+
+    def load_companies(self, path: str):
+        """
+        Read companies.txt ("Name (EXCHANGE:TICKER)<TAB>EXCHANGE:TICKER") and register every name
+        with and without its legal suffixes and leading "The".
+        """
+        if not os.path.exists(path):
+            print(f"Companies file not found: {path}")
+            return
+        with open(path, encoding="utf-8") as file:
+            next(file, None)
+            for line in file:
+                columns = line.rstrip("\n").split("\t")
+                if len(columns) < 2 or ":" not in columns[1]:
+                    continue
+                ticker = columns[1].split(":")[-1].strip()
+                name = columns[0].split("(")[0].strip()
+                self.tickers[ticker] = name
+                for alias in self.name_variants(name):
+                    self.companies.add(alias, ticker)
+
+    @staticmethod
+    def name_variants(name: str) -> List[str]:
+        """
+        "The Hain Celestial Group, Inc." -> the hain celestial group inc, hain celestial group inc,
+        hain celestial group, hain celestial, ...
+        """
+        words = [token for token, _, _ in tokenize(name)]
+        variants = [words]
+        if words[:1] == ["the"]:
+            variants.append(words[1:])
+        for words in list(variants):
+            while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+                words = words[:-1]
+                variants.append(words)
+        return [" ".join(words) for words in variants]
+
+    def extract_dates(self, text: str) -> Tuple[Optional[List[str]], List[Tuple[int, int]]]:
+        """
+        Every time expression in the ask, merged into one interval (earliest start, latest end),
+        e.g. "from FY2015 to FY2016" -> ["2015-01-01", "2016-12-31"].
+        """
+        spans = []
+        bounds = []
+        for kind, pattern in DATE_PATTERNS:
+            for match in pattern.finditer(text):
+                if any(start < match.end() and match.start() < end for start, end in spans):
+                    continue
+                try:
+                    bounds.append(period_bounds(kind, match))
+                except (ValueError, KeyError):
+                    continue
+                spans.append((match.start(), match.end()))
+        if not bounds:
+            return None, spans
+        return [min(start for start, _ in bounds), max(end for _, end in bounds)], spans
+
+    def unresolved_words(self, text: str, spans: List[Tuple[int, int]]) -> List[str]:
+        """
+        Capitalised words outside the matched spans that do not open a sentence.
+        """
+        words = []
+        for match in CAPITALISED_PATTERN.finditer(text):
+            if any(start <= match.start() < end for start, end in spans):
+                continue
+            before = text[: match.start()].rstrip()
+            if not before or before[-1] in ".?!:\"'(":
+                continue
+            word = match.group()
+            if word.lower() in NON_ENTITY_WORDS or len(word) == 1:
+                continue
+            words.append(word)
+        return words
+
+    def lowercase_names(self, ask: str, tokens: List[Tuple[str, int, int]], spans: List[Tuple[int, int]]) -> List[str]:
+        """
+        Lower-case words outside the matched spans that look like a company name: right after of/for/by/at/from
+        ("revenue of coca cola") or with a possessive 's ("moderna's margin").
+        """
+        names = []
+        for i, (token, start, end) in enumerate(tokens):
+            if any(s <= start < e for s, e in spans) or not ask[start].islower():
+                continue
+            # tokenize() drops the possessive 's from the token but keeps it in the span
+            possessive = ask[start:end].endswith(("'s", "\u2019s"))
+            if token in NON_ENTITY_WORDS or token in SLOT_FILLERS or any(c.isdigit() for c in token):
+                continue
+            previous = tokens[i - 1][0] if i else ""
+            if previous in COMPANY_SLOT_WORDS or (possessive and previous not in SLOT_FILLERS):
+                names.append(token)
+        return names
+
+    # Main functions
+
+    def extract(self, ask: str) -> Tuple[Dict[str, Optional[List[str]]], float]:
+        """
+        Return ({"ticker", "country", "dates"}, confidence).
+        """
+        tokens = tokenize(ask)
+        spans = []
+
+        tickers = []
+        for ticker, start, end in self.companies.find(tokens):
+            tickers.append((start, ticker))
+            spans.append((start, end))
+        if self.ticker_pattern:
+            for match in self.ticker_pattern.finditer(ask):
+                tickers.append((match.start(), match.group()))
+                spans.append(match.span())
+
+        countries = []
+        for code, start, end in self.countries.find(tokens):
+            countries.append((start, code))
+            spans.append((start, end))
+        for match in self.country_pattern.finditer(ask):
+            countries.append((match.start(), normalize_countries([match.group()])[0]))
+            spans.append(match.span())
+
+        dates, date_spans = self.extract_dates(ask)
+        spans.extend(date_spans)
+
+        # Tickers in order of appearance, one main country (the first mentioned)
+        ordered_tickers = list(dict.fromkeys(ticker for _, ticker in sorted(tickers)))
+        entities = {
+            "ticker": ordered_tickers or None,
+            "country": [sorted(countries)[0][1]] if countries else None,
+            "dates": dates,
+        }
+
+        confidence = 1.0
+        if self.unresolved_words(ask, spans) or (not ordered_tickers and self.lowercase_names(ask, tokens, spans)):
+            confidence -= 0.5
+        if not any(entities.values()):
+            confidence -= 0.25
+        return entities, confidence
+
+
+_extractor: Optional[EntityExtractor] = None
+
+
+def get_entity_extractor() -> EntityExtractor:
+    global _extractor
+    if _extractor is None:
+        _extractor = EntityExtractor()
+    return _extractor
+
+
+def extract_entities_locally(ask: str, threshold: float = None) -> Optional[Dict[str, Optional[List[str]]]]:
+    """
+    Entities from the local extractor, or None when its confidence is below the threshold
+    and the caller should fall back to the LLM prompt.
+    """
+    threshold = ENTITY_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    try:
+        entities, confidence = get_entity_extractor().extract(ask or "")
+    except Exception as e:
+        print(f"Error in local entity extraction: {e}")
+        return None
+    return entities if confidence >= threshold else None
@@ -0,0 +1,205 @@
+import os
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from azure.search.documents.models import VectorizedQuery, VectorFilterMode
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Documents are deduplicated on the first of these fields they have (VSearch index: id, AISearch index: Id)
+KEY_FIELDS = ("id", "Id")
+SCORE_FIELD = "@search.score"
+FUSED_SCORE_FIELD = "@search.fused_score"
+
+
+class FusionConfig:
+    """
+    Fusion parameters of one plugin, read from <PREFIX>_FUSION_* environment variables:
+
+        METHOD      service (let Azure fuse one hybrid query, the default) | rrf | weighted
+        K           RRF constant (default 60)
+        WEIGHTS     per-list weights, e.g. "keyword=0.3,vector=0.7" (default 1 for every list)
+        TOP         documents kept after fusion
+        LIST_SIZE   documents fetched per sub-query (keyword and vector), usually a little above TOP
+    """
+    def __init__(self, method: str = "service", k: int = 60, weights: Optional[Dict[str, float]] = None, top: int = 3, list_size: int = 5):
+        if method not in ("service", "rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {method}")
+        self.method = method
+        self.k = k
+        self.weights = weights or {}
+        self.top = top
+        self.list_size = list_size
+
+    @property
+    def client_side(self) -> bool:
+        return self.method != "service"
+
+    def with_top(self, top: int) -> "FusionConfig":
+        """
+        Same fusion for a bigger page (e.g. one request covering several groups); sub-queries fetch at least `top`.
+        """
+        return FusionConfig(self.method, self.k, self.weights, top, max(self.list_size, top))
+
+    @classmethod
+    def from_env(cls, prefix: str, top: int = 3, list_size: int = 5) -> "FusionConfig":
+        weights = {}
+        for item in os.getenv(f"{prefix}_FUSION_WEIGHTS", "").split(","):
+            if "=" in item:
+                name, weight = item.split("=", 1)
+                weights[name.strip()] = float(weight)
+        return cls(
+            method=os.getenv(f"{prefix}_FUSION_METHOD", "service").lower(),
+            k=int(os.getenv(f"{prefix}_FUSION_K", "60")),
+            weights=weights,
+            top=int(os.getenv(f"{prefix}_FUSION_TOP", str(top))),
+            list_size=int(os.getenv(f"{prefix}_FUSION_LIST_SIZE", str(list_size))),
+        )
+
+
+def fuse_ranks(
+    ranks: np.ndarray,
+    lists: np.ndarray,
+    items: np.ndarray,
+    n_items: int,
+    method: str = "rrf",
+    k: int = 60,
+    list_weights: Optional[np.ndarray] = None,
+    scores: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Vectorized core: every hit is (item, list, rank[, score]) in flat arrays; returns the fused score of every item.
+    rrf:      sum over lists of weight / (k + rank + 1)
+    weighted: sum over lists of weight * score min-max normalized within its list
+    """
+    weights = list_weights[lists] if list_weights is not None else np.ones(len(items), dtype=np.float64)
+    if method == "rrf" or scores is None:
+        contributions = weights / (k + ranks + 1.0)
+    else:
+        n_lists = int(lists.max()) + 1 if len(lists) else 0
+        low = np.full(n_lists, np.inf)
+        high = np.full(n_lists, -np.inf)
+        np.minimum.at(low, lists, scores)
+        np.maximum.at(high, lists, scores)
+        spread = high[lists] - low[lists]
+        normalized = np.where(spread > 0, (scores - low[lists]) / np.where(spread > 0, spread, 1.0), 1.0)
+        contributions = weights * normalized
+    return np.bincount(items, weights=contributions, minlength=n_items)
+
+
+def document_key(document: Dict[str, Any], key_fields: Sequence[str] = KEY_FIELDS):
+    for field in key_fields:
+        if document.get(field) is not None:
+            return document[field]
+    # No key field selected: fall back to the content itself
+    return repr(sorted((field, repr(value)) for field, value in document.items() if not field.startswith("@")))
+
+
+def fuse(
+    ranked_lists: Dict[str, List[Dict[str, Any]]],
+    method: str = "rrf",
+    k: int = 60,
+    weights: Optional[Dict[str, float]] = None,
+    top: Optional[int] = None,
+    key_fields: Sequence[str] = KEY_FIELDS,
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists ({"keyword": [...], "vector": [...], "<filter>": [...]}) into one ranking.
+    Documents are deduplicated by id/Id; the first copy seen is returned with its fused score in "@search.fused_score".
+    """
+    weights = weights or {}
+    keys = {}
+    documents = []
+    items, lists, ranks, scores = [], [], [], []
+    names = list(ranked_lists)
+    for list_index, name in enumerate(names):
+        for rank, document in enumerate(ranked_lists[name] or []):
+            key = document_key(document, key_fields)
+            if key not in keys:
+                keys[key] = len(documents)
+                documents.append(document)
+            items.append(keys[key])
+            lists.append(list_index)
+            ranks.append(rank)
+            scores.append(float(document.get(SCORE_FIELD) or 0.0))
+    if not documents:
+        return []
+
+    fused = fuse_ranks(
+        np.asarray(ranks, dtype=np.float64),
+        np.asarray(lists, dtype=np.int64),
+        np.asarray(items, dtype=np.int64),
+        len(documents),
+        method=method,
+        k=k,
+        list_weights=np.asarray([weights.get(name, 1.0) for name in names], dtype=np.float64),
+        scores=np.asarray(scores, dtype=np.float64),
+    )
+    # Stable sort keeps first-seen order among ties
+    order = np.argsort(-fused, kind="stable")[: top or len(documents)]
+    return [{**documents[i], FUSED_SCORE_FIELD: float(fused[i])} for i in order]
+
+
+def fuse_positions(rankings: Iterable[Sequence[int]], n_items: int, k: int = 60) -> List[Tuple[int, float]]:
+    """
+    RRF over rankings of integer positions (used by LocalSearchIndex); returns [(position, score)] best first.
+    """
+    rankings = [np.asarray(ranking, dtype=np.int64) for ranking in rankings]
+    if not any(len(ranking) for ranking in rankings):
+        return []
+    items = np.concatenate(rankings)
+    ranks = np.concatenate([np.arange(len(ranking)) for ranking in rankings]).astype(np.float64)
+    lists = np.concatenate([np.full(len(ranking), i) for i, ranking in enumerate(rankings)])
+    fused = fuse_ranks(ranks, lists, items, n_items, method="rrf", k=k)
+    hit = np.flatnonzero(fused > 0)
+    order = hit[np.argsort(-fused[hit], kind="stable")]
+    return [(int(i), float(fused[i])) for i in order]
+
+
+def run_concurrently(calls: List[Callable[[], Any]], executor: Optional[Executor] = None) -> List[Any]:
+    """
+    Results of the blocking `calls`, run at the same time: all but the last on `executor`, the last in this thread.
+    A call the executor has not started by then (pool busy, e.g. with the searches calling this) is run here
+    instead, so using the pool from one of its own threads cannot deadlock. Without an executor, calls run in order.
+    """
+    if executor is None or len(calls) < 2:
+        return [call() for call in calls]
+    futures = [executor.submit(call) for call in calls[:-1]]
+    try:
+        last = calls[-1]()
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return [call() if future.cancel() else future.result() for future, call in zip(futures, calls)] + [last]
+
+
+def hybrid_search(search_client, search_text: str, vector_query, config: FusionConfig, filter: Optional[str] = None,
+                  select: Optional[List[str]] = None, executor: Optional[Executor] = None) -> List[Dict[str, Any]]:
+    """
+    One hybrid query with an optional pre-filter. With method "service" it is a single search_text + vector
+    request fused by the search service; otherwise a keyword and a vector sub-query of `list_size` documents
+    each, sent concurrently through `executor` (the search thread pool) when given, are fused here into the best `top`.
+    """
+    filter_kwargs = {"vector_filter_mode": VectorFilterMode.PRE_FILTER, "filter": filter} if filter else {}
+    if not config.client_side:
+        results = search_client.search(
+            search_text=search_text, vector_queries=[vector_query], select=select, top=config.top, **filter_kwargs
+        )
+        return [dict(result) for result in results]
+
+    # The SearchClient is lazy: each sub-query is materialized inside its own call
+    sub_queries = {}
+    if search_text:
+        sub_queries["keyword"] = lambda: [
+            dict(result) for result in search_client.search(search_text=search_text, select=select, top=config.list_size, filter=filter)
+        ]
+    if vector_query is not None:
+        sub_query = VectorizedQuery(vector=vector_query.vector, k_nearest_neighbors=config.list_size, fields=vector_query.fields)
+        sub_queries["vector"] = lambda: [
+            dict(result)
+            for result in search_client.search(search_text=None, vector_queries=[sub_query], select=select, top=config.list_size, **filter_kwargs)
+        ]
+    ranked_lists = dict(zip(sub_queries, run_concurrently(list(sub_queries.values()), executor)))
+    return fuse(ranked_lists, method=config.method, k=config.k, weights=config.weights, top=config.top)
@@ -0,0 +1,493 @@
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from plugins.AISearch.backends import LocalSearchIndex, local_index_path
+from plugins.AISearch.entities import get_entity_extractor
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    # PDF filings need `pip install pypdf`; text filings work without it
+    PdfReader = None
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Chunking and batching knobs, overridable from .env. Manifests and diff reports go to INGEST_CHECKPOINT_DIR.
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1500"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "150"))
+INGEST_CHECKPOINT_EVERY = int(os.getenv("INGEST_CHECKPOINT_EVERY", "10"))
+INGEST_CHECKPOINT_DIR = os.getenv("INGEST_CHECKPOINT_DIR", os.path.join(ROOT_DIR, ".cache", "ingest"))
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+# Chunk boundaries, best first: paragraph, line, sentence, word
+BOUNDARIES = ["\n\n", "\n", ". ", " "]
+# Characters before a boundary hashed to pick the cut
+CUT_CONTEXT = 32
+KEY_PATTERN = re.compile(r"[^A-Za-z0-9_\-=]")
+# FinanceBench file names: <COMPANY>_<YEAR>[Q<n>]_<DOC TYPE>, e.g. 3M_2018_10K.pdf, AMCOR_2023Q4_EARNINGS.pdf
+PERIOD_PATTERN = re.compile(r"^(?P<year>(?:19|20)\d{2})(?:Q(?P<quarter>[1-4]))?$", re.I)
+
+# Field names of the two index schemas in use
+SCHEMAS = {
+    # VSearch index
+    "vsearch": {"key_field": "id", "vector_fields": ("embedding",), "text_fields": ("document",)},
+    # AISearch index (finance-bench-small-sk)
+    "aisearch": {"key_field": "Id", "vector_fields": ("Embedding",), "text_fields": ("Text",)},
+}
+
+
+_compact_names: Optional[Dict[str, str]] = None
+
+
+def compact_company_names() -> Dict[str, str]:
+    """
+    Company names of data/companies.txt without spaces or punctuation -> ticker, since file names drop them
+    (JOHNSON_JOHNSON, BESTBUY).
+    """
+    global _compact_names
+    if _compact_names is None:
+        extractor = get_entity_extractor()
+        _compact_names = {}
+        for ticker, name in extractor.tickers.items():
+            for variant in extractor.name_variants(name):
+                _compact_names.setdefault(re.sub(r"[^a-z0-9]", "", variant.replace("&", "")), ticker)
+    return _compact_names
+
+
+def filename_metadata(filename: str) -> Dict[str, Optional[str]]:
+    """
+    "JOHNSON_JOHNSON_2022Q4_EARNINGS.pdf" -> company "JOHNSON JOHNSON", ticker from data/companies.txt (JNJ),
+    year "2022", quarter "4", doc_type "EARNINGS". Unknown companies keep their name as the entity.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parts = [part for part in re.split(r"[_\s]+", stem) if part]
+    period = next((i for i, part in enumerate(parts) if PERIOD_PATTERN.match(part)), None)
+    company_parts = parts[:period] if period is not None else parts
+    match = PERIOD_PATTERN.match(parts[period]) if period is not None else None
+
+    company = " ".join(company_parts)
+    ticker = compact_company_names().get(re.sub(r"[^a-z0-9]", "", company.lower()))
+    if ticker is None and company:
+        entities, _ = get_entity_extractor().extract(company.title())
+        ticker = (entities.get("ticker") or [None])[0]
+    return {
+        "filename": os.path.basename(filename),
+        "company": company,
+        "referenced_entity": ticker or company.replace(" ", "").upper() or None,
+        "referenced_year": match.group("year") if match else None,
+        "quarter": match.group("quarter") if match and match.group("quarter") else None,
+        "doc_type": ("_".join(parts[period + 1:]).upper() or None) if period is not None else None,
+    }
+
+
+def read_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Stream (page number, text) of a filing: every PDF page, or a text file as a single page.
+    """
+    if path.lower().endswith(".pdf"):
+        if PdfReader is None:
+            raise RuntimeError(f"Cannot read {path}: install pypdf to ingest PDF filings")
+        for number, page in enumerate(PdfReader(path).pages, start=1):
+            yield number, page.extract_text() or ""
+    else:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            yield 1, file.read()
+
+
+def chunk_text(text: str, chunk_size: int = INGEST_CHUNK_SIZE, overlap: int = INGEST_CHUNK_OVERLAP) -> Iterator[Tuple[int, str]]:
+    """
+    Split text into (start offset, chunk) of at most `chunk_size` characters, cut at the best boundary
+    (paragraph, line, sentence, word) in the second half of the window; consecutive chunks overlap by `overlap`.
+    Among the boundaries of that kind the cut is chosen by the text around it (content-defined chunking),
+    not by its offset, so text inserted or removed earlier only changes the chunks up to the next cut.
+    """
+    text = text.strip()
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            for boundary in BOUNDARIES:
+                cuts = []
+                cut = text.find(boundary, start + chunk_size // 2, end)
+                while cut != -1 and cut + len(boundary) <= end:
+                    cuts.append(cut)
+                    cut = text.find(boundary, cut + 1, end)
+                if cuts:
+                    # Lowest hash of the preceding text wins; ties go to the longest chunk
+                    cut = min(cuts, key=lambda cut: (zlib.crc32(text[max(0, cut - CUT_CONTEXT):cut].encode("utf-8")), -cut))
+                    end = cut + len(boundary)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            yield start, chunk
+        if end >= len(text):
+            break
+        # Start the overlap on a word boundary
+        next_start = end - overlap
+        space = text.find(" ", next_start, end)
+        start = max(space + 1 if space != -1 else next_start, start + 1)
+
+
+def list_filings(paths: List[str]) -> List[str]:
+    """
+    Every supported file under the given files/directories, sorted so runs (and resumes) see the same order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in names if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(path)
+    return sorted(files)
+
+
+def build_documents(path: str, schema: str = "vsearch", chunk_size: int = INGEST_CHUNK_SIZE,
+                    overlap: int = INGEST_CHUNK_OVERLAP) -> Iterator[Dict[str, Any]]:
+    """
+    Index documents (without vectors) of one filing, in the field names of `schema`.
+    Keys are derived from the chunk text, not its position: text inserted earlier in the filing (or a new page)
+    moves the later chunks but keeps their keys, so they are not embedded again.
+    """
+    metadata = filename_metadata(path)
+    stem = KEY_PATTERN.sub("_", os.path.splitext(metadata["filename"])[0])
+    # Occurrences of the same text in one filing (repeated boilerplate) get _1, _2, ... suffixes
+    occurrences: Dict[str, int] = {}
+    for page, page_text in read_pages(path):
+        for start, chunk in chunk_text(page_text, chunk_size, overlap):
+            digest = text_hash(chunk)
+            occurrence = occurrences.get(digest, 0)
+            occurrences[digest] = occurrence + 1
+            key = f"{stem}_{digest}" + (f"_{occurrence}" if occurrence else "")
+            if schema == "aisearch":
+                yield {
+                    "Id": key,
+                    "Text": chunk,
+                    "ExternalSourceName": metadata["filename"],
+                    "Description": metadata["referenced_entity"],
+                    "AdditionalMetadata": "_".join("" if value is None else str(value) for value in [metadata["referenced_year"], metadata["doc_type"], page, start]),
+                }
+            else:
+                yield {
+                    "id": key,
+                    "document": chunk,
+                    "filename": metadata["filename"],
+                    "referenced_entity": metadata["referenced_entity"],
+                    "referenced_year": metadata["referenced_year"],
+                    "page": page,
+                }
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:20]
+
+
+def chunk_hash(document: Dict[str, Any]) -> str:
+    """
+    Hash of a chunk as uploaded (text and metadata), so a metadata fix is re-indexed too.
+    """
+    return hashlib.sha256(json.dumps(document, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    What is in the index, per source file: the file hash and the hash of every chunk (by key), for one
+    embedding model and chunking setup. Persisted as JSON; it is both the resume checkpoint and the
+    baseline of the next run's diff. A different model or chunking makes every stored chunk stale,
+    so all of them are embedded again (and the keys no longer produced are deleted).
+    """
+    def __init__(self, path: Optional[str], model: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.model = model
+        self.settings = settings or {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.stale = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            self.files = data.get("files", {})
+            self.stale = data.get("model") != model or data.get("settings") != self.settings
+
+    def unchanged(self, name: str, digest: str) -> bool:
+        entry = self.files.get(name)
+        return not self.stale and entry is not None and entry["file_hash"] == digest
+
+    def diff(self, name: str, chunks: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        {"added", "changed", "removed", "unchanged"} chunk keys of a file against the stored hashes.
+        Keys follow the chunk text, so a changed key has the same text and only new metadata (its page, offset),
+        unless the manifest is stale.
+        """
+        previous = self.files.get(name, {}).get("chunks", {})
+        if self.stale:
+            previous = {key: None for key in previous}
+        return {
+            "added": [key for key in chunks if key not in previous],
+            "changed": [key for key in chunks if key in previous and previous[key] != chunks[key]],
+            "removed": [key for key in previous if key not in chunks],
+            "unchanged": [key for key in chunks if previous.get(key) == chunks[key]],
+        }
+
+    def update(self, name: str, digest: str, chunks: Dict[str, str]):
+        self.files[name] = {"file_hash": digest, "chunks": chunks}
+
+    def forget(self, keys) -> Dict[str, int]:
+        """
+        Drop chunks that failed to index, so the next run embeds and uploads them again.
+        Returns the number of chunks dropped per file.
+        """
+        keys = set(keys)
+        dropped = {}
+        for name, entry in self.files.items():
+            failed = [key for key in entry["chunks"] if key in keys]
+            if failed:
+                for key in failed:
+                    del entry["chunks"][key]
+                # No file hash: the file is read again instead of being skipped as unchanged
+                entry["file_hash"] = None
+                dropped[name] = len(failed)
+        return dropped
+
+    def remove(self, name: str) -> List[str]:
+        return list(self.files.pop(name, {}).get("chunks", {}))
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"model": self.model, "settings": self.settings, "files": self.files}, file)
+        # Atomic replace: a crash mid-write keeps the previous manifest
+        os.replace(temporary, self.path)
+
+
+class LocalUploader:
+    """
+    Upload target writing into a LocalSearchIndex directory (see backends.LOCAL_INDEX_DIR).
+    """
+    def __init__(self, directory: str, schema: str = "vsearch"):
+        self.directory = directory
+        if os.path.exists(os.path.join(directory, "index.json")):
+            self.index = LocalSearchIndex.load(directory, mmap=False)
+        else:
+            self.index = LocalSearchIndex(**SCHEMAS[schema])
+        self.failed_keys = set()
+
+    def upload(self, documents: List[Dict[str, Any]]):
+        self.index.upload_documents(documents)
+
+    def merge(self, documents: List[Dict[str, Any]]):
+        # A replaced document without a vector keeps the one it has
+        self.index.upload_documents(documents)
+
+    def delete(self, keys: List[str]):
+        self.index.delete_documents([{self.index.key_field: key} for key in keys])
+
+    def flush(self):
+        self.index.save(self.directory)
+
+    def close(self):
+        self.flush()
+
+
+class AzureUploader:
+    """
+    Upload target batching documents into Azure AI Search with SearchIndexingBufferedSender.
+    """
+    def __init__(self, endpoint: str, index_name: str, api_key: str, schema: str = "vsearch"):
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchIndexingBufferedSender
+
+        self.key_field = SCHEMAS[schema]["key_field"]
+        self.failed = 0
+        # Keys of uploads the service rejected since the last checkpoint
+        self.failed_keys = set()
+        self.sender = SearchIndexingBufferedSender(
+            endpoint, index_name, AzureKeyCredential(api_key), on_error=self._on_error
+        )
+
+    def _on_error(self, action):
+        self.failed += 1
+        key = action.get(self.key_field) if action else None
+        print(f"Failed to index document: {key}")
+        if key is not None and action.action_type != "delete":
+            self.failed_keys.add(key)
+
+    def upload(self, documents: List[Dict[str, Any]]):
+        self.sender.upload_documents(documents=documents)
+
+    def merge(self, documents: List[Dict[str, Any]]):
+        # Partial update: the fields sent are replaced, the stored vector is kept
+        self.sender.merge_documents(documents=documents)
+
+    def delete(self, keys: List[str]):
+        self.sender.delete_documents(documents=[{self.key_field: key} for key in keys])
+
+    def flush(self):
+        self.sender.flush()
+
+    def close(self):
+        self.sender.close()
+
+
+class IngestionPipeline:
+    """
+    Stream filings through chunking, batched embedding and upload:
+
+        read pages -> chunk -> diff against the manifest -> embed added chunks -> upload, delete removed chunks
+
+    Chunks whose text is unchanged but moved (new page or offset) are merged without their vector instead of
+    being embedded again.
+
+    `embed_many` is any coroutine function mapping a list of texts to their vectors (EmbeddingService.embed_many).
+    Files whose bytes did not change are skipped without being read. Every `checkpoint_every` files the uploader
+    is flushed and the manifest saved, so a restart resumes there. `report` holds the per-file diff of the run.
+    """
+    def __init__(self, embed_many: Callable, uploader, schema: str = "vsearch", manifest: Optional[Manifest] = None,
+                 chunk_size: int = INGEST_CHUNK_SIZE, overlap: int = INGEST_CHUNK_OVERLAP, checkpoint_every: int = INGEST_CHECKPOINT_EVERY):
+        self.embed_many = embed_many
+        self.uploader = uploader
+        self.schema = schema
+        self.manifest = manifest or Manifest(None)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.checkpoint_every = checkpoint_every
+        self.vector_field = SCHEMAS[schema]["vector_fields"][0]
+        self.text_field = SCHEMAS[schema]["text_fields"][0]
+        self.key_field = SCHEMAS[schema]["key_field"]
+        self.stats = {
+            "files": 0, "unchanged_files": 0, "deleted_files": 0, "failed_files": 0,
+            "chunks": 0, "embedded": 0, "deleted": 0, "failed_chunks": 0, "seconds": 0.0, "chunks_per_second": 0.0,
+        }
+        self.report: Dict[str, Dict[str, Any]] = {}
+
+    async def ingest_file(self, path: str, name: str, digest: str) -> Dict[str, Any]:
+        documents = list(build_documents(path, self.schema, self.chunk_size, self.overlap))
+        hashes = {document[self.key_field]: chunk_hash(document) for document in documents}
+        diff = self.manifest.diff(name, hashes)
+
+        # A stale manifest (new model or chunking) needs every vector again
+        embed = set(diff["added"]) | (set(diff["changed"]) if self.manifest.stale else set())
+        moved = set(diff["changed"]) - embed
+        outdated = [document for document in documents if document[self.key_field] in embed]
+        if outdated:
+            vectors = await self.embed_many([document[self.text_field] for document in outdated])
+            for document, vector in zip(outdated, vectors):
+                document[self.vector_field] = vector
+            self.uploader.upload(outdated)
+        if moved:
+            self.uploader.merge([document for document in documents if document[self.key_field] in moved])
+        if diff["removed"]:
+            self.uploader.delete(diff["removed"])
+        status = "new" if name not in self.manifest.files else ("modified" if embed or moved or diff["removed"] else "unchanged")
+        self.manifest.update(name, digest, hashes)
+        return {"status": status, **{kind: len(keys) for kind, keys in diff.items()}, "embedded": len(embed)}
+
+    def flush(self):
+        self.uploader.flush()
+        # Chunks the uploader rejected are left out of the checkpoint, so a later run retries them
+        failed_keys = getattr(self.uploader, "failed_keys", None)
+        if failed_keys:
+            for name, count in self.manifest.forget(failed_keys).items():
+                self.stats["failed_chunks"] += count
+                if name in self.report:
+                    self.report[name]["failed"] = self.report[name].get("failed", 0) + count
+            failed_keys.clear()
+        self.manifest.save()
+
+    async def run(self, files: List[str], progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  prune: bool = False) -> Dict[str, Any]:
+        """
+        Index `files`. With `prune`, files in the manifest but not in `files` are deleted from the index.
+        """
+        started_at = time.perf_counter()
+        pending = 0
+        try:
+            names = set()
+            for path in files:
+                name = os.path.basename(path)
+                names.add(name)
+                try:
+                    digest = file_hash(path)
+                    if self.manifest.unchanged(name, digest):
+                        self.stats["unchanged_files"] += 1
+                        self.report[name] = {"status": "unchanged", "unchanged": len(self.manifest.files[name]["chunks"])}
+                        continue
+                    self.report[name] = await self.ingest_file(path, name, digest)
+                except Exception as e:
+                    # One unreadable filing does not stop the run; it is retried on the next one
+                    print(f"Error ingesting {path}: {e}")
+                    self.stats["failed_files"] += 1
+                    self.report[name] = {"status": "failed", "error": str(e)}
+                    continue
+                entry = self.report[name]
+                self.stats["files"] += 1
+                self.stats["chunks"] += entry["added"] + entry["changed"] + entry["unchanged"]
+                self.stats["embedded"] += entry["embedded"]
+                self.stats["deleted"] += entry["removed"]
+                pending += 1
+                if pending >= self.checkpoint_every:
+                    self.flush()
+                    pending = 0
+                self._update_rate(started_at)
+                if progress:
+                    progress(dict(self.stats, file=name, diff=entry))
+
+            if prune:
+                for name in [name for name in self.manifest.files if name not in names]:
+                    keys = self.manifest.remove(name)
+                    self.uploader.delete(keys)
+                    self.stats["deleted_files"] += 1
+                    self.stats["deleted"] += len(keys)
+                    self.report[name] = {"status": "deleted", "removed": len(keys)}
+            self.flush()
+        finally:
+            self.uploader.close()
+        self._update_rate(started_at)
+        return self.stats
+
+    def _update_rate(self, started_at: float):
+        self.stats["seconds"] = round(time.perf_counter() - started_at, 3)
+        self.stats["chunks_per_second"] = round(self.stats["embedded"] / self.stats["seconds"], 2) if self.stats["seconds"] else 0.0
+
+    def diff_report(self) -> Dict[str, Any]:
+        """
+        Per-file diff of the run plus totals; `embedding_saved` is the share of chunks that did not need an embedding.
+        """
+        totals = {kind: sum(entry.get(kind, 0) for entry in self.report.values()) for kind in ("added", "changed", "removed", "unchanged", "embedded")}
+        indexed = totals["added"] + totals["changed"] + totals["unchanged"]
+        return {
+            "files": self.report,
+            "totals": totals,
+            "embedding_saved": round(1 - totals["embedded"] / indexed, 4) if indexed else 0.0,
+            "failed_chunks": self.stats["failed_chunks"],
+            "stats": self.stats,
+        }
+
+
+def manifest_path(index_name: str) -> str:
+    return os.path.join(INGEST_CHECKPOINT_DIR, f"{index_name}.manifest.json")
+
+
+def report_path(index_name: str) -> str:
+    return os.path.join(INGEST_CHECKPOINT_DIR, f"{index_name}.diff.json")
+
+
+def local_uploader(index_name: str, schema: str = "vsearch") -> LocalUploader:
+    return LocalUploader(local_index_path(index_name), schema)
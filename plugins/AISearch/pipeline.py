@@ -0,0 +1,62 @@
+import time
+import asyncio
+import inspect
+from typing import Any, Callable, Dict
+
+
+class Pipeline:
+    """
+    Small async dependency graph for the retrieval path.
+    Every stage starts as soon as the stages it depends on are done, so independent work
+    (e.g. entity extraction and query embedding) overlaps, and per-stage timings show the critical path.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name: str, fn: Callable, *depends_on: str) -> "Pipeline":
+        """
+        Register a stage. `fn` receives the results of `depends_on` as positional arguments
+        and may be a plain function or a coroutine function.
+        """
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = (fn, depends_on)
+        return self
+
+    async def _run_stage(self, name, fn, depends_on, tasks, started_at):
+        inputs = [await tasks[dependency] for dependency in depends_on]
+        start = time.perf_counter()
+        try:
+            result = fn(*inputs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = {
+                "start_ms": round((start - started_at) * 1000, 2),
+                "end_ms": round((end - started_at) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2),
+            }
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every stage and return {stage name: result}. The first failing stage cancels the rest and re-raises.
+        """
+        self.timings = {}
+        started_at = time.perf_counter()
+        tasks = {}
+        # Stages are registered after their dependencies, so tasks can be created in order
+        for name, (fn, depends_on) in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(name, fn, depends_on, tasks, started_at))
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        self.timings["total"] = {"start_ms": 0.0, "end_ms": round((time.perf_counter() - started_at) * 1000, 2)}
+        self.timings["total"]["duration_ms"] = self.timings["total"]["end_ms"]
+        return {name: task.result() for name, task in tasks.items()}
@@ -1,4 +1,5 @@
 import os
+import json
 import semantic_kernel as sk
 import asyncio
 import inspect
@@ -16,6 +17,10 @@ load_dotenv()
 root_dir = os.getenv("ROOT")
 sys.path.insert(0, root_dir)
 from plugins.AISearch.aisearch import AISearchWF, build_query_filter
+from plugins.AISearch.embeddings import get_embedding_service
+from plugins.AISearch.entities import extract_entities_locally, normalize_entities
+from plugins.AISearch.pipeline import Pipeline
+from plugins.registry import get_kernel, get_semantic_plugin, get_native_plugin, run_prompt
 from src.utils import string_to_json
 
 AZURE_AISEARCH_ENDPOINT = os.getenv("AZURE_AISEARCH_ENDPOINT")
@@ -26,60 +31,91 @@ AZURE_OPENAI_EMBEDDINGS_MODEL_NAME = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NA
 AZURE_AISEARCH_INDEX_NAME = os.getenv("AZURE_AISEARCH_INDEX_NAME")
 credential = AzureKeyCredential(os.getenv("AZURE_AISEARCH_API_KEY"))
 
-# Creating the kernel
-deployment_name, key, endpoint = sk.azure_openai_settings_from_dot_env()
-embeddings = os.environ["AZURE_OPENAI_EMBEDDINGS_MODEL_NAME"]
 
-azure_chat_service = AzureChatCompletion(deployment_name=deployment_name, endpoint=endpoint, api_key=key)
-azure_text_embedding = AzureTextEmbedding(deployment_name=embeddings, endpoint=endpoint, api_key=key)
 
-          
-async def query(ask=None):
+async def extract_query_entities(ask):
+    """
+    Entities of the ask: the local extractor first, the extractEntities prompt only for low-confidence asks.
+    """
+    entities = extract_entities_locally(ask)
+    if entities is not None:
+        return entities
+    kernel = get_kernel()
+    my_context = kernel.create_new_context()
+    my_context['ask'] = ask
+    response = await run_prompt(get_semantic_plugin("ASKProcess")["extractEntities"], input_context=my_context)
+    return normalize_entities(string_to_json(response['input']))
+
+
+async def embed_query(ask):
+    # The ask is embedded once and the vector is handed to every filtered search
+    try:
+        return await get_embedding_service().embed(ask)
+    except Exception as e:
+        print(f"Error embedding the ask: {e}")
+        return None
+
+
+def build_query_pipeline(ask, run_searches):
+    """
+    The stages of query(): entity extraction and query embedding start together, then
+    run_searches(filters, vector) once the metadata filters are built. Shared with src/bench_retrieval.py,
+    which plugs in a search that returns the result dicts.
+    """
+    pipeline = Pipeline()
+    pipeline.add("extract_entities", lambda: extract_query_entities(ask))
+    pipeline.add("embed_query", lambda: embed_query(ask))
+    pipeline.add("build_filters", build_query_filter, "extract_entities")
+    pipeline.add("search", run_searches, "build_filters", "embed_query")
+    return pipeline
+
+
+async def query(ask=None, timings=None):
     """
     This function takes an ask from the user related to one or many companies 
     and performs for each company a hybrid-search with filter in Azure AI search Index.
+    Entity extraction and query embedding start together; the filtered searches run concurrently
+    once the filters are known. Pass a dict as `timings` to get the per-stage timings (ms).
     """
     try:
-        kernel = sk.Kernel()
-        kernel.add_chat_service("chat_completion", azure_chat_service)
-        kernel.add_text_embedding_generation_service("ada", azure_text_embedding)
+        # Shared kernel and plugins, loaded once per process
+        kernel = get_kernel()
 
-        pluginASKT = kernel.import_semantic_plugin_from_directory("plugins", "ASKProcess")        
-        extract_entities = pluginASKT["extractEntities"]
-        pluginAIS = kernel.import_plugin(plugin_instance= AISearchWF(), plugin_name= "AISearchWF")
+        pluginAIS = get_native_plugin(AISearchWF(), "AISearchWF")
         searchwf =  pluginAIS["searchwf"]                                 
 
-        my_context = kernel.create_new_context()
-        my_context['ask'] = ask
+        async def run_searches(metadata_filter, vector):
+            # if metadata filter is none do not use filter
+            variables = {"ask": ask}
+            if vector is not None:
+                variables["vector"] = json.dumps(vector)
+
+            async def run_searchwf(i):
+                context_variables = sk.ContextVariables(variables={**variables, "filter": i})
+                try:
+                    # Retrieve document with Hybrid Search with Filters
+                    return await kernel.run(searchwf, input_vars=context_variables)
+                except Exception as e:
+                    # Handle exceptions from searchwf
+                    print(f"Error in searchwf with filter {i}: {e}")
+                    return None
+
+            docs = await asyncio.gather(*(run_searchwf(i) for i in metadata_filter or []))
+            return [doc for doc in docs if doc is not None]
+
+        pipeline = build_query_pipeline(ask, run_searches)
 
         try:
-            response = await kernel.run(extract_entities, input_context=my_context)         
+            results = await pipeline.run()
         except Exception as e:
             # Handle exceptions from extract_entities
             print(f"Error in extract_entities: {e}")
             return []
+        finally:
+            if timings is not None:
+                timings.update(pipeline.timings)
 
-        # if filter is none do not filter!
-
-        ask_entities = string_to_json(response['input'])            
-        metadata_filter = build_query_filter(ask_entities)    
-
-        documents = []
-
-        # if metadata filter is none do not use filter
-
-        for i in metadata_filter:
-            context_variables = sk.ContextVariables(variables={"ask":ask,"filter": i})
-            try:
-                # Retrieve document with Hybrid Search with Filters
-                doc = await kernel.run(searchwf, input_vars=context_variables) 
-                documents.append(doc)    
-            except Exception as e:
-                # Handle exceptions from searchwf
-                print(f"Error in searchwf with filter {i}: {e}")
-                # Optionally continue to the next filter or return/exit
-
-        return documents
+        return results["search"]
 
     except Exception as e:
         # Main function level error handling
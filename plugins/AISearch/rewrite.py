@@ -0,0 +1,129 @@
+import re
+import json
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+from plugins.AISearch.entities import get_entity_extractor, tokenize
+from plugins.registry import get_kernel, get_semantic_plugin, run_prompt
+
+load_dotenv()
+
+# Words that point back to something said earlier in the conversation
+REFERENCE_WORDS = {
+    "it", "its", "they", "them", "their", "theirs", "he", "she", "him", "his", "her", "hers",
+    "this", "that", "these", "those", "former", "latter", "same", "aforementioned",
+}
+# References to an earlier period, which a company name in the ask does not resolve
+PERIOD_REFERENCE = re.compile(
+    r"\b(?:that|this|those|these|the same|said)\s+(?:period|periods|year|years|quarter|quarters|time|fiscal year)\b|\bthen\b",
+    re.IGNORECASE,
+)
+# Follow-up openers that continue the previous question
+FOLLOW_UP = re.compile(r"^\s*(?:and|also|what about|how about|same for|what else)\b", re.IGNORECASE)
+
+RewriteFn = Callable[[str, str], Awaitable[str]]
+RetrieveFn = Callable[[str], Awaitable[Any]]
+
+
+def unresolved_reference(ask: str, chat_history: str) -> Optional[str]:
+    """
+    Why the ask needs the rewrite prompt, or None when it can be searched as it is.
+    Without history there is nothing to resolve. A reference word always needs the rewrite, even next to a
+    company name ("How does it compare to Pfizer?"); an ask without one needs it only when it names no company.
+    """
+    if not chat_history or not chat_history.strip():
+        return None
+    if FOLLOW_UP.search(ask):
+        return "follow-up"
+    if PERIOD_REFERENCE.search(ask):
+        return "period reference"
+    words = sorted(REFERENCE_WORDS.intersection(token for token, _, _ in tokenize(ask)))
+    if words:
+        return f"reference: {', '.join(words)}"
+    extractor = get_entity_extractor()
+    entities, _ = extractor.extract(ask)
+    # Capitalised words the extractor does not know (a company missing from companies.txt), but not FY2019, Q3, ...
+    names = [word for word in extractor.unresolved_words(ask, []) if not any(c.isdigit() for c in word)]
+    if entities["ticker"] or names:
+        return None
+    return "no company"
+
+
+def parse_rewrite(response: str) -> Optional[str]:
+    """
+    The rewritten question from the rewrite prompt output ({"rew_question": ...} or plain text).
+    """
+    text = (response or "").strip().strip("`").strip()
+    if text.startswith("json"):
+        text = text[len("json"):].strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            text = str(value.get("rew_question") or "")
+    except ValueError:
+        pass
+    text = text.strip().strip('"').strip()
+    return text or None
+
+
+def adds_nothing(ask: str, rewritten: str) -> bool:
+    """
+    True when the rewrite only rephrased the ask: every word it uses is already in the ask.
+    """
+    return {token for token, _, _ in tokenize(rewritten)} <= {token for token, _, _ in tokenize(ask)}
+
+
+async def rewrite_with_prompt(ask: str, chat_history: str) -> str:
+    """
+    Resolve the references of `ask` against `chat_history` with ASKProcess/rewrite.
+    """
+    kernel = get_kernel()
+    rewrite = get_semantic_plugin("ASKProcess")["rewrite"]
+    my_context = kernel.create_new_context()
+    my_context["ask"] = ask
+    my_context["chat_history"] = chat_history
+    response = await run_prompt(rewrite, input_context=my_context)
+    return response["input"]
+
+
+class RewriteStage:
+    """
+    Rewrite-then-retrieve for multi-turn chats that keeps the rewrite prompt off the critical path.
+
+    Asks without unresolved references are retrieved as they are. Otherwise retrieval of the original ask
+    starts while the rewrite runs: if the rewrite adds nothing to the ask (or fails) that result is kept,
+    else it is cancelled and the rewritten ask is retrieved. `stats` counts the three outcomes.
+    """
+    def __init__(self, retrieve: RetrieveFn, rewrite: RewriteFn = rewrite_with_prompt):
+        self.retrieve = retrieve
+        self.rewrite = rewrite
+        self.stats = {"skipped": 0, "speculative_hits": 0, "rewritten": 0, "rewrite_errors": 0}
+
+    # Main functions
+
+    async def run(self, ask: str, chat_history: str = "") -> Dict[str, Any]:
+        """
+        Return {"ask" (the ask searched), "original_ask", "retrieval", "decision", "reason"}.
+        """
+        reason = unresolved_reference(ask, chat_history)
+        if reason is None:
+            self.stats["skipped"] += 1
+            return {"ask": ask, "original_ask": ask, "retrieval": await self.retrieve(ask), "decision": "skipped", "reason": None}
+
+        speculative = asyncio.create_task(self.retrieve(ask))
+        try:
+            rewritten = parse_rewrite(await self.rewrite(ask, chat_history))
+        except Exception as e:
+            print(f"Error rewriting the ask: {e}")
+            self.stats["rewrite_errors"] += 1
+            rewritten = None
+
+        if rewritten is None or adds_nothing(ask, rewritten):
+            self.stats["speculative_hits"] += 1
+            return {"ask": ask, "original_ask": ask, "retrieval": await speculative, "decision": "speculative", "reason": reason}
+
+        speculative.cancel()
+        # Consume the outcome so a search that already failed is not reported as never retrieved
+        speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self.stats["rewritten"] += 1
+        return {"ask": rewritten, "original_ask": ask, "retrieval": await self.retrieve(rewritten), "decision": "rewritten", "reason": reason}
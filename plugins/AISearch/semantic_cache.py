@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from plugins.AISearch.embedding_cache import normalize_text
+
+load_dotenv()
+
+# Cache knobs, overridable from .env
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+
+def scope_from_entities(entities) -> str:
+    """
+    Cache scope of an ask: the extracted tickers, country and dates. Asks about different companies
+    or periods never share an answer, however similar their wording.
+    """
+    if not isinstance(entities, dict):
+        return "unscoped"
+    tickers = ",".join(sorted(ticker.upper() for ticker in entities.get("ticker") or []))
+    countries = ",".join(sorted(entities.get("country") or []))
+    dates = "..".join(entities.get("dates") or [])
+    return f"ticker={tickers}|country={countries}|dates={dates}"
+
+
+def scope_has_ticker(scope: str) -> bool:
+    """
+    False for asks no company was extracted from (a lower-case or unknown name): their embeddings are all alike,
+    so only an exact repeat of such an ask may share an answer.
+    """
+    return scope.startswith("ticker=") and not scope.startswith("ticker=|")
+
+
+class _Scope:
+    """
+    In-process vector index of one scope: a matrix of unit vectors and the entry keys in row order.
+    """
+    def __init__(self, dimensions: int):
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self.keys = []
+        self.texts = {}
+
+    def add(self, key, text: str, vector: np.ndarray):
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.keys.append(key)
+        self.texts[text] = key
+
+    def remove(self, key):
+        row = self.keys.index(key)
+        self.vectors = np.delete(self.vectors, row, axis=0)
+        del self.keys[row]
+        self.texts = {text: k for text, k in self.texts.items() if k != key}
+
+    def nearest(self, vector: np.ndarray):
+        if not self.keys:
+            return None, -1.0
+        similarities = self.vectors @ vector
+        row = int(np.argmax(similarities))
+        return self.keys[row], float(similarities[row])
+
+
+class SemanticCache:
+    """
+    Answer cache for the retrieve-and-generate path, keyed by the query embedding.
+    A lookup returns the entry whose ask is the most similar (cosine) within the same scope,
+    if the similarity is above `threshold` and the entry is younger than `ttl` seconds.
+    Entries are evicted least-recently-used beyond `max_entries`; `stats` counts hits, misses, evictions and expirations.
+    """
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = {"hits": 0, "exact_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._entries = OrderedDict()
+        self._scopes: Dict[str, _Scope] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    # Auxiliary Functions
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        scope = self._scopes[entry["scope"]]
+        scope.remove(key)
+        if not scope.keys:
+            del self._scopes[entry["scope"]]
+
+    def _fresh(self, key) -> bool:
+        if self.clock() - self._entries[key]["created_at"] <= self.ttl:
+            return True
+        self._drop(key)
+        self.stats["expirations"] += 1
+        return False
+
+    def _hit(self, key, similarity: float, exact: bool = False) -> Dict[str, Any]:
+        self._entries.move_to_end(key)
+        self.stats["exact_hits" if exact else "hits"] += 1
+        entry = self._entries[key]
+        return {**entry["value"], "similarity": similarity, "cached_ask": entry["ask"]}
+
+    # Main functions
+
+    def get_exact(self, scope: str, ask: str) -> Optional[Dict[str, Any]]:
+        """
+        Lookup by normalized ask only; needs no embedding, so repeated asks cost nothing.
+        """
+        with self._lock:
+            key = self._scopes[scope].texts.get(normalize_text(ask)) if scope in self._scopes else None
+            if key is None or not self._fresh(key):
+                return None
+            return self._hit(key, 1.0, exact=True)
+
+    def get(self, scope: str, vector: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached value of the most similar ask in `scope`, or None.
+        The returned dict also carries the `similarity` and the `cached_ask` that produced it.
+        Scopes without a ticker only answer exact repeats (get_exact).
+        """
+        vector = self._unit(vector)
+        with self._lock:
+            while scope in self._scopes and scope_has_ticker(scope):
+                key, similarity = self._scopes[scope].nearest(vector)
+                if key is None or similarity < self.threshold:
+                    break
+                if self._fresh(key):
+                    return self._hit(key, similarity)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, scope: str, ask: str, vector: List[float], value: Dict[str, Any]):
+        vector = self._unit(vector)
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            if scope not in self._scopes:
+                self._scopes[scope] = _Scope(len(vector))
+            self._scopes[scope].add(key, normalize_text(ask), vector)
+            self._entries[key] = {"scope": scope, "ask": ask, "value": value, "created_at": self.clock()}
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
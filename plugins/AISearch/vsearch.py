@@ -2,11 +2,8 @@ import json
 import semantic_kernel as sk
 import asyncio
 from typing import List, Optional
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery, VectorFilterMode
 from langchain_community.embeddings import AzureOpenAIEmbeddings
-from openai import AzureOpenAI
 from semantic_kernel.plugin_definition import (
     kernel_function,
     kernel_function_context_parameter,
@@ -22,6 +19,15 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+from plugins.AISearch.clients import get_openai_client, get_search_client, get_search_executor
+from plugins.AISearch.embeddings import get_embedding_service
+from plugins.AISearch.entities import extract_entities_locally, normalize_entities
+from plugins.AISearch.pipeline import Pipeline
+from plugins.AISearch.fusion import FusionConfig, hybrid_search
+from plugins.AISearch.backends import LocalSearchIndex
+from plugins.AISearch.context_packer import get_context_packer
+from plugins.AISearch.bitmap_index import ENTITY_FIELD, LOCATION_FIELD, VSEARCH_LOCATION_FILTER, YEAR_FIELD, locations_from_entities, years_from_dates
+from plugins.registry import get_kernel, get_semantic_plugin, run_prompt
 
 
 AZURE_AISEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
@@ -31,14 +37,30 @@ AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 AZURE_OPENAI_EMBEDDINGS_MODEL_NAME = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NAME")
 AZURE_AISEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME")
-credential = AzureKeyCredential(os.getenv("AZURE_SEARCH_KEY"))
+AZURE_AISEARCH_API_KEY = os.getenv("AZURE_SEARCH_KEY")
 embeddings = os.environ["AZURE_OPENAI_EMBEDDINGS_MODEL_NAME"]
 
 
+
+def odata_any(field: str, values) -> Optional[str]:
+    """
+    OData condition matching any of `values`: "field eq 'a'" for one value, "search.in(field, 'a,b', ',')" for several.
+    """
+    values = [str(value) for value in dict.fromkeys(values) if value is not None]
+    if not values:
+        return None
+    if len(values) == 1:
+        escaped = values[0].replace("'", "''")
+        return f"{field} eq '{escaped}'"
+    separator = "|" if any("," in value for value in values) else ","
+    joined = separator.join(values).replace("'", "''")
+    return f"search.in({field}, '{joined}', '{separator}')"
+
+
 class VSearch:
     """
     Python Class that take a user question, preprocess the ask, execute a hybrid search + filter. The latter is executed if a company ticker, location
-    or date is extracted from the ask. If more than one ticker is extracted, one query per ticker is executed. 
+    or date is extracted from the ask. If more than one ticker is extracted, one query covers all of them and the results are split per ticker. 
     Todo: 
         Pos-processing:  the output in caso of ask related to 3 tickers or more
     """
@@ -46,11 +68,9 @@ class VSearch:
         """
         Initialize the VSearch class with required clients and configurations.
         """
-        self.openai_client = AzureOpenAI(
-            api_key=AZURE_OPENAI_API_KEY,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        )
+        self.openai_client = get_openai_client()
+        # Hybrid ranking: fused by Azure (default) or client-side, see VSEARCH_FUSION_* in fusion.FusionConfig
+        self.fusion = FusionConfig.from_env("VSEARCH", top=3, list_size=5)
         self.embeddings = AzureOpenAIEmbeddings(
             azure_deployment="text-embedding-ada-002",
             openai_api_version=AZURE_OPENAI_API_VERSION,
@@ -112,9 +132,27 @@ class VSearch:
             # Handle any exception that occurs during processing
             return [f"Error building query filter: {e}"]
 
+    def build_compact_filter(self, json_object, locations: bool = VSEARCH_LOCATION_FILTER) -> Optional[str]:
+        """
+        One OData expression for the whole ask: every ticker and every year of the dates interval, e.g.
+        search.in(referenced_entity, 'MMM,PFE', ',') and search.in(referenced_year, '2015,2016,2017', ',').
+        The locations are a hard filter only with `locations` (VSEARCH_LOCATION_FILTER=true).
+        """
+        if not isinstance(json_object, dict):
+            raise TypeError("json_object must be a dictionary")
+        conditions = [
+            odata_any(ENTITY_FIELD, [ticker.upper() for ticker in json_object.get("ticker") or []]),
+            odata_any(LOCATION_FIELD, locations_from_entities(json_object)) if locations else None,
+            odata_any(YEAR_FIELD, years_from_dates(json_object.get("dates"))),
+        ]
+        conditions = [condition for condition in conditions if condition]
+        return " and ".join(conditions) if conditions else None
+
     def format_search_results(self, documents, metadata_filters=None, score_include=False):
         """
         The AI search returns an iterator over the Index, so this function extracts the document text and metadata.
+        The results are packed into the CONTEXT_MAX_TOKENS prompt budget (context_packer): duplicates dropped,
+        the budget shared fairly between the filters (tickers) and the last chunk cut at a sentence boundary.
         """        
         if not any(doc.get("retrieved_info") for doc in documents):
             return f"No documents found for this question's related search: {metadata_filters}"
@@ -124,18 +162,28 @@ class VSearch:
 
         # Format and return search results
         try:
-            processed_texts = []
+            groups = []
             for document in documents:
+                if document.get("error"):
+                    continue
                 if score_include:
                     # Use the original result object without filtering
-                    results_to_process = document["retrieved_info"]
+                    groups.append(document["retrieved_info"])
                 else:
                     # Use filtered result
-                    results_to_process = [extract_fields(result) for result in document["retrieved_info"]]
+                    groups.append([extract_fields(result) for result in document["retrieved_info"]])
+            packed_groups, _ = get_context_packer().pack(groups, "document", self.result_to_string, source_field="filename")
+            packed = iter(packed_groups)
 
+            processed_texts = []
+            for document in documents:
+                if document.get("error"):
+                    # Keep the other filters' results and say which search failed
+                    processed_texts.append(f"Search failed for filter {document['filter']}: {document['error']}")
+                    continue
                 joined_text = "\n\n".join(
                     self.result_to_string(result)
-                    for result in results_to_process
+                    for result in next(packed)
                 )
                 processed_texts.append(joined_text)
 
@@ -159,17 +207,116 @@ class VSearch:
     def result_to_string(self, result):
         return "\n".join(f"{key}: {value}" for key, value in result.items())
 
+    SEARCH_FIELDS = ["document", "id", "referenced_entity", "referenced_year", "filename"]
+
+    def search_index(self, search_client, ask, vector_query, filter=None, fusion: Optional[FusionConfig] = None):
+        """
+        Run one hybrid search (with pre-filter if given) and materialize the results.
+        The SearchClient is lazy, so iterating here keeps the HTTP call inside the worker thread.
+        """
+        return hybrid_search(
+            search_client,
+            ask,
+            vector_query,
+            fusion or self.fusion,
+            filter=filter,
+            select=self.SEARCH_FIELDS,
+            executor=get_search_executor(),
+        )
+
     # Auxiliary function: Async
 
-    async def generate_embeddings(self, text: str) -> Optional[List[float]]:
+    async def run_searches(self, search_client, ask, vector_query, metadata_filters=None):
+        """
+        Run the per-filter searches concurrently on the shared search thread pool.
+        Documents keep the order of `metadata_filters`; a failed filter is reported in its own entry
+        ("error") instead of failing the whole retrieval.
+        """
+        loop = asyncio.get_running_loop()
+        executor = get_search_executor()
+        filters = metadata_filters if metadata_filters else [None]
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, self.search_index, search_client, ask, vector_query, filter)
+                for filter in filters
+            ),
+            return_exceptions=True,
+        )
+        documents = []
+        for filter, result in zip(filters, results):
+            if isinstance(result, Exception):
+                print(f"Error in search with filter {filter}: {result}")
+                documents.append({"filter": filter, "retrieved_info": [], "error": str(result)})
+            else:
+                documents.append({"filter": filter, "retrieved_info": result})
+        return documents
+
+    async def run_grouped_search(self, search_client, ask, vector_query, entities):
+        """
+        One request for the whole ask (build_compact_filter) with a page of `top` documents per ticker,
+        split client-side into one document group per ticker. Only if that page came back full and some ticker
+        got fewer than `top` documents, that ticker is searched again on its own; if the combined request fails,
+        every ticker is searched on its own.
+        """
+        loop = asyncio.get_running_loop()
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in entities.get("ticker") or [])) or [None]
+        top = self.fusion.top
+        page = self.fusion.with_top(top * len(tickers))
+        filters = {ticker: self.build_compact_filter({**entities, "ticker": [ticker] if ticker else None}) for ticker in tickers}
+        page_query = VectorizedQuery(
+            vector=vector_query.vector,
+            k_nearest_neighbors=max(vector_query.k_nearest_neighbors or 0, page.top),
+            fields=vector_query.fields,
+        )
+
+        try:
+            results = await loop.run_in_executor(
+                get_search_executor(), self.search_index, search_client, ask, page_query, self.build_compact_filter(entities), page
+            )
+        except Exception as e:
+            print(f"Error in combined search for entities {entities}: {e}")
+            return await self.run_searches(search_client, ask, vector_query, list(filters.values()))
+
+        groups = {ticker: [] for ticker in tickers}
+        for result in results:
+            ticker = str(result.get(ENTITY_FIELD) or "").upper() if tickers != [None] else None
+            if ticker in groups and len(groups[ticker]) < top:
+                groups[ticker].append(result)
+        documents = {ticker: {"filter": filters[ticker], "retrieved_info": groups[ticker]} for ticker in tickers}
+
+        short = [ticker for ticker in tickers if len(groups[ticker]) < top]
+        if short and len(results) >= page.top:
+            # A ticker crowded out by the others: one follow-up search per such ticker
+            retried = await self.run_searches(search_client, ask, vector_query, [filters[ticker] for ticker in short])
+            documents.update(zip(short, retried))
+        return list(documents.values())
+
+    async def run_local_search(self, search_client: LocalSearchIndex, ask, vector_query, entities):
         """
-        Generates embeddings for the given text using Azure OpenAI.                
+        Local backend: every ticker and the whole dates interval (and the locations, when filtered) become bitmaps
+        of the index metadata, and one filtered scan returns the top documents of each ticker.
         """
+        loop = asyncio.get_running_loop()
         try:
-            response = self.openai_client.embeddings.create(
-                input=[text], model=AZURE_OPENAI_EMBEDDINGS_MODEL_NAME
+            groups = await loop.run_in_executor(
+                get_search_executor(), search_client.search_entities, ask, vector_query, entities, self.SEARCH_FIELDS, self.fusion.top
             )
-            return response.data[0].embedding
+        except Exception as e:
+            print(f"Error in local search for entities {entities}: {e}")
+            return [{"filter": None, "retrieved_info": [], "error": str(e)}]
+        return [
+            {"filter": f"referenced_entity eq '{ticker}'" if ticker else None, "retrieved_info": results}
+            for ticker, results in groups.items()
+        ]
+
+    async def generate_embeddings(self, text: str) -> Optional[List[float]]:
+        """
+        Generates embeddings for the given text using Azure OpenAI.
+        The request goes through the shared async embedding service, so it does not block the event loop
+        and is batched with concurrent asks from other sessions.
+        """
+        try:
+            return await get_embedding_service().embed(text)
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             return None
@@ -177,27 +324,87 @@ class VSearch:
     async def extract_entities(self, context):
         """
         Extract entities using kernel and plugins.
+        Asks the local extractor resolves with enough confidence (known company, ISO country, FY/quarter dates)
+        skip the LLM call.
         Todo: 
         -add ticker reference dinamically to prompt to increasy precision of the ticker extraction. Ticker
             reference come from the unique values of the field 'referenced_entity'.
         """
+        entities = extract_entities_locally(context["input"]["ask"])
+        if entities is not None:
+            return entities
         try:
-            kernel = sk.Kernel()
-            kernel.add_chat_service("chat_completion", self.azure_chat_service)
-            kernel.add_text_embedding_generation_service("ada", self.azure_text_embedding)
-            pluginASKT = kernel.import_semantic_plugin_from_directory("plugins", "ASKProcess")
+            # Shared kernel and compiled prompt plugin (reloaded only when the prompt files change)
+            kernel = get_kernel()
+            pluginASKT = get_semantic_plugin("ASKProcess")
             extract_entities = pluginASKT["extractEntities"]
 
             my_context = kernel.create_new_context()
             my_context["ask"] = context["input"]["ask"]
 
-            response = await kernel.run(extract_entities, input_context=my_context)
-            return self.string_to_json(response["input"])
+            response = await run_prompt(extract_entities, input_context=my_context)
+            # Same country codes as the local extractor ("UK" -> "GB")
+            return normalize_entities(self.string_to_json(response["input"]))
         except Exception as e:
             error_message = f"Error occurred while extracting entities: {e}"
             print(error_message)
             return error_message
 
+    def filters_from_entities(self, entities):
+        """
+        Build the metadata filter (one compact expression for all tickers and years),
+        falling back to an unfiltered search if entity extraction failed.
+        """
+        if not isinstance(entities, dict):
+            return None
+        compact_filter = self.build_compact_filter(entities)
+        return [compact_filter] if compact_filter else None
+
+    async def retrieve(self, ask: str, entities=None, vector: Optional[List[float]] = None) -> dict:
+        """
+        Retrieval pipeline as a dependency graph:
+
+            extract_entities -> build_filters --+
+                                                +--> search
+            embed_query ------------------------+
+
+        Entity extraction (LLM) and query embedding only depend on the raw ask, so they run together;
+        the searches start as soon as both the filters and the vector are ready.
+        Entities or a query vector the caller already has are reused instead of being computed again.
+        Returns the entities, filters, documents and per-stage timings (ms).
+        """
+        search_client = get_search_client(
+            AZURE_AISEARCH_ENDPOINT,
+            AZURE_AISEARCH_INDEX_NAME,
+            AZURE_AISEARCH_API_KEY,
+        )
+
+        async def search(metadata_filters, vquery, entities):
+            vector_query = VectorizedQuery(
+                vector=vquery, k_nearest_neighbors=5, fields="embedding"
+            )
+            if isinstance(search_client, LocalSearchIndex) and isinstance(entities, dict):
+                return await self.run_local_search(search_client, ask, vector_query, entities)
+            if isinstance(entities, dict):
+                # One request for every ticker, split into per-ticker top-k
+                return await self.run_grouped_search(search_client, ask, vector_query, entities)
+            # Entity extraction failed: a single unfiltered search
+            return await self.run_searches(search_client, ask, vector_query, metadata_filters)
+
+        pipeline = Pipeline()
+        pipeline.add("extract_entities", lambda: entities if entities is not None else self.extract_entities({"input": {"ask": ask}}))
+        pipeline.add("embed_query", lambda: vector if vector is not None else self.generate_embeddings(ask))
+        pipeline.add("build_filters", self.filters_from_entities, "extract_entities")
+        pipeline.add("search", search, "build_filters", "embed_query", "extract_entities")
+        results = await pipeline.run()
+
+        return {
+            "entities": results["extract_entities"],
+            "filters": results["build_filters"],
+            "documents": results["search"],
+            "timings": pipeline.timings,
+        }
+
     # Main native function
 
     @kernel_function(
@@ -208,65 +415,14 @@ class VSearch:
     async def retrieve_documents(self, context: KernelContext) -> str:
         try:
 
-            entities = await self.extract_entities(context)
-
-            metadata_filters = self.build_query_filter(entities)            
-
-            search_client = SearchClient(
-                AZURE_AISEARCH_ENDPOINT,
-                AZURE_AISEARCH_INDEX_NAME,
-                credential=credential,
-            )
-
-            vquery = await self.generate_embeddings(context["input"]["ask"])
-
-            vector_query = VectorizedQuery(
-                vector=vquery, k_nearest_neighbors=5, fields="embedding"
-            )
-
-            # this list only aply if metada filter
-            documents = []
-
-            if metadata_filters:
-                for filter in metadata_filters:
-                    results = search_client.search(
-                        search_text=context["input"]["ask"],
-                        vector_queries=[vector_query],
-                        vector_filter_mode=VectorFilterMode.PRE_FILTER,
-                        filter=filter,
-                        select=[
-                            "document",
-                            "id",
-                            "referenced_entity",
-                            "referenced_year",
-                            "filename",
-                        ],
-                        top=3,
-                    )
-                    retrieved_info = [
-                        dict(result) for result in results
-                    ]  # Convert results to list of dicts                    
-                    documents.append(
-                         {"filter": filter, "retrieved_info": retrieved_info}
-                    )
-            else:
-                results = search_client.search(
-                    search_text=context["input"]["ask"],
-                    vector_queries=[vector_query],
-                    select=[
-                        "document",
-                        "id",
-                        "referenced_entity",
-                        "referenced_year",
-                        "filename",
-                    ],
-                    top=3,
-                )
-                retrieved_info = [dict(result) for result in results]                
-                documents.append({"filter": None, "retrieved_info": retrieved_info})
+            retrieval = await self.retrieve(context["input"]["ask"])
+            documents = retrieval["documents"]
+            metadata_filters = retrieval["filters"]
+            # Expose per-stage timings to the caller
+            context["input"]["timings"] = retrieval["timings"]
 
             # Process each 'retrieved_info' in the documents            
-            final_document = self.format_search_results(documents, filter, score_include=context["input"]['score_include'])
+            final_document = self.format_search_results(documents, metadata_filters, score_include=context["input"]['score_include'])
 
             return final_document
 
@@ -0,0 +1,197 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from plugins.AISearch.context_packer import count_tokens, truncate_to_tokens
+from plugins.registry import get_kernel, get_semantic_plugin, run_prompt
+
+load_dotenv()
+
+# Turns kept word for word; older turns are folded into the rolling summary
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+# Hard ceiling on the rendered chat_history (summary + turns), whatever the session length
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "1500"))
+# Share of the ceiling the summary may take
+HISTORY_SUMMARY_SHARE = float(os.getenv("HISTORY_SUMMARY_SHARE", "0.4"))
+
+Turn = Tuple[str, str]
+
+
+async def summarize_with_prompt(summary: str, chat_history: str) -> str:
+    """
+    Fold `chat_history` into `summary` with ASKProcess/summarizeHistory.
+    """
+    kernel = get_kernel()
+    summarize_history = get_semantic_plugin("ASKProcess")["summarizeHistory"]
+    my_context = kernel.create_new_context()
+    my_context["summary"] = summary
+    my_context["chat_history"] = chat_history
+    response = await run_prompt(summarize_history, input_context=my_context)
+    return response["input"].strip()
+
+
+class ConversationHistory:
+    """
+    Chat history for the chat_history prompt variable: the last `keep_turns` turns verbatim and a rolling
+    summary of everything older, rendered within `max_tokens`.
+
+    Summarization runs as a background task on the event loop, off the critical path: render() never waits
+    for it. Turns not folded yet are rendered verbatim (newest first within the ceiling) until the summary catches up.
+    `turn_count` counts every turn ever added, so states saved by different workers can be merged (merge_dict).
+    """
+    def __init__(
+        self,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        max_tokens: int = HISTORY_MAX_TOKENS,
+        summarize: Callable[[str, str], Awaitable[str]] = summarize_with_prompt,
+        counter: Callable[[str], int] = count_tokens,
+        user_label: str = "User:",
+        assistant_label: str = "Assistant:",
+    ):
+        self.keep_turns = keep_turns
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.counter = counter
+        self.user_label = user_label
+        self.assistant_label = assistant_label
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.pending: List[Turn] = []
+        self.turn_count = 0
+        self.stats = {"turns": 0, "summaries": 0, "summary_errors": 0}
+        # Called after every new summary, e.g. to persist the session it belongs to
+        self.on_summary: Optional[Callable[[], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Auxiliary Functions
+
+    def format_turn(self, turn: Turn) -> str:
+        user, assistant = turn
+        return f"{self.user_label} {user}\n{self.assistant_label} {assistant}\n"
+
+    def _folded(self) -> int:
+        # Number of turns covered by the summary
+        return self.turn_count - len(self.pending) - len(self.turns)
+
+    def _schedule(self):
+        if not self.pending or (self._task is not None and not self._task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (synchronous caller): the turns are folded on the next add_turn() or flush()
+            return
+        self._task = loop.create_task(self._fold_pending())
+
+    async def _fold_pending(self):
+        while self.pending:
+            batch = list(self.pending)
+            covered = self._folded() + len(batch)
+            try:
+                summary = await self.summarize(self.summary, "".join(self.format_turn(turn) for turn in batch))
+            except Exception as e:
+                print(f"Error occurred while summarizing the chat history: {e}")
+                self.stats["summary_errors"] += 1
+                return
+            if self._folded() >= covered:
+                # A summary covering these turns was merged in (merge_dict) while the model was summarizing
+                continue
+            # Turns added while the model was summarizing stay pending for the next round
+            del self.pending[:covered - self._folded()]
+            self.summary = truncate_to_tokens(summary, int(self.max_tokens * HISTORY_SUMMARY_SHARE), self.counter)
+            self.stats["summaries"] += 1
+            if self.on_summary is not None:
+                self.on_summary()
+
+    # Main functions
+
+    def add_turn(self, user: str, assistant: str):
+        """
+        Record one exchange; turns beyond `keep_turns` are queued for the rolling summary.
+        """
+        self.turns.append((str(user), str(assistant)))
+        self.turn_count += 1
+        self.stats["turns"] += 1
+        while len(self.turns) > self.keep_turns:
+            self.pending.append(self.turns.pop(0))
+        self._schedule()
+
+    async def flush(self):
+        """
+        Wait until every queued turn is folded into the summary (end of session, tests).
+        """
+        if self._task is not None and not self._task.done():
+            await self._task
+        if self.pending:
+            await self._fold_pending()
+
+    def render(self) -> str:
+        """
+        Summary and turns, newest turns first to claim the budget, within `max_tokens`.
+        """
+        remaining = self.max_tokens
+        blocks = []
+        for turn in reversed(self.pending + self.turns):
+            text = self.format_turn(turn)
+            tokens = self.counter(text)
+            if tokens > remaining:
+                if not blocks:
+                    # The last turn alone is over the ceiling: keep its beginning
+                    blocks.append(truncate_to_tokens(text, remaining, self.counter) + "\n")
+                remaining = 0
+                break
+            blocks.append(text)
+            remaining -= tokens
+        if self.summary and remaining > 0:
+            summary = truncate_to_tokens(f"Summary of the earlier conversation:\n{self.summary}\n", remaining, self.counter)
+            if summary:
+                blocks.append(summary + "\n")
+        return "".join(reversed(blocks))
+
+    def to_dict(self) -> dict:
+        return {
+            "summary": self.summary,
+            "turns": [list(turn) for turn in self.turns],
+            "pending": [list(turn) for turn in self.pending],
+            "turn_count": self.turn_count,
+        }
+
+    def load_dict(self, state: dict):
+        """
+        Restore the state saved by to_dict() (session stores); pending turns are summarized on the next add_turn().
+        """
+        self.summary = state.get("summary") or ""
+        self.turns = [tuple(turn) for turn in state.get("turns") or []]
+        self.pending = [tuple(turn) for turn in state.get("pending") or []]
+        self.turn_count = int(state.get("turn_count") or len(self.pending) + len(self.turns))
+
+    def merge_dict(self, state: dict):
+        """
+        Merge a state of the same conversation saved by another worker: the summary covering the most turns
+        is kept, and every turn it does not cover is kept once, in order.
+        """
+        other = ConversationHistory(keep_turns=self.keep_turns)
+        other.load_dict(state)
+        turns = {}
+        for history in (other, self):
+            unfolded = history.pending + history.turns
+            for i, turn in enumerate(unfolded, start=history.turn_count - len(unfolded)):
+                turns.setdefault(i, turn)
+        if other._folded() > self._folded():
+            self.summary = other.summary
+            folded = other._folded()
+        else:
+            folded = self._folded()
+        unfolded = [turns[i] for i in sorted(turns) if i >= folded]
+        split = max(0, len(unfolded) - self.keep_turns)
+        self.pending, self.turns = unfolded[:split], unfolded[split:]
+        self.turn_count = folded + len(unfolded)
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+        self.pending = []
+        self.turn_count = 0
+
+    def __str__(self) -> str:
+        return self.render()
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cache knobs, overridable from .env. An empty PROMPT_CACHE_PATH keeps the cache in memory only.
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMPT_CACHE_PATH = os.getenv("PROMPT_CACHE_PATH", os.path.join(ROOT_DIR, ".cache", "prompts.sqlite"))
+PROMPT_CACHE_TTL_SECONDS = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "604800"))
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "100000"))
+# Completions sampled above this temperature are not reused
+PROMPT_CACHE_MAX_TEMPERATURE = float(os.getenv("PROMPT_CACHE_MAX_TEMPERATURE", "0.0"))
+
+
+def settings_dict(settings) -> Dict[str, Any]:
+    """
+    Execution settings of a prompt function as a plain dict (AIRequestSettings or dict).
+    """
+    if settings is None:
+        return {}
+    if isinstance(settings, dict):
+        return dict(settings)
+    if hasattr(settings, "model_dump"):
+        return settings.model_dump(exclude_none=True)
+    return dict(vars(settings))
+
+
+def is_deterministic(settings: Dict[str, Any], max_temperature: float = PROMPT_CACHE_MAX_TEMPERATURE) -> bool:
+    """
+    A completion is reusable only when one response is sampled at (near) zero temperature.
+    """
+    if settings.get("stream") or settings.get("tools") or settings.get("functions"):
+        return False
+    if int(settings.get("number_of_responses") or 1) != 1:
+        return False
+    return float(settings.get("temperature", 1.0)) <= max_temperature
+
+
+class PromptCache:
+    """
+    Exact-match cache of prompt function completions, keyed by plugin, function, rendered prompt,
+    model and execution settings. Rows are stored with the plugin version (see KernelRegistry.plugin_version):
+    a row written before skprompt.txt/config.json changed is dropped on lookup, as is a row older than `ttl` seconds.
+    `stats` counts hits, misses, expirations, invalidations, evictions and calls bypassed as non-deterministic.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = PROMPT_CACHE_PATH,
+        ttl: float = PROMPT_CACHE_TTL_SECONDS,
+        max_entries: int = PROMPT_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = {"hits": 0, "misses": 0, "expirations": 0, "invalidations": 0, "evictions": 0, "bypassed": 0}
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, plugin TEXT, function TEXT, version REAL, completion TEXT, created_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_created_at ON completions(created_at)")
+        self._db.commit()
+
+    # Auxiliary Functions
+
+    @staticmethod
+    def make_key(plugin: str, function: str, prompt: str, model: str, settings: Dict[str, Any]) -> str:
+        settings_json = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha256(f"{plugin}\x1f{function}\x1f{model}\x1f{settings_json}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+    def _trim(self):
+        # Amortized: only count rows every few hundred writes
+        self._puts_since_trim += 1
+        if self._puts_since_trim < 256:
+            return
+        self._puts_since_trim = 0
+        self._db.execute("DELETE FROM completions WHERE created_at < ?", (self.clock() - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY created_at ASC LIMIT ?)",
+                (excess,),
+            )
+            self.stats["evictions"] += excess
+
+    # Main functions
+
+    def get(self, key: str, version: float = 0.0) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT completion, version, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            completion, row_version, created_at = row
+            if row_version != version or self.clock() - created_at > self.ttl:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+                self.stats["invalidations" if row_version != version else "expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return completion
+
+    def put(self, key: str, completion: str, plugin: str = "", function: str = "", version: float = 0.0):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, plugin, function, version, completion, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, plugin, function, version, completion, self.clock()),
+            )
+            self._trim()
+            self._db.commit()
+
+    def invalidate(self, plugin: Optional[str] = None):
+        """
+        Drop every row (of one plugin).
+        """
+        with self._lock:
+            if plugin is None:
+                self._db.execute("DELETE FROM completions")
+            else:
+                self._db.execute("DELETE FROM completions WHERE plugin = ?", (plugin,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[PromptCache] = None
+
+
+def get_prompt_cache() -> Optional[PromptCache]:
+    """
+    Return the process-wide prompt cache, or None with PROMPT_CACHE_ENABLED=false.
+    """
+    global _cache
+    if _cache is None and PROMPT_CACHE_ENABLED:
+        _cache = PromptCache()
+    return _cache
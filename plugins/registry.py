@@ -0,0 +1,243 @@
+import os
+import glob
+import time
+import threading
+from typing import Dict, Optional
+import httpx
+import semantic_kernel as sk
+from openai import AsyncAzureOpenAI
+from semantic_kernel import ContextVariables, KernelContext, KernelFunctionBase
+from semantic_kernel.semantic_functions.prompt_template import PromptTemplate
+from semantic_kernel.semantic_functions.prompt_template_config import PromptTemplateConfig
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion, AzureTextEmbedding
+from dotenv import load_dotenv
+from plugins.AISearch.cassette import AsyncCassetteTransport, get_cassette, replay_settings
+from plugins.prompt_cache import PromptCache, get_prompt_cache, is_deterministic, settings_dict
+
+load_dotenv()
+
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+AZURE_OPENAI_EMBEDDINGS_MODEL_NAME = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NAME")
+# API version semantic-kernel uses for its own Azure OpenAI clients
+SK_OPENAI_API_VERSION = "2023-05-15"
+
+PLUGINS_DIR = os.path.dirname(os.path.abspath(__file__))
+# How often (seconds) a plugin directory is stat'ed for changes
+PLUGIN_RELOAD_CHECK_SECONDS = float(os.getenv("PLUGIN_RELOAD_CHECK_SECONDS", "2"))
+
+
+class KernelRegistry:
+    """
+    Process-wide kernel with its services registered once and the prompt plugins
+    (ASKProcess, FinanceGenerator, QAPlugin, ...) read and compiled once.
+    A prompt plugin is reloaded only when one of its skprompt.txt/config.json files (or the set of functions) changes,
+    so requests no longer pay disk I/O and template parsing.
+    Prompt functions invoked through `run_prompt` reuse the completion of an identical, deterministic call.
+    """
+    def __init__(
+        self,
+        plugins_dir: str = PLUGINS_DIR,
+        check_interval: float = PLUGIN_RELOAD_CHECK_SECONDS,
+        prompt_cache: Optional[PromptCache] = None,
+    ):
+        self.plugins_dir = plugins_dir
+        self.check_interval = check_interval
+        self.prompt_cache = prompt_cache
+        self.stats = {"loads": 0, "reloads": 0}
+        self._kernel = None
+        self._semantic_plugins = {}
+        self._native_plugins = {}
+        self._lock = threading.RLock()
+
+    # Auxiliary Functions
+
+    def _async_client(self, api_key, endpoint) -> Optional[AsyncAzureOpenAI]:
+        """
+        With GENAI_SERVICE_MODE=record or replay, the kernel services call Azure OpenAI through the cassette.
+        """
+        cassette = get_cassette()
+        if cassette is None:
+            return None
+        api_key, endpoint, api_version = replay_settings(api_key, endpoint, SK_OPENAI_API_VERSION)
+        transport = AsyncCassetteTransport(cassette, httpx.AsyncHTTPTransport())
+        return AsyncAzureOpenAI(
+            api_key=api_key, azure_endpoint=endpoint, api_version=api_version, http_client=httpx.AsyncClient(transport=transport)
+        )
+
+    def _create_kernel(self) -> sk.Kernel:
+        kernel = sk.Kernel()
+        api_key, endpoint, _ = replay_settings(AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT)
+        kernel.add_chat_service(
+            "chat_completion",
+            AzureChatCompletion(
+                deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
+                endpoint=endpoint,
+                api_key=api_key,
+                async_client=self._async_client(api_key, endpoint),
+            ),
+        )
+        kernel.add_text_embedding_generation_service(
+            "ada",
+            AzureTextEmbedding(
+                deployment_name=AZURE_OPENAI_EMBEDDINGS_MODEL_NAME,
+                endpoint=endpoint,
+                api_key=api_key,
+                async_client=self._async_client(api_key, endpoint),
+            ),
+        )
+        return kernel
+
+    def plugin_version(self, plugin_name: str) -> float:
+        """
+        Latest mtime of the plugin directory and of every prompt/config file in it.
+        """
+        plugin_directory = os.path.join(self.plugins_dir, plugin_name)
+        paths = [plugin_directory]
+        for directory in glob.glob(os.path.join(plugin_directory, "*", "")):
+            paths.append(directory)
+            paths.extend(os.path.join(directory, name) for name in ("skprompt.txt", "config.json"))
+        return max((os.stat(path).st_mtime for path in paths if os.path.exists(path)), default=0.0)
+
+    def _load_templates(self, plugin_name: str) -> Dict[str, PromptTemplate]:
+        """
+        The prompt templates of a plugin, read as the kernel reads them, to render a call's prompt for the cache key.
+        """
+        templates = {}
+        for directory in glob.glob(os.path.join(self.plugins_dir, plugin_name, "*", "")):
+            prompt_path = os.path.join(directory, "skprompt.txt")
+            if not os.path.exists(prompt_path):
+                continue
+            with open(os.path.join(directory, "config.json"), "r") as config_file:
+                config = PromptTemplateConfig.from_json(config_file.read())
+            with open(prompt_path, "r") as prompt_file:
+                template = PromptTemplate(prompt_file.read(), self.kernel().prompt_template_engine, config)
+            templates[os.path.basename(os.path.dirname(directory))] = template
+        return templates
+
+    def _cache_key(self, function: KernelFunctionBase, prompt: str) -> Optional[str]:
+        settings = settings_dict(function.request_settings)
+        if not is_deterministic(settings):
+            return None
+        service = getattr(function, "_ai_service", None)
+        model = getattr(service, "ai_model_id", None) or AZURE_OPENAI_DEPLOYMENT_NAME or ""
+        return PromptCache.make_key(function.plugin_name, function.name, prompt, model, settings)
+
+    # Main functions
+
+    def kernel(self) -> sk.Kernel:
+        if self._kernel is None:
+            with self._lock:
+                if self._kernel is None:
+                    self._kernel = self._create_kernel()
+        return self._kernel
+
+    def semantic_plugin(self, plugin_name: str) -> Dict[str, KernelFunctionBase]:
+        """
+        Return the compiled functions of a prompt plugin, loading it on first use and whenever its files change.
+        """
+        now = time.monotonic()
+        entry = self._semantic_plugins.get(plugin_name)
+        if entry is not None and now - entry["checked_at"] < self.check_interval:
+            return entry["functions"]
+
+        with self._lock:
+            entry = self._semantic_plugins.get(plugin_name)
+            version = self.plugin_version(plugin_name)
+            if entry is not None and entry["version"] == version:
+                entry["checked_at"] = now
+                return entry["functions"]
+
+            functions = self.kernel().import_semantic_plugin_from_directory(self.plugins_dir, plugin_name)
+            self.stats["reloads" if entry is not None else "loads"] += 1
+            self._semantic_plugins[plugin_name] = {
+                "functions": functions, "templates": self._load_templates(plugin_name), "version": version, "checked_at": now,
+            }
+            return functions
+
+    async def run_prompt(
+        self,
+        function: KernelFunctionBase,
+        input_context: Optional[KernelContext] = None,
+        input_vars: Optional[ContextVariables] = None,
+    ) -> KernelContext:
+        """
+        kernel.run for a prompt function of a registered plugin, answered from the prompt cache when the same prompt
+        was completed before with the same model and deterministic settings (temperature 0, one response).
+        """
+        kernel = self.kernel()
+        cache = self.prompt_cache or get_prompt_cache()
+        entry = self._semantic_plugins.get(function.plugin_name)
+        template = entry["templates"].get(function.name) if entry is not None else None
+        if cache is None or template is None:
+            return await kernel.run(function, input_context=input_context, input_vars=input_vars)
+
+        context = input_context if input_context is not None else kernel.create_new_context(input_vars)
+        key = self._cache_key(function, await template.render(context))
+        if key is None:
+            cache.stats["bypassed"] += 1
+            return await kernel.run(function, input_context=context)
+
+        completion = cache.get(key, entry["version"])
+        if completion is not None:
+            response = kernel.create_new_context(ContextVariables(variables=dict(context.variables.variables)))
+            response.variables.update(completion)
+            return response
+
+        response = await kernel.run(function, input_context=context)
+        if not response.error_occurred and response["input"]:
+            cache.put(key, response["input"], function.plugin_name, function.name, entry["version"])
+        return response
+
+    def native_plugin(self, plugin_instance, plugin_name: str) -> Dict[str, KernelFunctionBase]:
+        """
+        Import a native plugin once per name; later calls return the functions already registered.
+        """
+        functions = self._native_plugins.get(plugin_name)
+        if functions is None:
+            with self._lock:
+                functions = self._native_plugins.get(plugin_name)
+                if functions is None:
+                    functions = self.kernel().import_plugin(plugin_instance=plugin_instance, plugin_name=plugin_name)
+                    self._native_plugins[plugin_name] = functions
+        return functions
+
+    def preload(self):
+        """
+        Load every prompt plugin under the plugins directory (those with at least one skprompt.txt).
+        """
+        for directory in sorted(glob.glob(os.path.join(self.plugins_dir, "*", ""))):
+            plugin_name = os.path.basename(os.path.dirname(directory))
+            if glob.glob(os.path.join(directory, "*", "skprompt.txt")):
+                self.semantic_plugin(plugin_name)
+
+
+_registry: Optional[KernelRegistry] = None
+
+
+def get_registry() -> KernelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = KernelRegistry()
+    return _registry
+
+
+def get_kernel() -> sk.Kernel:
+    return get_registry().kernel()
+
+
+def get_semantic_plugin(plugin_name: str) -> Dict[str, KernelFunctionBase]:
+    return get_registry().semantic_plugin(plugin_name)
+
+
+def get_native_plugin(plugin_instance, plugin_name: str) -> Dict[str, KernelFunctionBase]:
+    return get_registry().native_plugin(plugin_instance, plugin_name)
+
+
+async def run_prompt(
+    function: KernelFunctionBase,
+    input_context: Optional[KernelContext] = None,
+    input_vars: Optional[ContextVariables] = None,
+) -> KernelContext:
+    return await get_registry().run_prompt(function, input_context=input_context, input_vars=input_vars)
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+from plugins.history import ConversationHistory
+from plugins.AISearch.embedding_cache import normalize_text
+
+try:
+    import redis
+except ImportError:
+    # Only needed for SESSION_STORE=redis with a REDIS_URL
+    redis = None
+
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Session knobs, overridable from .env. SESSION_STORE is memory, sqlite or redis.
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(ROOT_DIR, ".cache", "sessions.sqlite"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+# Retrievals cached per session (most recent asks)
+SESSION_MAX_RETRIEVALS = int(os.getenv("SESSION_MAX_RETRIEVALS", "8"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+class SessionStore(ABC):
+    """
+    Per-session chat state (JSON-serializable dicts) shared by every worker process, expired after `ttl` seconds
+    without writes:
+
+        get(session_id) -> dict or None
+        put(session_id, state)
+        update(session_id, merge): put(session_id, merge(stored state or None)), atomic where the store allows it
+        delete(session_id)
+        close()
+    """
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.clock = clock
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: Dict[str, Any]):
+        ...
+
+    def update(self, session_id: str, merge: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]):
+        # Not atomic: stores that can lock or watch the row override this
+        self.put(session_id, merge(self.get(session_id)))
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Single-process store (tests, one worker). States are kept serialized so callers never share objects.
+    """
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        super().__init__(ttl, clock)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def evict_expired(self) -> int:
+        now = self.clock()
+        with self._lock:
+            expired = [session_id for session_id, (expires_at, _) in self._sessions.items() if expires_at <= now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._sessions[session_id]
+                return None
+            return json.loads(entry[1])
+
+    def put(self, session_id: str, state: Dict[str, Any]):
+        with self._lock:
+            self._sessions[session_id] = (self.clock() + self.ttl, json.dumps(state))
+            self._sessions.move_to_end(session_id)
+            # Writes are in expiry order, so the expired sessions are at the front
+            while self._sessions and next(iter(self._sessions.values()))[0] <= self.clock():
+                self._sessions.popitem(last=False)
+
+    def update(self, session_id: str, merge: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            stored = json.loads(entry[1]) if entry is not None and entry[0] > self.clock() else None
+            self._sessions[session_id] = (self.clock() + self.ttl, json.dumps(merge(stored)))
+            self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    File-backed store: survives restarts and is shared by the workers of one host (WAL mode).
+    """
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl: float = SESSION_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        super().__init__(ttl, clock)
+        self.path = path
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT, expires_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions(expires_at)")
+        self._db.commit()
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (self.clock(),)).rowcount
+            self._db.commit()
+        return deleted
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, self.clock())
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, session_id: str, state: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, expires_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state), self.clock() + self.ttl),
+            )
+            self._db.commit()
+            self._puts_since_evict += 1
+        # Amortized: expired rows are only swept every few hundred writes
+        if self._puts_since_evict >= 256:
+            self._puts_since_evict = 0
+            self.evict_expired()
+
+    def update(self, session_id: str, merge: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]):
+        with self._lock:
+            # The write lock is taken before the read, so another worker cannot save in between
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, self.clock())
+                ).fetchone()
+                state = merge(json.loads(row[0]) if row is not None else None)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, state, expires_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(state), self.clock() + self.ttl),
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store for workers on several hosts. `client` is anything with the redis-py get/set(ex=)/delete calls
+    (redis.Redis, or a fake in tests); Redis expires the keys itself.
+    """
+    def __init__(self, client, ttl: float = SESSION_TTL_SECONDS, prefix: str = "session:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL, ttl: float = SESSION_TTL_SECONDS) -> "RedisSessionStore":
+        if redis is None:
+            raise ImportError("SESSION_STORE=redis needs the redis package (pip install redis)")
+        return cls(redis.Redis.from_url(url), ttl=ttl)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        value = self.client.get(self.prefix + session_id)
+        return json.loads(value) if value is not None else None
+
+    def put(self, session_id: str, state: Dict[str, Any]):
+        self.client.set(self.prefix + session_id, json.dumps(state), ex=max(1, int(self.ttl)))
+
+    def update(self, session_id: str, merge: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]):
+        key = self.prefix + session_id
+
+        def apply(pipe):
+            # WATCH/MULTI: redis-py retries when another worker writes the key in between
+            value = pipe.get(key)
+            state = merge(json.loads(value) if value is not None else None)
+            pipe.multi()
+            pipe.set(key, json.dumps(state), ex=max(1, int(self.ttl)))
+
+        self.client.transaction(apply, key)
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+class ChatSession:
+    """
+    The state of one conversation: its ConversationHistory and the retrievals of its latest asks,
+    loaded from and saved to a SessionStore so any worker can serve the next turn.
+    save() merges with the stored state instead of overwriting it, so a summary finished in the background
+    after another worker served the next turn does not drop that turn.
+    """
+    def __init__(self, session_id: str, store: SessionStore, history: Optional[ConversationHistory] = None):
+        self.session_id = session_id
+        self.store = store
+        self.history = history or ConversationHistory()
+        self.retrievals = OrderedDict()
+        # A summary finished in the background is persisted as soon as it is ready
+        self.history.on_summary = self.save
+
+    # Auxiliary Functions
+
+    @staticmethod
+    def retrieval_key(ask: str) -> str:
+        return hashlib.sha256(normalize_text(ask).encode("utf-8")).hexdigest()
+
+    # Main functions
+
+    @classmethod
+    def load(cls, store: SessionStore, session_id: str, history: Optional[ConversationHistory] = None) -> "ChatSession":
+        """
+        The stored session, or a new empty one if it does not exist or expired.
+        """
+        session = cls(session_id, store, history)
+        state = store.get(session_id)
+        if state is not None:
+            session.history.load_dict(state.get("history") or {})
+            session.retrievals = OrderedDict(state.get("retrievals") or {})
+        return session
+
+    def _merge(self, stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if stored is not None:
+            self.history.merge_dict(stored.get("history") or {})
+            retrievals = OrderedDict(stored.get("retrievals") or {})
+            for key, retrieval in self.retrievals.items():
+                retrievals[key] = retrieval
+                retrievals.move_to_end(key)
+            while len(retrievals) > SESSION_MAX_RETRIEVALS:
+                retrievals.popitem(last=False)
+            self.retrievals = retrievals
+        return {"history": self.history.to_dict(), "retrievals": dict(self.retrievals)}
+
+    def save(self):
+        try:
+            self.store.update(self.session_id, self._merge)
+        except Exception as e:
+            print(f"Error occurred while saving session {self.session_id}: {e}")
+
+    def cached_retrieval(self, ask: str) -> Optional[Any]:
+        return self.retrievals.get(self.retrieval_key(ask))
+
+    def cache_retrieval(self, ask: str, retrieval: Any):
+        """
+        Remember the (JSON-serializable) retrieval of an ask; only the latest SESSION_MAX_RETRIEVALS are kept.
+        """
+        key = self.retrieval_key(ask)
+        self.retrievals[key] = retrieval
+        self.retrievals.move_to_end(key)
+        while len(self.retrievals) > SESSION_MAX_RETRIEVALS:
+            self.retrievals.popitem(last=False)
+
+    async def retrieve(self, ask: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        The cached retrieval of the ask, or await fetch() and cache its result (saved with the session).
+        """
+        retrieval = self.cached_retrieval(ask)
+        if retrieval is None:
+            retrieval = await fetch()
+            self.cache_retrieval(ask, retrieval)
+        return retrieval
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """
+    Return the process-wide session store selected by SESSION_STORE.
+    """
+    global _store
+    if _store is None:
+        if SESSION_STORE == "redis":
+            _store = RedisSessionStore.from_url()
+        elif SESSION_STORE == "memory":
+            _store = MemorySessionStore()
+        else:
+            _store = SQLiteSessionStore()
+    return _store
@@ -70,6 +70,8 @@ class SherlockSearch:
         user_query = context["user_query"]
         index_name = context["index_name"]
         kernel:Kernel = context["kernel"]
+        # Set by the bot: the ChatSession whose cached retrievals are reused across turns
+        session = context.variables.get("session")
         
         variables = ContextVariables()
         variables["query"] = query
@@ -87,7 +89,10 @@ class SherlockSearch:
             
         intent_general = response['input']
 
-        list_context = await self.get_context(intent_general,index_name)
+        if session is not None:
+            list_context = await session.retrieve(f"{index_name}\n{intent_general}", lambda: self.get_context(intent_general,index_name))
+        else:
+            list_context = await self.get_context(intent_general,index_name)
         variables["context"] = "\n\n".join(list[str](list_context))
 
         chat_function = kernel.skills.get_function("sherlockPlugin", "response")
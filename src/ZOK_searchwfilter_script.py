@@ -13,6 +13,7 @@ sys.path.insert(0, parentdir)
 pluginDirectory = "plugins"
 from plugins.AISearch.aisearch import AISearchWF, build_query_filter
 from plugins.AISearch.query import query
+from plugins.AISearch.batch_runner import BatchRunner
 from src.utils import string_to_json
 from dotenv import load_dotenv
 load_dotenv()
@@ -42,7 +43,6 @@ async def main() -> None:
     if question_set:
         # Test question-set-----------------------------------------------------------
         # Define test cases
-        results_list = []
 
         test_cases = [
         "What is the Revenue of Microsoft?",
@@ -56,22 +56,14 @@ async def main() -> None:
         "Is Pfizer spinning off any large business segments?"
         ]
 
-        for ask in test_cases:
-            print(f"\nQuery: {ask}")
-            documents = await query(ask)
-        
-            # Create a dictionary for each question and its result
-            result_dict = {
-                'question': ask,
-                'documents': documents[0]['input']
-            }
+        # Concurrent, one JSON line per question as soon as it is answered; a re-run skips the answered ones
+        async def documents(ask):
+            result = await query(ask)
+            return result[0]['input'] if result else None
 
-            # Append the dictionary to the results list
-            results_list.append(result_dict)
-
-        # Write the results to a JSON file
-        with open('query_results.json', 'w', encoding='utf-8') as f:
-            json.dump(results_list, f, ensure_ascii=False, indent=4)
+        questions = [{"id": str(i), "question": ask} for i, ask in enumerate(test_cases)]
+        stats = await BatchRunner(documents, 'query_results.jsonl').run(questions)
+        print(f"{stats['answered']} answered, {stats['failed']} failed in {stats['seconds']} s ({stats['questions_per_second']} questions/sec)")
 
 if __name__ == "__main__":   
     asyncio.run(main())
@@ -12,6 +12,7 @@ parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir) 
 pluginDirectory = "plugins"
 from plugins.AISearch.vsearch import VSearch
+from plugins.AISearch.answer import answer, stream_answer
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -27,6 +28,7 @@ async def main() -> None:
 
     single_question = True
     question_set = False    
+    stream = True
 
 
     if single_question:
@@ -44,27 +46,24 @@ async def main() -> None:
         #ask = "What is the revenue?" # Test execution with filter == None OK
         #ask = "In agreement with the information outlined in the income statement, what is average net profit margin (as a %) for Best Buy?"
 
-        kernel = sk.Kernel()
-        kernel.add_chat_service("chat_completion", azure_chat_service)
-        kernel.add_text_embedding_generation_service("ada", azure_text_embedding)
+        if stream:
+            # Sources first, then the answer as it is generated
+            async for event in stream_answer(ask, score_include=True):
+                if event['type'] == 'citations':
+                    print(f"Sources: {event['citations']} (cached: {event['cached']})")
+                elif event['type'] == 'token':
+                    print(event['text'], end="", flush=True)
+                else:
+                    print(f"\n\ntimings: {event['timings']}")
+            return
 
-        pluginASKT = kernel.import_semantic_plugin_from_directory("plugins", "ASKProcess")        
-        extract_entities = pluginASKT["extractEntities"]
-        pluginAIS = kernel.import_plugin(plugin_instance= VSearch(), plugin_name= "VSearch")
-        vsearch =  pluginAIS["retrieve_documents"]
-        pluginFC = kernel.import_semantic_plugin_from_directory(pluginDirectory, "FinanceGenerator")        
-        consultant_response = pluginFC["OneCompanyQuestion"]        
+        # Retrieval + OneCompanyQuestion behind the semantic answer cache
+        result = await answer(ask, score_include=True)
+        print(result['context'])
 
-        context = kernel.create_new_context()
-        context['ask'] = ask 
-        context['score_include'] = True                              
-        doc = vsearch(context)
-        print(doc['input'])           
-        context['context'] =  doc['input']
-       
-            
         # Generate
-        response = await kernel.run(consultant_response, input_context=context)           
+        response = result['answer']
+        print(f"cached: {result['cached']}")
         
         print(response)           
     
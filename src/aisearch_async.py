@@ -1,15 +1,20 @@
 import os
+import sys
+import inspect
 import asyncio
 from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery, VectorFilterMode
 from langchain_community.embeddings import AzureOpenAIEmbeddings
-from openai import AzureOpenAI
 from semantic_kernel.skill_definition import (
     sk_function,
     sk_function_context_parameter,
 )
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from plugins.AISearch.clients import get_openai_client, get_search_client
+from plugins.AISearch.embedding_cache import get_embedding_cache
 
 # Load environment variables
 load_dotenv()
@@ -24,10 +29,9 @@ class AISearch:
         self.azure_openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION")
         self.azure_openai_embeddings_model_name = os.getenv("AZURE_OPENAI_EMBEDDINGS_MODEL_NAME")
 
-        # Azure credentials and clients
-        credential = AzureKeyCredential(self.azure_ai_search_api_key)
-        self.search_client = SearchClient(self.azure_ai_search_endpoint, index_name, credential=credential)
-        self.openai_client = AzureOpenAI(
+        # Shared Azure clients (one pooled client per endpoint/index in the process)
+        self.search_client = get_search_client(self.azure_ai_search_endpoint, index_name, self.azure_ai_search_api_key)
+        self.openai_client = get_openai_client(
             api_key=self.azure_openai_api_key,
             api_version="2023-05-15",
             azure_endpoint=self.azure_openai_endpoint
@@ -39,6 +43,9 @@ class AISearch:
         )
 
     def generate_embeddings(self, text):
+        return get_embedding_cache().get_or_compute(self.azure_openai_embeddings_model_name, text, self._create_embedding)
+
+    def _create_embedding(self, text):
         return self.openai_client.embeddings.create(input=[text], model=self.azure_openai_embeddings_model_name).data[0].embedding
 
 
@@ -0,0 +1,148 @@
+"""
+Benchmark: fresh Azure clients per question vs. the pooled clients from plugins/AISearch/clients.py.
+
+A local stub HTTP server plays both Azure OpenAI (embeddings) and Azure AI Search (docs search), so the
+numbers only reflect client construction and connection setup. The stub speaks plain HTTP, so the real
+gain against Azure (where every new connection also pays a TLS handshake) is larger than reported here.
+
+Usage:
+    python src/bench_client_pool.py --requests 200 --latency-ms 2
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI
+from plugins.AISearch.clients import ClientRegistry
+
+API_VERSION = "2023-05-15"
+INDEX_NAME = "finance-bench-small-sk"
+EMBEDDING_SIZE = 1536
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers embeddings and search requests with canned payloads, keeping connections alive."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if "/embeddings" in self.path:
+            payload = {
+                "object": "list",
+                "data": [{"object": "embedding", "index": 0, "embedding": [0.0] * EMBEDDING_SIZE}],
+                "model": "text-embedding-ada-002",
+                "usage": {"prompt_tokens": 8, "total_tokens": 8},
+            }
+        else:
+            payload = {"value": [{"@search.score": 1.0, "id": "1", "document": "Revenue was 1,000"}]}
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency_ms: float):
+    StubHandler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def one_question(openai_client, search_client):
+    """Embed and search once, the way VSearch.retrieve_documents does."""
+    vector = openai_client.embeddings.create(input=["What is the revenue of 3M?"], model="ada").data[0].embedding
+    return [dict(result) for result in search_client.search(search_text="revenue", top=3)], vector
+
+
+def run_fresh(endpoint, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        openai_client = AzureOpenAI(api_key="stub", api_version=API_VERSION, azure_endpoint=endpoint)
+        search_client = SearchClient(endpoint, INDEX_NAME, credential=AzureKeyCredential("stub"))
+        one_question(openai_client, search_client)
+        latencies.append(time.perf_counter() - start)
+        openai_client.close()
+        search_client.close()
+    return latencies
+
+
+def run_pooled(endpoint, n):
+    registry = ClientRegistry()
+    latencies = []
+    try:
+        for _ in range(n):
+            start = time.perf_counter()
+            openai_client = registry.openai(api_key="stub", azure_endpoint=endpoint, api_version=API_VERSION)
+            search_client = registry.search(endpoint, INDEX_NAME, "stub")
+            one_question(openai_client, search_client)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        registry.close()
+    return latencies
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies):
+    print(
+        f"{name:<8} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:8.2f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:8.2f} ms  "
+        f"mean={statistics.mean(latencies) * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fresh vs pooled Azure client latency against a local stub.")
+    parser.add_argument("--requests", type=int, default=200, help="Questions per mode")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected server latency per call")
+    args = parser.parse_args()
+
+    server, endpoint = start_stub_server(args.latency_ms)
+    try:
+        # Warm up imports and the stub before measuring
+        run_pooled(endpoint, 5)
+        fresh = run_fresh(endpoint, args.requests)
+        pooled = run_pooled(endpoint, args.requests)
+    finally:
+        server.shutdown()
+
+    report("fresh", fresh)
+    report("pooled", pooled)
+    gain = percentile(fresh, 50) / percentile(pooled, 50)
+    print(f"p50 speed-up: {gain:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: local entity extractor (plugins/AISearch/entities.py) vs. the ASKProcess/extractEntities prompt.
+
+Runs the questions of test/vsearch_test_extract_entities.py through the local extractor and reports
+latency, how many asks take the fast path, and field-by-field agreement with the recorded LLM results
+(country codes normalised to ISO 3166, i.e. UK -> GB). With --llm the prompt is also timed live.
+
+Usage:
+    python src/bench_entity_extractor.py --repeat 200
+    python src/bench_entity_extractor.py --llm
+"""
+
+import os
+import sys
+import time
+import asyncio
+import inspect
+import argparse
+import statistics
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+sys.path.insert(0, os.path.join(parentdir, "test"))
+import plugins.AISearch.entities as entities
+from plugins.AISearch.entities import EntityExtractor, ENTITY_CONFIDENCE_THRESHOLD
+from vsearch_test_extract_entities import QUESTIONS, LLM_RESULTS
+
+ISO_FIXES = {"UK": "GB"}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def normalise(result):
+    country = result.get("country")
+    return {
+        "ticker": result.get("ticker"),
+        "country": [ISO_FIXES.get(code, code) for code in country] if country else None,
+        "dates": result.get("dates"),
+    }
+
+
+def bench_local(extractor, repeat):
+    latencies = []
+    results = []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = extractor.extract(question)
+        latencies.append((time.perf_counter() - start) / repeat * 1000)
+        results.append(result)
+    return results, latencies
+
+
+async def bench_llm():
+    from plugins.AISearch.vsearch import VSearch
+    # Force every ask through the prompt
+    entities.ENTITY_CONFIDENCE_THRESHOLD = float("inf")
+    vsearch = VSearch()
+    latencies = []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        await vsearch.extract_entities({"input": {"ask": question}})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local entity extractor accuracy/latency benchmark")
+    parser.add_argument("--repeat", type=int, default=100, help="extractions per question for the latency figures")
+    parser.add_argument("--threshold", type=float, default=ENTITY_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--llm", action="store_true", help="also time the extractEntities prompt (needs Azure OpenAI)")
+    parser.add_argument("--verbose", action="store_true", help="print every disagreement")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    extractor = EntityExtractor()
+    build_ms = (time.perf_counter() - start) * 1000
+    results, latencies = bench_local(extractor, args.repeat)
+
+    fast_path = [confidence >= args.threshold for _, confidence in results]
+    agreement = {field: 0 for field in ("ticker", "country", "dates")}
+    exact = 0
+    for question, (local, _), llm, accepted in zip(QUESTIONS, results, LLM_RESULTS, fast_path):
+        llm = normalise(llm)
+        same = {field: local[field] == llm[field] for field in agreement}
+        for field, ok in same.items():
+            agreement[field] += ok
+        exact += all(same.values())
+        if args.verbose and not all(same.values()):
+            print(f"{'fast' if accepted else 'llm '} | {question}\n       local: {local}\n       llm:   {llm}")
+
+    n = len(QUESTIONS)
+    print(f"questions: {n}  matcher build: {build_ms:.1f} ms")
+    print(f"local extractor: p50={percentile(latencies, 50):.3f} ms  p99={percentile(latencies, 99):.3f} ms")
+    print(f"fast path (confidence >= {args.threshold}): {sum(fast_path)}/{n}")
+    print("agreement with recorded LLM results: " + "  ".join(f"{field}={count}/{n}" for field, count in agreement.items()) + f"  all={exact}/{n}")
+
+    if args.llm:
+        llm_latencies = asyncio.run(bench_llm())
+        print(f"extractEntities prompt: p50={percentile(llm_latencies, 50):.1f} ms  p99={percentile(llm_latencies, 99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark: retrieval quality and cost of every retrieval strategy on a labeled question -> evidence set.
+
+Strategies:
+    aisearch                 plugins/AISearch/aisearch.AISearch.search (hybrid, no filter)
+    aisearchwf               plugins/AISearch/query.py pipeline (build_query_pipeline) with AISearchWF searches
+    vsearch                  VSearch.retrieve (what retrieve_documents formats for the prompt)
+    async_simple, async_hybrid, async_hybrid_wfilter
+                             the query types of src/aisearch_async.AISearch
+
+Questions default to BENCH_QUESTIONS (FinanceBench open source JSONL: question, doc_name, evidence[{evidence_text}]).
+Reported per strategy: recall@k and MRR against the evidence, latency percentiles per stage, tokens of context
+given to the model and embedding requests per question. Run it with GENAI_SERVICE_MODE=replay (see
+plugins/AISearch/cassette.py) to compare changes offline on the same recorded traffic.
+
+Usage:
+    python src/bench_retrieval.py --limit 50
+    python src/bench_retrieval.py --strategies vsearch,aisearchwf --output bench.json
+"""
+
+import os
+import sys
+import json
+import asyncio
+import inspect
+import argparse
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+sys.path.insert(0, currentdir)
+from dotenv import load_dotenv
+from plugins.AISearch.aisearch import AISearch as AISearchPlugin, AISearchWF, build_query_filter, format_hybrid_search_result, pack_hybrid_search_results
+from plugins.AISearch.benchmark import BENCH_KS, BENCH_QUESTIONS, RetrievalBenchmark, format_report, load_questions
+from plugins.AISearch.clients import get_search_executor
+from plugins.AISearch.embeddings import get_embedding_service
+from plugins.AISearch.query import build_query_pipeline, extract_query_entities
+from plugins.AISearch.vsearch import VSearch
+
+load_dotenv()
+
+AISEARCH_FIELDS = ["Text", "Id", "ExternalSourceName", "Description", "AdditionalMetadata"]
+STRATEGIES = ["aisearch", "aisearchwf", "vsearch", "async_simple", "async_hybrid", "async_hybrid_wfilter"]
+
+# Embedding requests made outside the shared EmbeddingService (src/aisearch_async embeds synchronously)
+sync_embedding_calls = {"count": 0}
+
+
+def embedding_calls() -> int:
+    return get_embedding_service().stats["texts_sent"] + sync_embedding_calls["count"]
+
+
+def interleave(groups):
+    """
+    One ranking out of per-filter rankings: every group's first result, then every group's second, ...
+    """
+    ranked = []
+    for rank in range(max((len(group) for group in groups), default=0)):
+        ranked.extend(group[rank] for group in groups if rank < len(group))
+    return ranked
+
+
+def hybrid_context(groups) -> str:
+    return "".join(format_hybrid_search_result(result) for group in pack_hybrid_search_results(groups) for result in group)
+
+
+def build_strategies(names, top: int):
+    strategies = {}
+
+    if "aisearch" in names:
+        plugin = AISearchPlugin()
+
+        async def aisearch(ask):
+            results = list(await plugin.search_results(ask))
+            return {"results": results, "context": hybrid_context([results])}
+
+        strategies["aisearch"] = aisearch
+
+    if "aisearchwf" in names:
+        searchwf = AISearchWF()
+
+        async def aisearchwf(ask):
+            async def search(filters, vector):
+                loop = asyncio.get_running_loop()
+                executor = get_search_executor()
+                return await asyncio.gather(
+                    *(loop.run_in_executor(executor, searchwf.search_filter_results, ask, vector, f) for f in filters or [None])
+                )
+
+            # query()'s stages, with a search that keeps the result dicts for recall/MRR
+            pipeline = build_query_pipeline(ask, search)
+            results = await pipeline.run()
+            groups = [list(group) for group in results["search"]]
+            return {"results": interleave(groups), "context": hybrid_context(groups), "timings": pipeline.timings}
+
+        strategies["aisearchwf"] = aisearchwf
+
+    if "vsearch" in names:
+        vsearch = VSearch()
+
+        async def vsearch_strategy(ask):
+            retrieval = await vsearch.retrieve(ask)
+            groups = [document.get("retrieved_info") or [] for document in retrieval["documents"] if "error" not in document]
+            context = vsearch.format_search_results(retrieval["documents"], retrieval["filters"])
+            return {"results": interleave(groups), "context": context, "timings": retrieval["timings"]}
+
+        strategies["vsearch"] = vsearch_strategy
+
+    async_names = [name for name in names if name.startswith("async_")]
+    if async_names:
+        from aisearch_async import AISearch as AsyncAISearch
+        ai_search = AsyncAISearch()
+        create_embedding = ai_search._create_embedding
+
+        def counted_embedding(text):
+            sync_embedding_calls["count"] += 1
+            return create_embedding(text)
+
+        ai_search._create_embedding = counted_embedding
+
+        def make_strategy(query_type):
+            async def strategy(ask):
+                metadata_filter = None
+                if query_type == "hybrid_wfilter":
+                    filters = build_query_filter(await extract_query_entities(ask)) or []
+                    metadata_filter = " or ".join(f"({f})" for f in filters) or None
+                loop = asyncio.get_running_loop()
+
+                def run():
+                    return list(asyncio.run(ai_search.search(
+                        query=ask, top=top, select_fields=AISEARCH_FIELDS, query_type=query_type, filter=metadata_filter,
+                    )))
+
+                results = await loop.run_in_executor(get_search_executor(), run)
+                return {"results": results, "context": hybrid_context([results])}
+
+            return strategy
+
+        for name in async_names:
+            strategies[name] = make_strategy(name[len("async_"):])
+
+    return strategies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Retrieval quality + latency benchmark")
+    parser.add_argument("--questions", default=BENCH_QUESTIONS, help="Labeled question set (JSONL or JSON list)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"Comma separated, from: {', '.join(STRATEGIES)}")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N questions")
+    parser.add_argument("--top", type=int, default=max(BENCH_KS), help="Results requested from the async_* strategies")
+    parser.add_argument("--output", default=None, help="Write the full report (per question rows) as JSON")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    names = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(STRATEGIES))
+    if unknown:
+        sys.exit(f"Unknown strategies: {', '.join(unknown)}")
+    questions = load_questions(args.questions)[:args.limit]
+    print(f"{len(questions)} questions, strategies: {', '.join(names)}\n")
+
+    benchmark = RetrievalBenchmark(build_strategies(names, args.top), embedding_calls=embedding_calls)
+    report = await benchmark.run(questions)
+
+    print(format_report(report))
+    for name, summary in report["strategies"].items():
+        stages = ", ".join(f"{stage} {values['p50']:.0f}/{values['p95']:.0f}" for stage, values in summary.get("latency_ms", {}).items())
+        print(f"\n{name} stage latency p50/p95 ms: {stages}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, default=str)
+        print(f"\nReport: {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,8 +2,12 @@
 Chatbot with context and memory, using Semantic Kernel.
 """
 
+import uuid
+from typing import Optional
 from semantic_kernel import Kernel,ContextVariables
 from semantic_kernel.planning import ActionPlanner
+from plugins.history import ConversationHistory
+from plugins.sessions import ChatSession, SessionStore, get_session_store
 
 # Chat roles
 SYSTEM = "system"
@@ -11,29 +15,46 @@ USER = "user"
 ASSISTANT = "assistant"
 
 class bot:
-    """Create a chatbot with Azure OPENAI LLM."""
+    """
+    Create a chatbot with Azure OPENAI LLM.
+    Chat state lives in a SessionStore keyed by session_id, so any worker can serve any turn and
+    concurrent users never share history; `variables` only holds the defaults copied into every request.
+    Start a conversation with new_session_id() and pass the same id on every turn.
+    """
 
-    kernel = None
-    variables = None
-
-    def __init__(self,kernel : Kernel, variables : ContextVariables):
+    def __init__(self,kernel : Kernel, variables : ContextVariables, store: Optional[SessionStore] = None):
         self.kernel = kernel
         self.variables = variables
+        self.store = store if store is not None else get_session_store()
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
 
+    def load_session(self, session_id: str) -> ChatSession:
+        # Last turns verbatim + rolling summary, so the prompt does not grow with the session
+        history = ConversationHistory(user_label=f"{USER}:", assistant_label=f"{ASSISTANT}:")
+        return ChatSession.load(self.store, session_id, history)
 
-    async def retrieverAugmentedGeneration(self,index_name:str, query: str, chat_history: str) -> str:
+    async def retrieverAugmentedGeneration(self,index_name:str, query: str, chat_history: str, session_id: str) -> str:
         """
          Asks the LLM to answer the user's query with the context provided.
-         The index_name may be empty if we are not using Azure Search
+         The index_name may be empty if we are not using Azure Search.
+         The search plugins reuse the retrievals cached in the session for asks it has already seen.
         """
+        if not session_id:
+            raise ValueError("session_id is required: start a conversation with bot.new_session_id()")
+        session = self.load_session(session_id)
+        variables = self.variables.clone()
 
         user_template = "{{$chat_history}}" + f"{USER}: " + "{{$query}}\n"
         
-        self.variables["user_query"] = user_template
-        self.variables["query"] = query
-        self.variables["index_name"] = index_name
-        self.variables["kernel"] = self.kernel
-        self.variables["chat_history"] = ""
+        variables["user_query"] = user_template
+        variables["query"] = query
+        variables["index_name"] = index_name
+        variables["kernel"] = self.kernel
+        variables["chat_history"] = session.history.render()
+        variables["session"] = session
 
         # ask intent
         # ask expansion
@@ -50,18 +71,20 @@ class bot:
         plan = await planner.create_plan_async(goal=query)
         
         
-        context = self.kernel.create_new_context(self.variables)
+        context = self.kernel.create_new_context(variables)
         result = await plan.invoke_async(query,context)
         
-        self.variables["chat_history"] += f"{USER}: {query}\n{ASSISTANT}: {result.result}\n"
+        # Older turns are summarized in the background (and saved again once summarized)
+        session.history.add_turn(query, result.result)
+        session.save()
         
         return result.result
 
-    async def ask(self,index_name:str, query: str, chat_history: str) -> str:
+    async def ask(self,index_name:str, query: str, chat_history: str, session_id: str) -> str:
         """
             Send the request to openAI
         """
-        response = await self.retrieverAugmentedGeneration(index_name,query, chat_history)       
+        response = await self.retrieverAugmentedGeneration(index_name,query, chat_history, session_id)       
         print(
             "*****\n"
             f"QUESTION:\n{query}\n"
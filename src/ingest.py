@@ -0,0 +1,131 @@
+"""
+Ingestion CLI: chunk, embed and index filings (PDF or text) in bulk.
+
+Metadata comes from the FinanceBench file names (3M_2018_10K.pdf -> MMM, 2018, 10K) and data/companies.txt.
+Embeddings are requested in batches with a cap on concurrent requests, documents are uploaded with
+SearchIndexingBufferedSender (Azure) or into a LocalSearchIndex (--backend local). Throughput is reported in chunks/sec.
+
+Re-runs are incremental: a manifest of chunk hashes per file (and embedding model) means only new chunk texts
+are embedded and uploaded, moved chunks only get their new metadata, removed chunks are deleted, and an
+interrupted run resumes where it stopped.
+The diff of every run is written next to the manifest (<index>.diff.json).
+
+Usage:
+    python src/ingest.py data/filings --backend local --index vsearch-local
+    python src/ingest.py data/filings --schema aisearch --index finance-bench-small-sk --batch-size 64 --concurrency 8
+    python src/ingest.py data/filings --prune        # also delete files no longer in data/filings
+    python src/ingest.py data/filings --restart      # ignore the manifest and embed everything again
+"""
+
+import os
+import sys
+import json
+import asyncio
+import inspect
+import argparse
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from dotenv import load_dotenv
+from plugins.AISearch.embeddings import EmbeddingService, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY
+from plugins.AISearch.entities import COMPANIES_PATH
+from plugins.AISearch.ingestion import (
+    AzureUploader,
+    IngestionPipeline,
+    INGEST_CHECKPOINT_EVERY,
+    INGEST_CHUNK_OVERLAP,
+    INGEST_CHUNK_SIZE,
+    Manifest,
+    file_hash,
+    list_filings,
+    local_uploader,
+    manifest_path,
+    report_path,
+)
+
+load_dotenv()
+
+AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
+AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME")
+AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunk, embed and index filings")
+    parser.add_argument("paths", nargs="+", help="Filing files or directories (.pdf, .txt, .md)")
+    parser.add_argument("--index", default=AZURE_SEARCH_INDEX_NAME, help="Index name (default: AZURE_SEARCH_INDEX_NAME)")
+    parser.add_argument("--backend", choices=["azure", "local"], default="azure")
+    parser.add_argument("--schema", choices=["vsearch", "aisearch"], default="vsearch", help="Index field names")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="Characters per chunk")
+    parser.add_argument("--overlap", type=int, default=INGEST_CHUNK_OVERLAP, help="Characters shared by consecutive chunks")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_MAX_BATCH_SIZE, help="Texts per embedding request")
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_MAX_CONCURRENCY, help="Embedding requests in flight")
+    parser.add_argument("--checkpoint-every", type=int, default=INGEST_CHECKPOINT_EVERY, help="Files between checkpoints")
+    parser.add_argument("--prune", action="store_true", help="Delete indexed files that are not in PATHS any more")
+    parser.add_argument("--restart", action="store_true", help="Ignore the manifest and embed every chunk again")
+    return parser.parse_args()
+
+
+def print_progress(stats):
+    diff = stats["diff"]
+    print(
+        f"{stats['file']}: {diff['status']}, +{diff['added']} ~{diff['changed']} -{diff['removed']} ={diff['unchanged']} chunks, {diff['embedded']} embedded; "
+        f"{stats['chunks_per_second']} chunks/sec"
+    )
+
+
+async def main():
+    args = parse_args()
+    if not args.index:
+        sys.exit("No index name: pass --index or set AZURE_SEARCH_INDEX_NAME")
+    files = list_filings(args.paths)
+    print(f"{len(files)} filings found")
+
+    # A dedicated service: bulk batches, no query cache
+    service = EmbeddingService(max_batch_size=args.batch_size, max_concurrency=args.concurrency, batch_window=0.05)
+    if args.backend == "local":
+        uploader = local_uploader(args.index, args.schema)
+    else:
+        uploader = AzureUploader(AZURE_SEARCH_ENDPOINT, args.index, AZURE_SEARCH_KEY, args.schema)
+
+    name = f"{args.backend}-{args.index}"
+    if args.restart and os.path.exists(manifest_path(name)):
+        os.remove(manifest_path(name))
+    # Anything that changes the chunks or their metadata makes the stored hashes stale
+    settings = {
+        "schema": args.schema,
+        "chunk_size": args.chunk_size,
+        "overlap": args.overlap,
+        "companies": file_hash(COMPANIES_PATH) if os.path.exists(COMPANIES_PATH) else None,
+    }
+    pipeline = IngestionPipeline(
+        service.embed_many,
+        uploader,
+        schema=args.schema,
+        manifest=Manifest(manifest_path(name), model=service.model, settings=settings),
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        checkpoint_every=args.checkpoint_every,
+    )
+    stats = await pipeline.run(files, progress=print_progress, prune=args.prune)
+
+    report = pipeline.diff_report()
+    with open(report_path(name), "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    totals = report["totals"]
+    print(
+        f"\nIndexed {stats['files']} files ({stats['unchanged_files']} unchanged, {stats['deleted_files']} deleted, "
+        f"{stats['failed_files']} failed): +{totals['added']} ~{totals['changed']} -{totals['removed']} ={totals['unchanged']} chunks"
+    )
+    if stats["failed_chunks"]:
+        print(f"{stats['failed_chunks']} chunks failed to index; they are retried on the next run")
+    print(
+        f"Embedded {stats['embedded']} chunks in {stats['seconds']} s ({stats['chunks_per_second']} chunks/sec, "
+        f"{service.stats['batches']} embedding requests); {report['embedding_saved']:.0%} of the chunks reused"
+    )
+    print(f"Diff report: {report_path(name)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
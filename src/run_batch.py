@@ -0,0 +1,114 @@
+"""
+Batch runner: answer a JSONL of questions concurrently, streaming one JSON line per result.
+
+Every input line needs a question ("question", "ask", "query" or "body") and should have an id ("id", "request_id",
+"financebench_id"); --id-field/--question-field pick other fields. Results are appended to --output as they complete,
+so an interrupted run is resumed by running the same command again: ids already answered are skipped,
+failed ones are retried.
+
+Modes:
+    answer     plugins/AISearch/answer.answer (VSearch retrieval + FinanceGenerator), the default
+    retrieve   VSearch.retrieve, the formatted context only (no generation)
+    query      plugins/AISearch/query.query (AISearchWF with filters), as the question_set of ZOK_searchwfilter_script.py
+
+Usage:
+    python src/run_batch.py data/financebench_open_source.jsonl --output results/answers.jsonl --concurrency 16
+    python src/run_batch.py requests.jsonl --question-field body --mode retrieve
+"""
+
+import os
+import sys
+import asyncio
+import inspect
+import argparse
+import itertools
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from dotenv import load_dotenv
+from plugins.AISearch.batch_runner import (
+    BATCH_CONCURRENCY,
+    BATCH_RETRIES,
+    BATCH_TIMEOUT,
+    BatchRunner,
+    read_questions,
+)
+
+load_dotenv()
+
+
+def build_worker(mode: str):
+    if mode == "answer":
+        from plugins.AISearch.answer import answer
+
+        async def worker(question):
+            result = await answer(question)
+            # The context is rebuilt from the documents; keeping both would double the output size
+            result.pop("context", None)
+            return result
+
+    elif mode == "retrieve":
+        from plugins.AISearch.answer import get_vsearch
+
+        async def worker(question):
+            vsearch = get_vsearch()
+            retrieval = await vsearch.retrieve(question)
+            return {
+                "context": vsearch.format_search_results(retrieval["documents"], retrieval["filters"]),
+                "filters": retrieval["filters"],
+                "timings": retrieval["timings"],
+            }
+
+    else:
+        from plugins.AISearch.query import query
+
+        async def worker(question):
+            documents = await query(question)
+            return [str(document) for document in documents]
+
+    return worker
+
+
+def print_progress(stats):
+    print(
+        f"{stats['answered']} answered, {stats['failed']} failed, {stats['skipped']} skipped; "
+        f"{stats['questions_per_second']} questions/sec"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer a JSONL of questions concurrently")
+    parser.add_argument("questions", help="Input JSONL, one question per line")
+    parser.add_argument("--output", default=None, help="Output JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--mode", choices=["answer", "retrieve", "query"], default="answer")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Questions in flight")
+    parser.add_argument("--timeout", type=float, default=BATCH_TIMEOUT, help="Seconds per attempt")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES, help="Retries of a failed question")
+    parser.add_argument("--id-field", default=None)
+    parser.add_argument("--question-field", default=None)
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N input lines")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    output = args.output or f"{os.path.splitext(args.questions)[0]}.results.jsonl"
+    questions = read_questions(args.questions, args.id_field, args.question_field)
+    if args.limit is not None:
+        questions = itertools.islice(questions, args.limit)
+
+    runner = BatchRunner(
+        build_worker(args.mode), output, concurrency=args.concurrency, timeout=args.timeout,
+        retries=args.retries, progress=print_progress,
+    )
+    stats = await runner.run(questions)
+    print(
+        f"\nAnswered {stats['answered']} questions ({stats['failed']} failed, {stats['skipped']} already answered, "
+        f"{stats['retries']} retries) in {stats['seconds']} s: {stats['questions_per_second']} questions/sec"
+    )
+    print(f"Results: {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+"""
+HTTP front-end for the finance assistant (VSearch retrieval + FinanceGenerator/OneCompanyQuestion).
+
+Endpoints:
+    POST /answer          {"ask": "...", "score_include": false, "use_cache": true} -> answer() as JSON
+    POST /answer/stream   same body -> Server-Sent Events: citations, token..., done (or error)
+    GET  /healthz         liveness
+    GET  /metrics         counters, queue depth and latency percentiles
+
+At most SERVER_MAX_CONCURRENCY answers run at once, which bounds the calls made to Azure OpenAI and
+Azure AI Search; up to SERVER_MAX_QUEUE more requests wait for a slot and anything beyond that is
+rejected with 503 + Retry-After instead of piling up. Every request is cut at SERVER_REQUEST_TIMEOUT seconds (504).
+
+Usage:
+    python src/server.py --port 8080
+    python src/server.py --stub --stub-latency 0.2     # canned answers, to load-test the server itself
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "16"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "64"))
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "60"))
+# Latencies kept for the /metrics percentiles
+SERVER_LATENCY_WINDOW = int(os.getenv("SERVER_LATENCY_WINDOW", "1000"))
+
+AnswerFn = Callable[..., Awaitable[dict]]
+StreamFn = Callable[..., AsyncIterator[dict]]
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AdmissionControl:
+    """
+    A semaphore of `max_concurrency` slots in front of the pipeline, with at most `max_queue` requests waiting.
+    """
+    def __init__(self, max_concurrency: int = SERVER_MAX_CONCURRENCY, max_queue: int = SERVER_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise QueueFull()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+class ServerMetrics:
+    def __init__(self, window: int = SERVER_LATENCY_WINDOW):
+        self.started_at = time.time()
+        self.counters = {"requests": 0, "ok": 0, "rejected": 0, "timeouts": 0, "errors": 0, "bad_requests": 0, "cached": 0}
+        self.latencies = deque(maxlen=window)
+        self.first_token = deque(maxlen=window)
+
+    @staticmethod
+    def percentiles(values) -> dict:
+        values = sorted(values)
+        if not values:
+            return {}
+        return {f"p{p}": round(values[min(len(values) - 1, int(len(values) * p / 100))], 2) for p in (50, 90, 95, 99)}
+
+    def snapshot(self, admission: AdmissionControl) -> dict:
+        return {
+            **self.counters,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "in_flight": admission.in_flight,
+            "queued": admission.waiting,
+            "max_concurrency": admission.max_concurrency,
+            "max_queue": admission.max_queue,
+            "latency_ms": self.percentiles(self.latencies),
+            "first_token_ms": self.percentiles(self.first_token),
+        }
+
+
+def to_json(payload) -> str:
+    return json.dumps(payload, default=str)
+
+
+def sse_event(event: str, payload: dict) -> bytes:
+    return f"event: {event}\ndata: {to_json(payload)}\n\n".encode("utf-8")
+
+
+class AnswerServer:
+    """
+    aiohttp handlers around an answer function and its streaming version (plugins/AISearch/answer.py by default).
+    """
+    def __init__(
+        self,
+        answer_fn: AnswerFn,
+        stream_fn: StreamFn,
+        max_concurrency: int = SERVER_MAX_CONCURRENCY,
+        max_queue: int = SERVER_MAX_QUEUE,
+        timeout: float = SERVER_REQUEST_TIMEOUT,
+    ):
+        self.answer_fn = answer_fn
+        self.stream_fn = stream_fn
+        self.timeout = timeout
+        self.admission = AdmissionControl(max_concurrency, max_queue)
+        self.metrics = ServerMetrics()
+
+    # Auxiliary Functions
+
+    def error(self, status: int, message: str, counter: str) -> web.Response:
+        self.metrics.counters[counter] += 1
+        headers = {"Retry-After": "1"} if status == 503 else None
+        return web.json_response({"error": message}, status=status, headers=headers)
+
+    async def read_ask(self, request: web.Request) -> Optional[dict]:
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if not isinstance(body, dict) or not isinstance(body.get("ask"), str) or not body["ask"].strip():
+            return None
+        return {
+            "ask": body["ask"].strip(),
+            "score_include": bool(body.get("score_include", False)),
+            "use_cache": bool(body.get("use_cache", True)),
+        }
+
+    # Main functions
+
+    async def answer(self, request: web.Request) -> web.Response:
+        self.metrics.counters["requests"] += 1
+        arguments = await self.read_ask(request)
+        if arguments is None:
+            return self.error(400, "Body must be a JSON object with a non-empty 'ask'", "bad_requests")
+        started_at = time.perf_counter()
+        try:
+            # The timeout covers the wait for a slot too: a queued request must not outlive its client
+            async with asyncio.timeout(self.timeout):
+                async with self.admission.slot():
+                    result = await self.answer_fn(**arguments)
+        except QueueFull:
+            return self.error(503, "Server busy, retry later", "rejected")
+        except TimeoutError:
+            return self.error(504, f"No answer within {self.timeout} s", "timeouts")
+        except Exception as e:
+            print(f"Error occurred while answering: {e}")
+            return self.error(500, "Error occurred while answering", "errors")
+        self.metrics.latencies.append((time.perf_counter() - started_at) * 1000)
+        self.metrics.counters["ok"] += 1
+        self.metrics.counters["cached"] += bool(result.get("cached"))
+        return web.Response(text=to_json(result), content_type="application/json")
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        self.metrics.counters["requests"] += 1
+        arguments = await self.read_ask(request)
+        if arguments is None:
+            return self.error(400, "Body must be a JSON object with a non-empty 'ask'", "bad_requests")
+        started_at = time.perf_counter()
+        response = None
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.admission.slot():
+                    # Headers go out only once a slot is taken, so a rejected request still gets a plain 503
+                    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+                    await response.prepare(request)
+                    first_token = True
+                    async for event in self.stream_fn(**arguments):
+                        if event["type"] == "token" and first_token:
+                            self.metrics.first_token.append((time.perf_counter() - started_at) * 1000)
+                            first_token = False
+                        await response.write(sse_event(event["type"], event))
+        except QueueFull:
+            return self.error(503, "Server busy, retry later", "rejected")
+        except TimeoutError:
+            self.metrics.counters["timeouts"] += 1
+            if response is None:
+                return web.json_response({"error": f"No answer within {self.timeout} s"}, status=504)
+            await response.write(sse_event("error", {"type": "error", "error": f"No answer within {self.timeout} s"}))
+            return response
+        except ConnectionResetError:
+            # The client went away; the slot is already released
+            return response
+        except Exception as e:
+            print(f"Error occurred while streaming an answer: {e}")
+            self.metrics.counters["errors"] += 1
+            if response is None:
+                return web.json_response({"error": "Error occurred while answering"}, status=500)
+            await response.write(sse_event("error", {"type": "error", "error": "Error occurred while answering"}))
+            return response
+        self.metrics.latencies.append((time.perf_counter() - started_at) * 1000)
+        self.metrics.counters["ok"] += 1
+        await response.write_eof()
+        return response
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def metrics_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.metrics.snapshot(self.admission))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/answer", self.answer)
+        app.router.add_post("/answer/stream", self.stream)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", self.metrics_handler)
+        return app
+
+
+# Stub backend: canned answers after a fixed latency, to load-test the server without Azure
+
+def stub_pipeline(latency: float):
+    async def stub_answer(ask: str, score_include: bool = False, use_cache: bool = True) -> dict:
+        await asyncio.sleep(latency)
+        return {"answer": f"Stub answer to: {ask}", "documents": [], "filters": None, "cached": False, "timings": {}}
+
+    async def stub_stream_answer(ask: str, score_include: bool = False, use_cache: bool = True) -> AsyncIterator[dict]:
+        await asyncio.sleep(latency / 2)
+        yield {"type": "citations", "citations": [], "cached": False, "timings": {}}
+        words = f"Stub answer to: {ask}".split()
+        for word in words:
+            await asyncio.sleep(latency / 2 / len(words))
+            yield {"type": "token", "text": word + " "}
+        yield {"type": "done", "answer": " ".join(words), "timings": {}}
+
+    return stub_answer, stub_stream_answer
+
+
+def create_app(stub: bool = False, stub_latency: float = 0.1, **kwargs) -> web.Application:
+    if stub:
+        answer_fn, stream_fn = stub_pipeline(stub_latency)
+    else:
+        from plugins.AISearch.answer import answer, stream_answer
+        from plugins.AISearch.clients import registry
+        answer_fn, stream_fn = answer, stream_answer
+    app = AnswerServer(answer_fn, stream_fn, **kwargs).app()
+    if not stub:
+        async def on_cleanup(app):
+            # Inside the server's loop: the pooled async clients are awaited closed here
+            await registry.aclose()
+        app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the finance assistant over HTTP/SSE")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=SERVER_MAX_CONCURRENCY, help="Answers running at once")
+    parser.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE, help="Requests waiting for a slot before 503")
+    parser.add_argument("--timeout", type=float, default=SERVER_REQUEST_TIMEOUT, help="Seconds per request")
+    parser.add_argument("--stub", action="store_true", help="Canned answers instead of Azure (load tests)")
+    parser.add_argument("--stub-latency", type=float, default=0.1, help="Seconds per stub answer")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    app = create_app(
+        stub=args.stub, stub_latency=args.stub_latency,
+        max_concurrency=args.max_concurrency, max_queue=args.max_queue, timeout=args.timeout,
+    )
+    web.run_app(app, host=args.host, port=args.port)
@@ -8,10 +8,17 @@
 # https://techcommunity.microsoft.com/t5/educator-developer-blog/teach-chatgpt-to-answer-questions-using-azure-ai-search-amp/ba-p/3985395
 
 
+import os
+import sys
 import asyncio
+import inspect
+# Get the root directory of your project (the directory containing 'src' and 'plugins')
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
 import semantic_kernel as sk
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 from aisearch_async import AISearch
+from plugins.history import ConversationHistory
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -63,6 +70,10 @@ function_config = sk.SemanticFunctionConfig(prompt_config, prompt_template)
 chat_function = kernel.register_semantic_function("ChatBot", "Chat", function_config)
 
 
+# Last turns verbatim + rolling summary of the older ones, within HISTORY_MAX_TOKENS
+history = ConversationHistory(user_label="User:>", assistant_label="ChatBot:>")
+
+
 async def chat(context_vars: sk.ContextVariables) -> bool:
     try:
         user_input = input("User:> ")
@@ -88,7 +99,8 @@ async def chat(context_vars: sk.ContextVariables) -> bool:
         return False
 
     answer = await kernel.run_async(chat_function, input_vars=context_vars, )
-    context_vars["chat_history"] += f"\nUser:> {user_input}\nChatBot:> {answer}\n"
+    history.add_turn(user_input, answer)
+    context_vars["chat_history"] = history.render()
 
     print(f"Retrieved Documents:> {docs}")
     print("-"*100)
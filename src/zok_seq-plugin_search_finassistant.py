@@ -10,6 +10,7 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir) 
 from plugins.AISearch.aisearch import AISearch
+from plugins.AISearch.rewrite import RewriteStage
 pluginDirectory = "plugins"
 
 from dotenv import load_dotenv
@@ -120,19 +121,23 @@ async def main() -> None:
         pluginASKT = kernel.import_semantic_plugin_from_directory(pluginDirectory, "ASKProcess")        
         rewrite = pluginASKT["rewrite"] 
 
-        # Set Context
-        my_context = kernel.create_new_context()
-        my_context['ask'] = ask
-        my_context['chat_history'] =  chat_history
-        
-        # Rewrite
-        response = await kernel.run_async(rewrite, input_context=my_context) 
-        new_ask = response['input']
-        print(f'ask:{ask}')
-        print(f'new ask:{new_ask}')
+        async def run_rewrite(ask, chat_history):
+            my_context = kernel.create_new_context()
+            my_context['ask'] = ask
+            my_context['chat_history'] =  chat_history
+            response = await kernel.run_async(rewrite, input_context=my_context) 
+            return response['input']
 
-        # Search
-        documents = await kernel.run_async(search, input_str=new_ask)       
+        async def run_search(ask):
+            return await kernel.run_async(search, input_str=ask)
+
+        # Rewrite only when the ask refers back to the history; the original ask is searched meanwhile
+        stage = RewriteStage(run_search, run_rewrite)
+        result = await stage.run(ask, chat_history)
+        new_ask = result['ask']
+        documents = result['retrieval']
+        print(f'ask:{ask}')
+        print(f'new ask:{new_ask} ({result["decision"]}, {result["reason"]})')
         print(documents)
 
         # As Context
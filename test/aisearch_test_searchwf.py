@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import semantic_kernel as sk
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import plugins.AISearch.aisearch as aisearch
+from plugins.AISearch.aisearch import AISearchWF
+from plugins.AISearch.context_packer import ContextPacker
+
+
+def result(text, source="filing.pdf", id="1"):
+    return {"Id": id, "Text": text, "ExternalSourceName": source, "Description": "MMM", "AdditionalMetadata": "2018"}
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        return [0.1, 0.2]
+
+
+class TestAISearchWF(unittest.TestCase):
+    def setUp(self):
+        self.searches = []
+        self.embedding_service = FakeEmbeddingService()
+        self.original_service = aisearch.get_embedding_service
+        aisearch.get_embedding_service = lambda: self.embedding_service
+        self.searchwf = AISearchWF()
+        self.searchwf.search_filter_results = lambda ask, vector, f: self.searches.append((vector, f)) or [result(f"docs for {f}")]
+
+    def tearDown(self):
+        aisearch.get_embedding_service = self.original_service
+
+    def run_searchwf(self, variables):
+        context = sk.Kernel().create_new_context(sk.ContextVariables(variables=variables))
+        return asyncio.run(self.searchwf.searchwf(context))
+
+    def test_precomputed_vector_skips_embedding(self):
+        result = self.run_searchwf({"ask": "Revenue of 3M", "filter": "Description eq 'MMM'", "vector": json.dumps([0.5])})
+        self.assertEqual(self.embedding_service.calls, 0)
+        self.assertEqual(self.searches, [([0.5], "Description eq 'MMM'")])
+        self.assertIn("Text: docs for Description eq 'MMM'", result)
+
+    def test_batch_of_filters_embeds_once(self):
+        filters = ["Description eq 'MMM'", "Description eq 'PFE'", "Description eq 'JNJ'"]
+        result = self.run_searchwf({"ask": "Revenue", "filters": json.dumps(filters)})
+        self.assertEqual(self.embedding_service.calls, 1)
+        self.assertEqual(sorted(f for _, f in self.searches), sorted(filters))
+        self.assertEqual([line.strip() for line in result.splitlines() if "Text:" in line], [f"Text: docs for {f}" for f in filters])
+
+    def test_filters_share_the_prompt_budget(self):
+        def text(f, i):
+            return " ".join(f"{f} segment {i} line {j} sales grew." for j in range(12))
+
+        self.searchwf.search_filter_results = lambda ask, vector, f: [result(text(f, i), source=f"{f}.pdf", id=str(i)) for i in range(8)]
+        original_packer = aisearch.get_context_packer
+        aisearch.get_context_packer = lambda: ContextPacker(max_tokens=900, counter=lambda text: len(text.split()))
+        try:
+            results = asyncio.run(self.searchwf.search_filters("Revenue", ["MMM", "PFE", "JNJ"], vector=[0.1]))
+        finally:
+            aisearch.get_context_packer = original_packer
+        sizes = [len(text.split()) for text in results]
+        self.assertLessEqual(sum(sizes), 900)
+        self.assertTrue(all(size > 200 for size in sizes), sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
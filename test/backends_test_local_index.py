@@ -0,0 +1,159 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from azure.search.documents import SearchClient
+from azure.search.documents.models import VectorizedQuery, VectorFilterMode
+from plugins.AISearch.backends import LocalSearchIndex, SearchBackend, compile_filter
+import plugins.AISearch.clients  # registers SearchClient as a SearchBackend
+from plugins.AISearch.vsearch import VSearch
+
+DOCUMENTS = [
+    {"id": "1", "document": "3M revenue grew in 2021", "referenced_entity": "MMM", "referenced_year": "2021", "embedding": [1.0, 0.0, 0.0]},
+    {"id": "2", "document": "3M capital expenditure 2018", "referenced_entity": "MMM", "referenced_year": "2018", "embedding": [0.9, 0.1, 0.0]},
+    {"id": "3", "document": "Pfizer vaccine revenue 2021", "referenced_entity": "PFE", "referenced_year": "2021", "embedding": [0.0, 1.0, 0.0]},
+    {"id": "4", "document": "Pfizer research pipeline", "referenced_entity": "PFE", "referenced_year": "2022", "embedding": [0.1, 0.9, 0.1]},
+]
+
+
+def keys(results):
+    return [result["id"] for result in results]
+
+
+class TestFilter(unittest.TestCase):
+    def mask(self, expression):
+        index = LocalSearchIndex()
+        index.upload_documents(DOCUMENTS)
+        return list(index._mask(expression))
+
+    def test_eq_and_or(self):
+        self.assertEqual(self.mask("referenced_entity eq 'MMM' and referenced_year eq '2021'"), [True, False, False, False])
+        self.assertEqual(self.mask("(referenced_entity eq 'PFE' or referenced_year eq '2018') and not referenced_year eq '2022'"), [False, True, True, False])
+
+    def test_search_in(self):
+        self.assertEqual(self.mask("search.in(referenced_year, '2018,2022', ',')"), [False, True, False, True])
+
+    def test_invalid_filter(self):
+        with self.assertRaises(ValueError):
+            compile_filter("referenced_entity like 'MMM'")
+
+
+class TestSearchBackend(unittest.TestCase):
+    def test_backends_must_implement_the_interface(self):
+        class SearchOnly(SearchBackend):
+            def search(self, search_text=None, vector_queries=None, filter=None, vector_filter_mode=None, select=None, top=None, **kwargs):
+                return []
+
+        with self.assertRaises(TypeError):
+            SearchBackend()
+        with self.assertRaises(TypeError):
+            SearchOnly()
+        self.assertIsInstance(LocalSearchIndex(), SearchBackend)
+
+    def test_search_client_is_a_backend(self):
+        self.assertTrue(issubclass(SearchClient, SearchBackend))
+
+
+class TestLocalSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LocalSearchIndex()
+        self.index.upload_documents(DOCUMENTS)
+
+    def test_vector_pre_filter(self):
+        query = VectorizedQuery(vector=[1.0, 0.0, 0.0], k_nearest_neighbors=2, fields="embedding")
+        results = self.index.search(vector_queries=[query], filter="referenced_entity eq 'PFE'",
+                                    vector_filter_mode=VectorFilterMode.PRE_FILTER, select=["id"])
+        self.assertEqual(keys(results), ["4", "3"])
+        self.assertEqual(set(results[0]), {"id", "@search.score"})
+
+    def test_vector_post_filter(self):
+        # The 2 nearest neighbours are both 3M documents, so nothing survives a PFE post-filter
+        query = VectorizedQuery(vector=[1.0, 0.0, 0.0], k_nearest_neighbors=2, fields="embedding")
+        results = self.index.search(vector_queries=[query], filter="referenced_entity eq 'PFE'",
+                                    vector_filter_mode=VectorFilterMode.POST_FILTER)
+        self.assertEqual(results, [])
+
+    def test_bm25_text_search(self):
+        self.assertEqual(keys(self.index.search(search_text="vaccine revenue")), ["3", "1"])
+
+    def test_hybrid_rrf(self):
+        query = VectorizedQuery(vector=[0.0, 1.0, 0.0], k_nearest_neighbors=3, fields="embedding")
+        results = self.index.search(search_text="Pfizer vaccine", vector_queries=[query], top=2)
+        self.assertEqual(keys(results)[0], "3")
+
+    def test_replace_document(self):
+        self.index.upload_documents([{**DOCUMENTS[0], "document": "3M dividends", "embedding": [0.0, 0.0, 1.0]}])
+        self.assertEqual(len(self.index.documents), 4)
+        self.assertEqual(keys(self.index.search(search_text="dividends")), ["1"])
+
+    def test_repeated_key_in_one_batch(self):
+        self.index.upload_documents([
+            {**DOCUMENTS[0], "document": "3M dividends"},
+            {"id": "5", "document": "Merck pipeline", "embedding": [0.0, 0.0, 1.0]},
+            {"id": "5", "document": "Merck oncology", "embedding": [0.0, 0.0, 1.0]},
+        ])
+        self.assertEqual(len(self.index.documents), 5)
+        self.assertEqual(set(keys(self.index.search(search_text="oncology dividends"))), {"1", "5"})
+        self.assertEqual(keys(self.index.search(search_text="Merck")), ["5"])
+        self.assertNotIn("5", keys(self.index.search(search_text="pipeline")))
+        query = VectorizedQuery(vector=[0.0, 0.0, 1.0], k_nearest_neighbors=1, fields="embedding")
+        self.assertEqual(keys(self.index.search(vector_queries=[query])), ["5"])
+
+    def test_delete_documents(self):
+        self.index.delete_documents([{"id": "3"}, {"id": "missing"}])
+        self.assertEqual(keys(self.index.search(search_text="vaccine revenue")), ["1"])
+        query = VectorizedQuery(vector=[0.0, 1.0, 0.0], k_nearest_neighbors=1, fields="embedding")
+        self.assertEqual(keys(self.index.search(vector_queries=[query])), ["4"])
+        self.assertEqual(self.index.metadata.size, 3)
+
+    def test_save_and_mmap_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.index.save(directory)
+            loaded = LocalSearchIndex.load(directory)
+            self.assertIsInstance(loaded.vectors["embedding"], np.memmap)
+            query = VectorizedQuery(vector=[0.0, 1.0, 0.0], k_nearest_neighbors=1, fields="embedding")
+            self.assertEqual(keys(loaded.search(vector_queries=[query])), ["3"])
+
+    def test_ivf_recall(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+        documents = [{"id": str(i), "embedding": vector.tolist()} for i, vector in enumerate(vectors)]
+        exact = LocalSearchIndex(text_fields=[])
+        approximate = LocalSearchIndex(text_fields=[], ivf_min_documents=1000, ivf_probes=12)
+        exact.upload_documents(documents)
+        approximate.upload_documents(documents)
+        recall = []
+        for vector in rng.normal(size=(20, 16)):
+            query = VectorizedQuery(vector=vector.tolist(), k_nearest_neighbors=10, fields="embedding")
+            truth = set(keys(exact.search(vector_queries=[query])))
+            recall.append(len(truth & set(keys(approximate.search(vector_queries=[query])))) / 10)
+        self.assertGreaterEqual(np.mean(recall), 0.8)
+
+    def test_ivf_pre_filter_is_exact(self):
+        rng = np.random.default_rng(2)
+        vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+        documents = [{"id": str(i), "referenced_entity": f"T{i % 20}", "embedding": vector.tolist()} for i, vector in enumerate(vectors)]
+        exact = LocalSearchIndex(text_fields=[])
+        approximate = LocalSearchIndex(text_fields=[], ivf_min_documents=1000, ivf_probes=4)
+        exact.upload_documents(documents)
+        approximate.upload_documents(documents)
+        for vector in rng.normal(size=(10, 16)):
+            query = VectorizedQuery(vector=vector.tolist(), k_nearest_neighbors=5, fields="embedding")
+            arguments = {"vector_queries": [query], "filter": "referenced_entity eq 'T3'", "vector_filter_mode": VectorFilterMode.PRE_FILTER}
+            self.assertEqual(keys(approximate.search(**arguments)), keys(exact.search(**arguments)))
+
+    def test_vsearch_runs_on_local_index(self):
+        query = VectorizedQuery(vector=[1.0, 0.0, 0.0], k_nearest_neighbors=5, fields="embedding")
+        filters = ["referenced_entity eq 'MMM' and referenced_year eq '2021'", "referenced_entity eq 'PFE'"]
+        documents = asyncio.run(VSearch().run_searches(self.index, "revenue", query, filters))
+        self.assertEqual([keys(document["retrieved_info"]) for document in documents], [["1"], ["3", "4"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
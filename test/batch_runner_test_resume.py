@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.batch_runner import BatchRunner, answered_ids, read_questions
+
+
+class FakeWorker:
+    def __init__(self, delay=0.02, fail=(), flaky=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.flaky = set(flaky)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, question):
+        self.calls.append(question)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if question in self.fail:
+                raise RuntimeError("rate limited")
+            if question in self.flaky:
+                self.flaky.discard(question)
+                raise RuntimeError("throttled once")
+            return {"answer": question.upper()}
+        finally:
+            self.in_flight -= 1
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.directory.name, "questions.jsonl")
+        self.output_path = os.path.join(self.directory.name, "out", "results.jsonl")
+        with open(self.input_path, "w", encoding="utf-8") as file:
+            for i in range(20):
+                file.write(json.dumps({"request_id": f"r{i}", "title": "t", "body": f"question {i}"}) + "\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_batch(self, worker, **kwargs):
+        runner = BatchRunner(worker, self.output_path, backoff=0, **kwargs)
+        return asyncio.run(runner.run(read_questions(self.input_path)))
+
+    def rows(self):
+        with open(self.output_path, "r", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def test_reads_requests_jsonl_fields(self):
+        first = next(read_questions(self.input_path))
+        self.assertEqual((first["id"], first["question"]), ("r0", "question 0"))
+
+    def test_bounded_concurrency_and_streamed_output(self):
+        worker = FakeWorker()
+        stats = self.run_batch(worker, concurrency=4)
+        self.assertEqual(stats["answered"], 20)
+        self.assertEqual(worker.max_in_flight, 4)
+        self.assertGreater(stats["questions_per_second"], 0)
+        rows = self.rows()
+        self.assertEqual(sorted(row["id"] for row in rows), sorted(f"r{i}" for i in range(20)))
+        self.assertEqual(next(row for row in rows if row["id"] == "r3")["result"], {"answer": "QUESTION 3"})
+
+    def test_restart_skips_answered_and_retries_failed(self):
+        self.run_batch(FakeWorker(fail={"question 5"}), concurrency=4, retries=0)
+        self.assertEqual(answered_ids(self.output_path), {f"r{i}" for i in range(20)} - {"r5"})
+
+        # Simulate a crash in the middle of a write
+        with open(self.output_path, "a", encoding="utf-8") as file:
+            file.write('{"id": "r7", "res')
+        worker = FakeWorker()
+        stats = self.run_batch(worker, concurrency=4)
+        self.assertEqual(worker.calls, ["question 5"])
+        self.assertEqual((stats["answered"], stats["skipped"]), (1, 19))
+        self.assertEqual(len(answered_ids(self.output_path)), 20)
+
+    def test_retries_with_backoff(self):
+        worker = FakeWorker(flaky={"question 1"})
+        stats = self.run_batch(worker, concurrency=2, retries=1)
+        self.assertEqual((stats["answered"], stats["failed"], stats["retries"]), (20, 0, 1))
+        self.assertEqual(next(row for row in self.rows() if row["id"] == "r1")["attempts"], 2)
+
+    def test_timeout_is_an_error(self):
+        stats = self.run_batch(FakeWorker(delay=1), concurrency=20, timeout=0.05, retries=0)
+        self.assertEqual(stats["failed"], 20)
+        self.assertEqual(self.rows()[0]["error"], "TimeoutError")
+
+
+if __name__ == '__main__':
+    unittest.main()
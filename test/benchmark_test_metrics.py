@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.benchmark import EvidenceMatcher, RetrievalBenchmark, format_report, load_questions
+
+EVIDENCE = "Net sales in 2018 were $32.8 billion, up 3.5 percent from 2017, driven by organic growth."
+
+QUESTIONS = [
+    {"financebench_id": "q1", "question": "What were 3M net sales in 2018?", "doc_name": "3M_2018_10K",
+     "evidence": [{"evidence_text": EVIDENCE, "doc_name": "3M_2018_10K", "evidence_page_num": 24}]},
+    {"financebench_id": "q2", "question": "Is Pfizer spinning off Upjohn?", "doc_name": "PFIZER_2019_10K", "evidence": []},
+]
+
+
+def chunk(filename, text):
+    return {"filename": filename, "document": text}
+
+
+class TestEvidenceMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = EvidenceMatcher(overlap=0.5)
+        self.evidence = {"doc": "3M_2018_10K", "text": EVIDENCE, "page": 24}
+
+    def test_needs_same_document_and_evidence_text(self):
+        self.assertTrue(self.matcher.matches(chunk("/filings/3M_2018_10K.pdf", "Overview. " + EVIDENCE + " Outlook."), self.evidence))
+        self.assertFalse(self.matcher.matches(chunk("3M_2019_10K.pdf", EVIDENCE), self.evidence))
+        self.assertFalse(self.matcher.matches(chunk("3M_2018_10K.pdf", "Capital expenditure was flat."), self.evidence))
+        # aisearch schema
+        self.assertTrue(self.matcher.matches({"ExternalSourceName": "3m_2018_10k", "Text": EVIDENCE}, self.evidence))
+
+    def test_recall_and_reciprocal_rank(self):
+        results = [chunk("3M_2018_10K.pdf", "Unrelated."), chunk("PFIZER_2019_10K.pdf", EVIDENCE), chunk("3M_2018_10K.pdf", EVIDENCE)]
+        scores = self.matcher.score(results, [self.evidence], ks=[1, 3])
+        self.assertEqual((scores["recall@1"], scores["recall@3"]), (0.0, 1.0))
+        self.assertAlmostEqual(scores["rr"], 1 / 3)
+        self.assertEqual(self.matcher.score([], [self.evidence], ks=[1])["rr"], 0.0)
+
+
+class TestRetrievalBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "questions.jsonl")
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("\n".join(json.dumps(question) for question in QUESTIONS))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_financebench_format(self):
+        questions = load_questions(self.path)
+        self.assertEqual([question["id"] for question in questions], ["q1", "q2"])
+        self.assertEqual(questions[0]["evidence"][0]["doc"], "3M_2018_10K")
+        # Without evidence texts the labeled document is the evidence
+        self.assertEqual(questions[1]["evidence"], [{"doc": "PFIZER_2019_10K", "text": "", "page": None}])
+
+    def test_report_per_strategy(self):
+        calls = {"embeddings": 0}
+
+        async def good(ask):
+            calls["embeddings"] += 1
+            results = [chunk("3M_2018_10K.pdf", EVIDENCE), chunk("PFIZER_2019_10K.pdf", "Upjohn spin-off.")]
+            return {"results": results, "context": "one two three four", "timings": {"search": {"duration_ms": 12.0}}}
+
+        async def broken(ask):
+            if "Pfizer" in ask:
+                raise RuntimeError("search unavailable")
+            return {"results": [], "context": ""}
+
+        benchmark = RetrievalBenchmark(
+            {"good": good, "broken": broken}, ks=[1, 5], counter=lambda text: len(text.split()),
+            embedding_calls=lambda: calls["embeddings"],
+        )
+        report = asyncio.run(benchmark.run(load_questions(self.path)))
+
+        good_summary = report["strategies"]["good"]
+        self.assertEqual(good_summary["recall@1"], 0.5)
+        self.assertEqual(good_summary["recall@5"], 1.0)
+        self.assertEqual(good_summary["mrr"], 0.75)
+        self.assertEqual(good_summary["context_tokens"]["mean"], 4)
+        self.assertEqual(good_summary["embedding_calls_per_question"], 1)
+        self.assertEqual(good_summary["latency_ms"]["search"]["p50"], 12.0)
+        self.assertIn("total", good_summary["latency_ms"])
+
+        broken_summary = report["strategies"]["broken"]
+        self.assertEqual((broken_summary["errors"], broken_summary["mrr"]), (1, 0.0))
+        table = format_report(report, ks=[1, 5])
+        self.assertEqual(len(table.splitlines()), 3)
+        self.assertIn("0.750", table)
+
+
+if __name__ == '__main__':
+    unittest.main()
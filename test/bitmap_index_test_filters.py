@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import asyncio
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import plugins.AISearch.vsearch as vsearch_module
+from azure.search.documents.models import VectorizedQuery
+from plugins.AISearch.backends import LocalSearchIndex
+from plugins.AISearch.bitmap_index import MetadataBitmapIndex, years_from_dates
+from plugins.AISearch.vsearch import VSearch
+
+DOCUMENTS = [
+    {"id": "1", "document": "3M revenue 2015", "referenced_entity": "MMM", "referenced_year": "2015", "referenced_location": "US", "embedding": [1.0, 0.0]},
+    {"id": "2", "document": "3M revenue 2016", "referenced_entity": "MMM", "referenced_year": "2016", "referenced_location": "US", "embedding": [0.9, 0.1]},
+    {"id": "3", "document": "3M revenue 2019", "referenced_entity": "MMM", "referenced_year": "2019", "referenced_location": "US", "embedding": [0.8, 0.2]},
+    {"id": "4", "document": "Pfizer revenue 2017", "referenced_entity": "PFE", "referenced_year": "2017", "referenced_location": "US", "embedding": [0.2, 0.8]},
+    {"id": "5", "document": "Nestle revenue 2016", "referenced_entity": "NESN", "referenced_year": "2016", "referenced_location": "CH", "embedding": [0.5, 0.5]},
+]
+
+MMM_PFE_2015_2017 = {"ticker": ["mmm", "PFE"], "dates": ["2015-01-01", "2017-12-31"]}
+
+
+def ids(results):
+    return [result["id"] for result in results]
+
+
+class TestMetadataBitmapIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = MetadataBitmapIndex.from_documents(DOCUMENTS)
+        self.index.filter_locations = True
+
+    def positions(self, bitmap):
+        return list(np.flatnonzero(self.index.mask(bitmap)))
+
+    def test_years_cover_whole_interval(self):
+        self.assertEqual(years_from_dates(["2015-01-01", "2017-12-31"]), ["2015", "2016", "2017"])
+        self.assertEqual(years_from_dates(["bad"]), [])
+
+    def test_multi_ticker_or_and_year_range(self):
+        self.assertEqual(self.positions(self.index.for_entities(MMM_PFE_2015_2017)), [0, 1, 3])
+        self.assertEqual(self.index.count(self.index.for_entities(MMM_PFE_2015_2017)), 3)
+
+    def test_groups_per_ticker(self):
+        groups = self.index.groups(MMM_PFE_2015_2017)
+        self.assertEqual(list(groups), ["MMM", "PFE"])
+        self.assertEqual(self.positions(groups["PFE"]), [3])
+
+    def test_location_and_country_keys(self):
+        self.assertEqual(self.positions(self.index.for_entities({"location": ["CH"]})), [4])
+        self.assertEqual(self.positions(self.index.for_entities({"country": ["US"], "dates": ["2016-01-01", "2016-12-31"]})), [1])
+
+    def test_locations_are_opt_in(self):
+        index = MetadataBitmapIndex.from_documents(DOCUMENTS)
+        self.assertFalse(index.filter_locations)
+        self.assertEqual(self.positions(index.for_entities({"ticker": ["NESN"], "country": ["IT"]})), [4])
+
+    def test_rare_values_are_stored_as_positions(self):
+        documents = [{"referenced_entity": "MMM" if i % 2 else "PFE", "referenced_year": "2016"} for i in range(4096)]
+        for i in (7, 100, 4000):
+            documents[i]["referenced_entity"] = "NESN"
+        index = MetadataBitmapIndex.from_documents(documents)
+        self.assertEqual(index.bitmaps["referenced_entity"]["NESN"].tolist(), [7, 100, 4000])
+        self.assertEqual(index.bitmaps["referenced_year"]["2016"].dtype, np.uint8)
+        self.assertEqual(list(np.flatnonzero(index.mask(index.value("referenced_entity", "NESN")))), [7, 100, 4000])
+        both = index.for_entities({"ticker": ["NESN", "PFE"], "dates": ["2016-01-01", "2016-12-31"]})
+        self.assertEqual(index.count(both), 2048 - 2 + 3)
+        self.assertEqual(index.count(index.any_of("referenced_entity", ["NESN", "MMM"])), 2048 - 1 + 3)
+        self.assertLess(index.nbytes(), 4 * 512)
+
+    def test_no_entities_matches_everything(self):
+        self.assertEqual(self.positions(self.index.for_entities({"ticker": None, "dates": None})), [0, 1, 2, 3, 4])
+        self.assertEqual(self.positions(self.index.for_entities({"ticker": ["XOM"]})), [])
+
+
+class TestLocalSearchEntities(unittest.TestCase):
+    def setUp(self):
+        self.index = LocalSearchIndex()
+        self.index.upload_documents(DOCUMENTS)
+        self.vector_query = VectorizedQuery(vector=[1.0, 0.0], k_nearest_neighbors=5, fields="embedding")
+
+    def test_one_scan_returns_top_k_per_ticker(self):
+        groups = self.index.search_entities("revenue", self.vector_query, MMM_PFE_2015_2017, select=["id"], top=3)
+        self.assertEqual(ids(groups["MMM"]), ["1", "2"])
+        self.assertEqual(ids(groups["PFE"]), ["4"])
+
+    def test_metadata_rebuilt_after_upload(self):
+        self.assertEqual(self.index.metadata.size, 5)
+        self.index.upload_documents([{"id": "6", "document": "Pfizer 2016", "referenced_entity": "PFE", "referenced_year": "2016", "embedding": [0.0, 1.0]}])
+        groups = self.index.search_entities(None, self.vector_query, MMM_PFE_2015_2017, select=["id"])
+        self.assertEqual(ids(groups["PFE"]), ["4", "6"])
+
+
+class TestVSearchLocalRetrieve(unittest.TestCase):
+    def setUp(self):
+        self.index = LocalSearchIndex()
+        self.index.upload_documents(DOCUMENTS)
+        self.original_client = vsearch_module.get_search_client
+        vsearch_module.get_search_client = lambda *args: self.index
+        self.vsearch = VSearch()
+
+        async def generate_embeddings(text):
+            return [1.0, 0.0]
+
+        async def run_searches(*args, **kwargs):
+            raise AssertionError("the local backend should not run one search per filter")
+
+        self.vsearch.generate_embeddings = generate_embeddings
+        self.vsearch.run_searches = run_searches
+
+    def tearDown(self):
+        vsearch_module.get_search_client = self.original_client
+
+    def test_single_filtered_scan(self):
+        retrieval = asyncio.run(self.vsearch.retrieve("Average revenue of 3M and Pfizer 2015-2017", entities=MMM_PFE_2015_2017))
+        documents = retrieval["documents"]
+        self.assertEqual([document["filter"] for document in documents], ["referenced_entity eq 'MMM'", "referenced_entity eq 'PFE'"])
+        self.assertEqual(ids(documents[0]["retrieved_info"]), ["1", "2"])
+        self.assertEqual(ids(documents[1]["retrieved_info"]), ["4"])
+
+
+if __name__ == '__main__':
+    unittest.main()
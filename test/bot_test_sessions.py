@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from semantic_kernel import ContextVariables
+import src.bot as bot_module
+from plugins.sessions import MemorySessionStore
+
+
+class FakeKernel:
+    skills = []
+
+    def create_new_context(self, variables):
+        return variables
+
+
+class FakeResult:
+    def __init__(self, result):
+        self.result = result
+
+
+class FakePlanner:
+    """
+    Stands in for ActionPlanner: its plan does what the search plugins do with the session in the context.
+    """
+    searches = []
+
+    def __init__(self, kernel):
+        pass
+
+    async def create_plan_async(self, goal):
+        return self
+
+    async def invoke_async(self, query, context):
+        async def search():
+            FakePlanner.searches.append(query)
+            return [f"documents for {query}"]
+
+        session = context.get("session")
+        documents = await session.retrieve(f"{context['index_name']}\n{query}", search)
+        return FakeResult(documents[0])
+
+
+class TestBotSessions(unittest.TestCase):
+    def setUp(self):
+        self.original_planner = bot_module.ActionPlanner
+        bot_module.ActionPlanner = FakePlanner
+        FakePlanner.searches = []
+        self.store = MemorySessionStore()
+
+    def tearDown(self):
+        bot_module.ActionPlanner = self.original_planner
+
+    def new_bot(self):
+        # A fresh bot per turn, as if each turn were served by another worker
+        return bot_module.bot(FakeKernel(), ContextVariables(), store=self.store)
+
+    def test_repeated_ask_reuses_the_session_retrieval(self):
+        session_id = bot_module.bot.new_session_id()
+        first = asyncio.run(self.new_bot().ask("docs", "What is the onboarding process?", "", session_id))
+        second = asyncio.run(self.new_bot().ask("docs", "what is the onboarding process", "", session_id))
+        self.assertEqual(first, second)
+        self.assertEqual(FakePlanner.searches, ["What is the onboarding process?"])
+        self.assertEqual(len(self.store.get(session_id)["history"]["turns"]), 2)
+
+    def test_sessions_do_not_share_retrievals(self):
+        asyncio.run(self.new_bot().ask("docs", "What is the onboarding process?", "", bot_module.bot.new_session_id()))
+        asyncio.run(self.new_bot().ask("docs", "What is the onboarding process?", "", bot_module.bot.new_session_id()))
+        self.assertEqual(len(FakePlanner.searches), 2)
+
+    def test_session_id_is_required(self):
+        self.assertNotEqual(bot_module.bot.new_session_id(), bot_module.bot.new_session_id())
+        with self.assertRaises(ValueError):
+            asyncio.run(self.new_bot().ask("docs", "What is the onboarding process?", "", ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
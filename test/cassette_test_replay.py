@@ -0,0 +1,144 @@
+import unittest
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import httpx
+import plugins.AISearch.clients as clients_module
+from openai import AzureOpenAI, NotFoundError
+from plugins.AISearch.cassette import AsyncCassetteTransport, Cassette, CassetteTransport, request_key
+from plugins.AISearch.clients import ClientRegistry
+
+EMBEDDINGS_URL = "https://aoai.example.com/openai/deployments/ada/embeddings?api-version=2023-05-15"
+EMBEDDING_RESPONSE = {
+    "object": "list",
+    "data": [{"object": "embedding", "index": 0, "embedding": [0.25, 0.5]}],
+    "model": "ada",
+    "usage": {"prompt_tokens": 2, "total_tokens": 2},
+}
+
+
+class SearchStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        SearchStub.requests += 1
+        body = json.dumps({"value": [{"@search.score": 1.0, "id": "1", "document": "Revenue was 1,000"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; odata.metadata=none")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "genai.jsonl")
+        self.live_calls = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def live(self, request):
+        self.live_calls += 1
+        return httpx.Response(200, json=EMBEDDING_RESPONSE)
+
+    def openai_client(self, transport):
+        return AzureOpenAI(api_key="key", api_version="2023-05-15", azure_endpoint="https://aoai.example.com",
+                           http_client=httpx.Client(transport=transport), max_retries=0)
+
+    def test_request_key_ignores_host_secrets_and_json_order(self):
+        self.assertEqual(
+            request_key("POST", EMBEDDINGS_URL + "&api-key=secret", b'{"input": "hi", "model": "ada"}'),
+            request_key("post", EMBEDDINGS_URL.replace("aoai.example.com", "replay.invalid"), b'{"model":"ada","input":"hi"}'),
+        )
+        self.assertNotEqual(request_key("POST", EMBEDDINGS_URL, b'{"input": "hi"}'), request_key("POST", EMBEDDINGS_URL, b'{"input": "ho"}'))
+
+    def test_record_then_replay_offline(self):
+        recorder = Cassette(self.path, mode="record")
+        client = self.openai_client(CassetteTransport(recorder, httpx.MockTransport(self.live)))
+        client.embeddings.create(input="Revenue of 3M", model="ada")
+        client.embeddings.create(input="Revenue of 3M", model="ada")
+        self.assertEqual(recorder.stats["recorded"], 1)
+        self.assertEqual(self.live_calls, 2)
+
+        replayer = Cassette(self.path, mode="replay")
+        client = self.openai_client(CassetteTransport(replayer))
+        response = client.embeddings.create(input="Revenue of 3M", model="ada")
+        self.assertEqual(response.data[0].embedding, [0.25, 0.5])
+        self.assertEqual(self.live_calls, 2)
+        with self.assertRaises(NotFoundError):
+            client.embeddings.create(input="never recorded", model="ada")
+        self.assertEqual((replayer.stats["hits"], replayer.stats["misses"]), (1, 1))
+
+    def test_async_transport(self):
+        recorder = Cassette(self.path, mode="record")
+        recorder.record("POST", EMBEDDINGS_URL, b'{"input": "hi"}', 200, {"content-type": "application/json"}, json.dumps(EMBEDDING_RESPONSE).encode("utf-8"))
+
+        async def replay():
+            async with httpx.AsyncClient(transport=AsyncCassetteTransport(Cassette(self.path, mode="replay", latency_ms=30))) as client:
+                started_at = time.perf_counter()
+                response = await client.post(EMBEDDINGS_URL, content=b'{"input":"hi"}')
+                return response, time.perf_counter() - started_at
+
+        response, elapsed = asyncio.run(replay())
+        self.assertEqual(response.json()["model"], "ada")
+        self.assertGreaterEqual(elapsed, 0.03)
+
+    def test_failures_are_not_recorded(self):
+        recorder = Cassette(self.path, mode="record")
+        recorder.record("POST", EMBEDDINGS_URL, b"{}", 429, {}, b'{"error": "throttled"}')
+        self.assertEqual(len(recorder), 0)
+
+    def test_injected_errors_are_deterministic(self):
+        def failures(seed):
+            cassette = Cassette(self.path, mode="replay", error_rate=0.3, seed=seed)
+            return [cassette.replay("POST", EMBEDDINGS_URL, b"{}")[1] for _ in range(200)]
+
+        first = failures(seed=7)
+        self.assertEqual(first, failures(seed=7))
+        self.assertTrue(40 < first.count(503) < 80, first.count(503))
+
+    def test_search_client_record_and_replay(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SearchStub)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+        original = clients_module.get_cassette
+        try:
+            clients_module.get_cassette = lambda: Cassette(self.path, mode="record")
+            registry = ClientRegistry(search_backend="azure")
+            recorded = list(registry.search(endpoint, "filings", "key").search(search_text="revenue", top=3))
+            registry.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        try:
+            clients_module.get_cassette = lambda: Cassette(self.path, mode="replay")
+            registry = ClientRegistry(search_backend="azure")
+            # The stub is gone: the answer can only come from the cassette
+            replayed = list(registry.search(endpoint, "filings", "key").search(search_text="revenue", top=3))
+            registry.close()
+        finally:
+            clients_module.get_cassette = original
+        self.assertEqual(SearchStub.requests, 1)
+        self.assertEqual([result["document"] for result in replayed], [result["document"] for result in recorded])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.clients import ClientRegistry
+
+
+class TestAsyncClients(unittest.TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+        self.arguments = {"api_key": "key", "azure_endpoint": "https://example.openai.azure.com", "api_version": "2024-02-01"}
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_one_client_per_loop(self):
+        async def twice():
+            return self.registry.async_openai(**self.arguments), self.registry.async_openai(**self.arguments)
+
+        first, second = asyncio.run(twice())
+        self.assertIs(first, second)
+
+    def test_clients_of_closed_loops_are_dropped(self):
+        async def client():
+            return self.registry.async_openai(**self.arguments)
+
+        clients = [asyncio.run(client()) for _ in range(5)]
+        self.assertEqual(len({id(c) for c in clients}), 5)
+        # Only the client of the last loop is still held
+        self.assertEqual(len(self.registry._clients), 1)
+        self.assertEqual(len(self.registry._loops), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.context_packer import ContextPacker, count_tokens, fair_shares, get_encoding, trim_overlap, truncate_to_tokens
+
+
+def words(text):
+    return len(text.split())
+
+
+def render(item):
+    return f"Document: {item['document']}\n"
+
+
+def chunk(text, source="3M_2018_10K.pdf"):
+    return {"document": text, "filename": source}
+
+
+def sentences(prefix, count):
+    return " ".join(f"{prefix} sentence {i} about revenue." for i in range(count))
+
+
+class TestHelpers(unittest.TestCase):
+    def test_fair_shares_redistributes_unused_budget(self):
+        self.assertEqual(fair_shares([100, 1000, 1000], 900), [100, 400, 400])
+        self.assertEqual(fair_shares([10, 20], 900), [10, 20])
+        self.assertEqual(fair_shares([0, 500], 300), [0, 300])
+
+    def test_truncate_keeps_whole_sentences(self):
+        text = "Revenue grew. Margins fell sharply. Capex was flat."
+        self.assertEqual(truncate_to_tokens(text, 5, words), "Revenue grew. Margins fell sharply.")
+        self.assertEqual(truncate_to_tokens(text, 1, words), "")
+
+    def test_trim_overlap(self):
+        previous = "Net sales were 32.8 billion dollars in 2018 and operating income was 7.2 billion."
+        text = "in 2018 and operating income was 7.2 billion. Cash flow from operations was 6.4 billion."
+        self.assertEqual(trim_overlap(previous, text), "Cash flow from operations was 6.4 billion.")
+        self.assertEqual(trim_overlap(previous, "Unrelated text about a different topic entirely here."), "Unrelated text about a different topic entirely here.")
+
+
+class TestContextPacker(unittest.TestCase):
+    def setUp(self):
+        self.packer = ContextPacker(max_tokens=120, min_truncated_tokens=10, counter=words)
+
+    def test_duplicates_are_dropped(self):
+        text = sentences("MMM", 3)
+        packed, stats = self.packer.pack([[chunk(text), chunk(text + " Extra.")]], "document", render)
+        self.assertEqual(len(packed[0]), 1)
+        self.assertEqual(stats["duplicates"], 1)
+
+    def test_budget_is_shared_between_groups(self):
+        groups = [
+            [chunk(sentences("MMM", 10)), chunk(sentences("MMM second", 10))],
+            [chunk(sentences("PFE", 2), source="PFIZER_2021_10K.pdf")],
+        ]
+        packed, stats = self.packer.pack(groups, "document", render)
+        self.assertLessEqual(sum(words(render(item)) for group in packed for item in group), 120)
+        # The short group is kept whole; the long one gets the rest, cut at a sentence boundary
+        self.assertEqual(packed[1][0]["document"], sentences("PFE", 2))
+        self.assertTrue(packed[0][-1]["document"].endswith("revenue."))
+        self.assertEqual(stats["truncated"], 1)
+        self.assertEqual(stats["tokens_out"], sum(words(render(item)) for group in packed for item in group))
+
+    def test_stats_are_per_call(self):
+        # One packer is shared by every request, so a call must not see the counts of another
+        text = sentences("MMM", 3)
+        _, first = self.packer.pack([[chunk(text), chunk(text)]], "document", render)
+        _, second = self.packer.pack([[chunk(sentences("PFE", 2))]], "document", render)
+        self.assertEqual((first["duplicates"], second["duplicates"]), (1, 0))
+        self.assertEqual(second["tokens_in"], words(render(chunk(sentences("PFE", 2)))))
+
+    def test_input_is_not_modified(self):
+        group = [chunk(sentences("MMM", 40))]
+        self.packer.pack([group], "document", render)
+        self.assertEqual(group[0]["document"], sentences("MMM", 40))
+
+
+@unittest.skipUnless(get_encoding() is not None, "needs tiktoken and its cl100k_base encoding")
+class TestTiktokenPacking(unittest.TestCase):
+    def test_packed_context_fits_the_real_token_budget(self):
+        groups = [
+            [chunk(sentences("3M net sales of 32,765 million", 12)), chunk(sentences("3M capex", 12))],
+            [chunk(sentences("Pfizer revenue of 81,288 million", 12), source="PFIZER_2021_10K.pdf")],
+        ]
+        encoding = get_encoding()
+        packed, stats = ContextPacker(max_tokens=200).pack(groups, "document", render)
+        rendered = "".join(render(item) for group in packed for item in group)
+        self.assertLessEqual(len(encoding.encode(rendered)), 200)
+        self.assertEqual(stats["tokens_out"], sum(count_tokens(render(item)) for group in packed for item in group))
+        self.assertTrue(packed[0] and packed[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.embedding_cache import EmbeddingCache, normalize_text
+from plugins.AISearch.embeddings import EmbeddingService
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "embeddings.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text("  What is the Revenue of 3M?  "), "what is the revenue of 3m")
+        self.assertEqual(normalize_text("What is\tthe revenue of 3M"), "what is the revenue of 3m")
+
+    def test_key_depends_on_model(self):
+        self.assertNotEqual(EmbeddingCache.make_key("ada", "revenue"), EmbeddingCache.make_key("large", "revenue"))
+
+    def test_memory_hit_and_stats(self):
+        cache = EmbeddingCache(path=None)
+        self.assertIsNone(cache.get("ada", "Revenue of 3M?"))
+        cache.put("ada", "Revenue of 3M?", [0.5, 0.25])
+        self.assertEqual(cache.get("ada", "revenue of 3m"), [0.5, 0.25])
+        self.assertEqual(cache.stats["memory_hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+
+    def test_disk_tier_survives_restart(self):
+        cache = EmbeddingCache(path=self.path)
+        cache.put("ada", "Revenue of 3M", [0.5, 0.25])
+        cache.close()
+
+        reopened = EmbeddingCache(path=self.path)
+        self.assertEqual(reopened.get("ada", "Revenue of 3M"), [0.5, 0.25])
+        self.assertEqual(reopened.stats["disk_hits"], 1)
+        reopened.close()
+
+    def test_returns_copies(self):
+        cache = EmbeddingCache(path=None)
+        cache.put("ada", "Revenue of 3M", [0.5, 0.25])
+        cache.get("ada", "Revenue of 3M").append(1.0)
+        self.assertEqual(cache.get("ada", "Revenue of 3M"), [0.5, 0.25])
+
+    def test_put_many_and_reads_do_not_write(self):
+        cache = EmbeddingCache(path=self.path)
+        cache.put_many("ada", {"a": [1.0], "b": [2.0], "c": [3.0]})
+        cache.close()
+
+        reopened = EmbeddingCache(path=self.path)
+        changes = reopened._db.total_changes
+        self.assertEqual([reopened.get("ada", text) for text in "abc"], [[1.0], [2.0], [3.0]])
+        self.assertEqual(reopened._db.total_changes, changes)
+        self.assertEqual(reopened.stats["disk_hits"], 3)
+        reopened.close()
+
+    def test_memory_lru_eviction(self):
+        cache = EmbeddingCache(path=None, max_memory_entries=2)
+        cache.put("ada", "a", [1.0])
+        cache.put("ada", "b", [2.0])
+        cache.get("ada", "a")
+        cache.put("ada", "c", [3.0])
+        self.assertIsNone(cache.get("ada", "b"))
+        self.assertEqual(cache.get("ada", "a"), [1.0])
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_service_skips_round_trip_on_hit(self):
+        calls = []
+
+        async def create(input, model):
+            calls.append(list(input))
+            return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0]) for i in range(len(input))])
+
+        client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+        service = EmbeddingService(model="ada", batch_window=0.001, client_factory=lambda: client, cache=EmbeddingCache(path=None))
+
+        async def run():
+            await service.embed("What is the revenue of 3M?")
+            await service.embed("what is the revenue of 3M")
+
+        asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
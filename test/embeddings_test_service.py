@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.embeddings import EmbeddingService
+
+
+class FakeEmbeddings:
+    """Stands in for client.embeddings; records every batch it receives."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def create(self, input, model):
+        self.calls.append(list(input))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("service unavailable")
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), float(i)]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+
+class TestEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeEmbeddings()
+        self.client = SimpleNamespace(embeddings=self.fake)
+        self.service = EmbeddingService(
+            model="ada", batch_window=0.01, max_batch_size=8, max_concurrency=2, client_factory=lambda: self.client
+        )
+
+    def test_concurrent_requests_are_coalesced(self):
+        texts = [f"question {i}" * (i + 1) for i in range(5)]
+        vectors = asyncio.run(self.service.embed_many(texts))
+        self.assertEqual(len(self.fake.calls), 1)
+        self.assertEqual(self.fake.calls[0], texts)
+        self.assertEqual([v[0] for v in vectors], [float(len(t)) for t in texts])
+
+    def test_batches_are_capped_by_size(self):
+        texts = [f"q{i}" for i in range(20)]
+        vectors = asyncio.run(self.service.embed_many(texts))
+        self.assertEqual(len(vectors), 20)
+        self.assertTrue(all(len(call) <= 8 for call in self.fake.calls))
+        self.assertEqual(sum(len(call) for call in self.fake.calls), 20)
+
+    def test_duplicate_texts_are_sent_once(self):
+        vectors = asyncio.run(self.service.embed_many(["revenue of 3M", "revenue of 3M"]))
+        self.assertEqual(self.fake.calls, [["revenue of 3M"]])
+        self.assertEqual(vectors[0], vectors[1])
+
+    def test_errors_reach_every_caller(self):
+        self.fake.fail = True
+
+        async def run():
+            return await asyncio.gather(self.service.embed("a"), self.service.embed("b"), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import plugins.AISearch.vsearch as vsearch
+from plugins.AISearch.entities import EntityExtractor, ENTITY_CONFIDENCE_THRESHOLD, normalize_countries
+from plugins.AISearch.vsearch import VSearch
+from vsearch_test_extract_entities import QUESTIONS, LLM_RESULTS
+
+# Recorded prompt results that are wrong, with the entities the fast path must return instead
+LLM_CORRECTIONS = {
+    # BHC is the parent Bausch Health; Bausch + Lomb trades as BLCO
+    "Can you provide the net income figures for Bausch + Lomb Corporation in France for 2019?": {"ticker": ["BLCO"]},
+    # ENV is Envestnet
+    "What was the total asset value of Enovis Corporation in Russia for the year 2020?": {"ticker": ["ENOV"]},
+    "What was the export volume of ICU Medical products to Japan in 2020?": {"ticker": ["ICUI"]},
+    "How did Viatris Inc. perform in the Australian pharmaceutical market after its recent merger in 2021?": {"dates": ["2021-01-01", "2021-12-31"]},
+}
+
+
+class TestEntityExtractor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.extractor = EntityExtractor()
+
+    def assertExtracts(self, question, ticker, country, dates):
+        result, confidence = self.extractor.extract(question)
+        self.assertEqual(result, {"ticker": ticker, "country": country, "dates": dates})
+        self.assertGreaterEqual(confidence, ENTITY_CONFIDENCE_THRESHOLD)
+
+    def test_many_companies_in_order(self):
+        self.assertExtracts("How did Pfizer, Abbott, and Johnson & Johnson perform in 2022 in China?",
+                            ["PFE", "ABT", "JNJ"], ["CN"], ["2022-01-01", "2022-12-31"])
+
+    def test_fiscal_year_range(self):
+        self.assertExtracts("What is the FY2017 - FY2019 3 year average of capex for 3M in France?",
+                            ["MMM"], ["FR"], ["2017-01-01", "2019-12-31"])
+
+    def test_no_ticker(self):
+        self.assertExtracts("What was the revenue in the USA for the fiscal year 2021?",
+                            None, ["US"], ["2021-01-01", "2021-12-31"])
+
+    def test_month_quarter_half_and_day(self):
+        self.assertExtracts("What were the sales of Merck in Germany in June 2020?", ["MRK"], ["DE"], ["2020-06-01", "2020-06-30"])
+        self.assertExtracts("Quarterly profit of General Electric in Q3 2019?", ["GE"], None, ["2019-07-01", "2019-09-30"])
+        self.assertExtracts("R&D investment of Biogen during the first half of 2022 in Germany?", ["BIIB"], ["DE"], ["2022-01-01", "2022-06-30"])
+        self.assertExtracts("Sales figures for Pfizer on 15th July 2020 in Canada?", ["PFE"], ["CA"], ["2020-07-15", "2020-07-15"])
+
+    def test_iso_country_code(self):
+        self.assertExtracts("How did Honeywell perform in Q4 2021 in the UK?", ["HON"], ["GB"], ["2021-10-01", "2021-12-31"])
+
+    def test_no_date(self):
+        self.assertExtracts("Current market capitalization of Bristol-Myers Squibb in the USA?", ["BMY"], ["US"], None)
+
+    def test_end_of_year(self):
+        self.assertExtracts("What was the total debt of Biogen Inc. in the UK as of the end of 2022?", ["BIIB"], ["GB"], ["2022-12-31", "2022-12-31"])
+
+    def test_unknown_names_lower_confidence(self):
+        # Companies outside companies.txt (even in lower case) and holidays are left to the LLM
+        for question in ["What is the FY2017 return on assets for Coca Cola in US?",
+                         "Can you provide The Hershey Company's chocolate sales figures in the USA for Valentine's Day 2021?",
+                         "what is the FY2019 revenue of coca cola in the US?",
+                         "how did moderna's margin change in 2021?"]:
+            with self.subTest(question=question):
+                _, confidence = self.extractor.extract(question)
+                self.assertLess(confidence, ENTITY_CONFIDENCE_THRESHOLD)
+
+    def test_normalize_countries(self):
+        self.assertEqual(normalize_countries(["UK"]), ["GB"])
+        self.assertEqual(normalize_countries(["usa", "Germany", "it"]), ["US", "DE", "IT"])
+        self.assertEqual(normalize_countries("EU"), ["EU"])
+        self.assertIsNone(normalize_countries(None))
+
+    def test_lowercase_asks_without_company_names(self):
+        self.assertExtracts("what was the revenue in the USA for the fiscal year 2021?", None, ["US"], ["2021-01-01", "2021-12-31"])
+        self.assertExtracts("what was the revenue of 3m in 2018?", ["MMM"], None, ["2018-01-01", "2018-12-31"])
+
+    def test_benchmark_questions(self):
+        # Most of the benchmark takes the fast path and agrees with the recorded prompt results
+        accepted = 0
+        for question, llm in zip(QUESTIONS, LLM_RESULTS):
+            result, confidence = self.extractor.extract(question)
+            if confidence >= ENTITY_CONFIDENCE_THRESHOLD:
+                accepted += 1
+                expected = dict(llm, **LLM_CORRECTIONS.get(question, {}))
+                self.assertEqual(result["ticker"], expected["ticker"], question)
+                # The prompt path goes through the same normalization before filtering
+                self.assertEqual(result["country"], normalize_countries(expected["country"]), question)
+                self.assertEqual(result["dates"], expected["dates"], question)
+        self.assertGreaterEqual(accepted / len(QUESTIONS), 0.9)
+
+
+class TestVSearchFastPath(unittest.TestCase):
+    def setUp(self):
+        self.original_get_kernel = vsearch.get_kernel
+
+        def no_kernel():
+            raise AssertionError("the LLM prompt should not be called")
+
+        vsearch.get_kernel = no_kernel
+
+    def tearDown(self):
+        vsearch.get_kernel = self.original_get_kernel
+
+    def test_prompt_countries_are_normalized(self):
+        original_get_semantic_plugin, original_run_prompt = vsearch.get_semantic_plugin, vsearch.run_prompt
+
+        async def run_prompt(function, input_context=None, input_vars=None):
+            return {"input": '{"ticker": ["KO"], "country": ["UK"], "dates": null}'}
+
+        vsearch.get_kernel = lambda: SimpleNamespace(create_new_context=dict)
+        vsearch.get_semantic_plugin = lambda name: {"extractEntities": None}
+        vsearch.run_prompt = run_prompt
+        try:
+            ask = "What is the FY2017 return on assets for Coca Cola in the UK?"
+            result = asyncio.run(VSearch().extract_entities({"input": {"ask": ask}}))
+        finally:
+            vsearch.get_semantic_plugin, vsearch.run_prompt = original_get_semantic_plugin, original_run_prompt
+        # The local extractor would have returned the same code for this ask
+        self.assertEqual(result["country"], ["GB"])
+        self.assertEqual(EntityExtractor().extract(ask)[0]["country"], ["GB"])
+
+    def test_confident_ask_skips_the_prompt(self):
+        result = asyncio.run(VSearch().extract_entities({"input": {"ask": "What is the FY2018 revenue of 3M?"}}))
+        self.assertEqual(result, {"ticker": ["MMM"], "country": None, "dates": ["2018-01-01", "2018-12-31"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from azure.search.documents.models import VectorizedQuery, VectorFilterMode
+from plugins.AISearch.backends import LocalSearchIndex
+from plugins.AISearch.fusion import FusionConfig, fuse, fuse_positions, hybrid_search
+
+DOCUMENTS = [
+    {"id": "1", "document": "3M revenue grew in 2021", "referenced_entity": "MMM", "embedding": [1.0, 0.0, 0.0]},
+    {"id": "2", "document": "3M capital expenditure 2018", "referenced_entity": "MMM", "embedding": [0.9, 0.1, 0.0]},
+    {"id": "3", "document": "Pfizer vaccine revenue 2021", "referenced_entity": "PFE", "embedding": [0.0, 1.0, 0.0]},
+    {"id": "4", "document": "Pfizer research pipeline", "referenced_entity": "PFE", "embedding": [0.1, 0.9, 0.1]},
+]
+
+
+def keys(results, field="id"):
+    return [result[field] for result in results]
+
+
+class RecordingClient:
+    def __init__(self, index=None):
+        self.index = index
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.index.search(**kwargs) if self.index else []
+
+
+class SlowClient(RecordingClient):
+    def __init__(self, index=None, delay=0.0):
+        super().__init__(index)
+        self.delay = delay
+        self.threads = set()
+
+    def search(self, **kwargs):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super().search(**kwargs)
+
+
+class TestFuse(unittest.TestCase):
+    def test_rrf_rewards_documents_in_both_lists(self):
+        keyword = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+        vector = [{"id": "c"}, {"id": "d"}, {"id": "b"}]
+        fused = fuse({"keyword": keyword, "vector": vector}, method="rrf", k=60)
+        self.assertEqual(keys(fused), ["c", "b", "a", "d"])
+        self.assertAlmostEqual(fused[0]["@search.fused_score"], 1 / 63 + 1 / 61)
+
+    def test_dedup_on_either_key_field(self):
+        fused = fuse({"keyword": [{"Id": "x", "Text": "k"}], "vector": [{"Id": "x", "Text": "v"}]}, top=5)
+        self.assertEqual(len(fused), 1)
+        self.assertEqual(fused[0]["Text"], "k")
+
+    def test_weights_favour_one_list(self):
+        keyword = [{"id": "a"}, {"id": "b"}]
+        vector = [{"id": "b"}, {"id": "a"}]
+        self.assertEqual(keys(fuse({"keyword": keyword, "vector": vector}, weights={"vector": 2.0})), ["b", "a"])
+        self.assertEqual(keys(fuse({"keyword": keyword, "vector": vector}, weights={"keyword": 2.0})), ["a", "b"])
+
+    def test_weighted_normalizes_scores_per_list(self):
+        keyword = [{"id": "a", "@search.score": 12.0}, {"id": "b", "@search.score": 2.0}]
+        vector = [{"id": "b", "@search.score": 0.9}, {"id": "a", "@search.score": 0.89}]
+        fused = fuse({"keyword": keyword, "vector": vector}, method="weighted", weights={"keyword": 0.3, "vector": 0.7}, top=1)
+        self.assertEqual(keys(fused), ["b"])
+        self.assertAlmostEqual(fused[0]["@search.fused_score"], 0.7)
+
+    def test_empty_lists(self):
+        self.assertEqual(fuse({"keyword": [], "vector": None}), [])
+        self.assertEqual(fuse_positions([[], []], 3), [])
+
+    def test_fuse_positions(self):
+        self.assertEqual([position for position, _ in fuse_positions([[0, 1], [1, 2]], 4)], [1, 0, 2])
+
+
+class TestFusionConfig(unittest.TestCase):
+    def test_from_env(self):
+        os.environ.update({"TESTFUSE_FUSION_METHOD": "RRF", "TESTFUSE_FUSION_WEIGHTS": "keyword=0.3, vector=0.7"})
+        try:
+            config = FusionConfig.from_env("TESTFUSE", top=4, list_size=8)
+        finally:
+            del os.environ["TESTFUSE_FUSION_METHOD"], os.environ["TESTFUSE_FUSION_WEIGHTS"]
+        self.assertTrue(config.client_side)
+        self.assertEqual(config.weights, {"keyword": 0.3, "vector": 0.7})
+        self.assertEqual((config.top, config.list_size, config.k), (4, 8, 60))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            FusionConfig(method="borda")
+
+
+class TestHybridSearch(unittest.TestCase):
+    def setUp(self):
+        index = LocalSearchIndex()
+        index.upload_documents(DOCUMENTS)
+        self.client = RecordingClient(index)
+        self.vector_query = VectorizedQuery(vector=[0.0, 1.0, 0.0], k_nearest_neighbors=5, fields="embedding")
+
+    def test_service_mode_is_one_request(self):
+        client = RecordingClient()
+        hybrid_search(client, "revenue", self.vector_query, FusionConfig(top=3), filter="referenced_entity eq 'MMM'", select=["id"])
+        self.assertEqual(client.calls, [{
+            "search_text": "revenue", "vector_queries": [self.vector_query], "select": ["id"], "top": 3,
+            "vector_filter_mode": VectorFilterMode.PRE_FILTER, "filter": "referenced_entity eq 'MMM'",
+        }])
+
+    def test_client_side_rrf(self):
+        results = hybrid_search(self.client, "revenue", self.vector_query, FusionConfig(method="rrf", top=2, list_size=4))
+        self.assertEqual(len(self.client.calls), 2)
+        self.assertIsNone(self.client.calls[1]["search_text"])
+        self.assertEqual(self.client.calls[1]["vector_queries"][0].k_nearest_neighbors, 4)
+        # Document 3 is the best vector match and a keyword match
+        self.assertEqual(keys(results)[0], "3")
+        self.assertEqual(len(results), 2)
+
+    def test_client_side_keeps_filter(self):
+        config = FusionConfig(method="rrf", top=3, list_size=4)
+        results = hybrid_search(self.client, "revenue", self.vector_query, config, filter="referenced_entity eq 'MMM'")
+        self.assertEqual(sorted(keys(results)), ["1", "2"])
+
+    def test_client_side_sub_queries_run_concurrently(self):
+        client = SlowClient(self.client.index, delay=0.2)
+        config = FusionConfig(method="rrf", top=2, list_size=4)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            started_at = time.perf_counter()
+            results = hybrid_search(client, "revenue", self.vector_query, config, executor=executor)
+        self.assertLess(time.perf_counter() - started_at, 0.4)
+        self.assertEqual(len(client.threads), 2)
+        self.assertEqual(results, hybrid_search(self.client, "revenue", self.vector_query, config))
+
+    def test_busy_pool_cannot_deadlock(self):
+        # hybrid_search itself runs on the only worker of the pool it sends its sub-query to
+        config = FusionConfig(method="rrf", top=2, list_size=4)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = executor.submit(hybrid_search, self.client, "revenue", self.vector_query, config, executor=executor).result(timeout=5)
+        self.assertEqual(keys(results)[0], "3")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.history import ConversationHistory
+
+
+def words(text):
+    return len(text.split())
+
+
+class FakeSummarizer:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, summary, chat_history):
+        self.calls.append(chat_history)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        folded = [line.split(" ", 1)[1][:20] for line in chat_history.splitlines() if line.startswith("User:")]
+        return " ".join(filter(None, [summary] + [f"Asked {topic}." for topic in folded]))
+
+
+class TestConversationHistory(unittest.TestCase):
+    def test_keeps_last_turns_and_summarizes_older(self):
+        async def session():
+            history = ConversationHistory(keep_turns=2, max_tokens=500, summarize=FakeSummarizer(), counter=words)
+            for i in range(5):
+                history.add_turn(f"question {i}", f"answer {i}")
+            await history.flush()
+            return history
+
+        history = asyncio.run(session())
+        self.assertEqual(history.turns, [("question 3", "answer 3"), ("question 4", "answer 4")])
+        self.assertEqual(history.pending, [])
+        rendered = history.render()
+        self.assertIn("Asked question 0.", rendered)
+        self.assertIn("Asked question 2.", rendered)
+        self.assertNotIn("answer 2", rendered)
+        self.assertTrue(rendered.endswith("User: question 4\nAssistant: answer 4\n"))
+
+    def test_render_does_not_wait_for_the_summary(self):
+        async def session():
+            summarizer = FakeSummarizer(delay=0.2)
+            history = ConversationHistory(keep_turns=1, max_tokens=500, summarize=summarizer, counter=words)
+            history.add_turn("question 0", "answer 0")
+            history.add_turn("question 1", "answer 1")
+            # Summary still running: the folded turn is still rendered verbatim
+            rendered = history.render()
+            await history.flush()
+            return rendered, history.render(), summarizer
+
+        before, after, summarizer = asyncio.run(session())
+        self.assertIn("answer 0", before)
+        self.assertNotIn("answer 0", after)
+        self.assertEqual(len(summarizer.calls), 1)
+
+    def test_token_ceiling_holds_in_long_sessions(self):
+        async def session():
+            history = ConversationHistory(keep_turns=3, max_tokens=60, summarize=FakeSummarizer(), counter=words)
+            sizes = []
+            for i in range(40):
+                history.add_turn(f"question {i} " + "about revenue " * 5, f"answer {i} " + "the revenue grew " * 5)
+                await asyncio.sleep(0)
+                sizes.append(words(history.render()))
+            return sizes
+
+        sizes = asyncio.run(session())
+        self.assertTrue(all(size <= 60 for size in sizes), sizes)
+
+    def test_failed_summary_keeps_turns_pending(self):
+        async def session():
+            history = ConversationHistory(keep_turns=1, max_tokens=500, summarize=FakeSummarizer(fail=True), counter=words)
+            history.add_turn("question 0", "answer 0")
+            history.add_turn("question 1", "answer 1")
+            await history.flush()
+            return history
+
+        history = asyncio.run(session())
+        self.assertEqual(history.pending, [("question 0", "answer 0")])
+        self.assertGreater(history.stats["summary_errors"], 0)
+        self.assertIn("answer 0", history.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import plugins.AISearch.ingestion as ingestion
+from plugins.AISearch.backends import LocalSearchIndex
+from plugins.AISearch.ingestion import (
+    IngestionPipeline,
+    LocalUploader,
+    Manifest,
+    build_documents,
+    chunk_text,
+    filename_metadata,
+    list_filings,
+)
+
+FILING = "Revenue grew in 2018. Operating margin improved.\n\nCapital expenditure was flat. " * 20
+SEGMENTS = "\n\n".join(f"Segment {i} revenue grew {i} percent in 2018, driven by pricing in region {i}." for i in range(40))
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    async def embed_many(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestChunking(unittest.TestCase):
+    def test_chunks_respect_size_and_boundaries(self):
+        chunks = list(chunk_text(FILING, chunk_size=200, overlap=40))
+        self.assertGreater(len(chunks), 5)
+        for start, chunk in chunks:
+            self.assertLessEqual(len(chunk), 200)
+            # Chunks (and their overlaps) start on a word boundary
+            self.assertTrue(start == 0 or FILING[start - 1].isspace(), chunk)
+        self.assertTrue(chunks[-1][1].endswith("flat."))
+
+    def test_consecutive_chunks_overlap(self):
+        chunks = list(chunk_text(FILING, chunk_size=200, overlap=40))
+        for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertLess(next_start, start + len(chunk))
+
+    def test_empty_text(self):
+        self.assertEqual(list(chunk_text("   ")), [])
+
+
+class TestFilenameMetadata(unittest.TestCase):
+    def test_financebench_names(self):
+        metadata = filename_metadata("/filings/JOHNSON_JOHNSON_2022Q4_EARNINGS.pdf")
+        self.assertEqual(metadata["referenced_entity"], "JNJ")
+        self.assertEqual((metadata["referenced_year"], metadata["quarter"], metadata["doc_type"]), ("2022", "4", "EARNINGS"))
+        self.assertEqual(filename_metadata("3M_2018_10K.pdf")["referenced_entity"], "MMM")
+
+    def test_unknown_company_keeps_its_name(self):
+        metadata = filename_metadata("ACME_WIDGETS_2019_10K.txt")
+        self.assertEqual(metadata["referenced_entity"], "ACMEWIDGETS")
+        self.assertEqual(metadata["referenced_year"], "2019")
+
+
+class TestIngestionPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filings = os.path.join(self.directory.name, "filings")
+        os.makedirs(self.filings)
+        for name in ["3M_2018_10K.txt", "PFIZER_2021_10K.txt", "notes.csv"]:
+            with open(os.path.join(self.filings, name), "w", encoding="utf-8") as file:
+                file.write(FILING)
+        self.index_dir = os.path.join(self.directory.name, "index")
+        self.manifest_path = os.path.join(self.directory.name, "manifest.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_pipeline(self, embedder, model="ada", prune=False):
+        self.pipeline = IngestionPipeline(
+            embedder.embed_many, LocalUploader(self.index_dir), manifest=Manifest(self.manifest_path, model=model),
+            chunk_size=300, overlap=30, checkpoint_every=1,
+        )
+        return asyncio.run(self.pipeline.run(list_filings([self.filings]), prune=prune))
+
+    def write(self, name, text):
+        with open(os.path.join(self.filings, name), "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def test_indexes_into_local_backend(self):
+        embedder = FakeEmbedder()
+        stats = self.run_pipeline(embedder)
+        self.assertEqual(stats["files"], 2)
+        self.assertEqual(embedder.texts, stats["chunks"])
+        self.assertGreater(stats["chunks_per_second"], 0)
+
+        index = LocalSearchIndex.load(self.index_dir)
+        self.assertEqual(len(index.documents), stats["chunks"])
+        results = index.search(search_text="capital expenditure", filter="referenced_entity eq 'PFE' and referenced_year eq '2021'")
+        self.assertTrue(results)
+        self.assertTrue(all(result["filename"] == "PFIZER_2021_10K.txt" for result in results))
+
+    def test_rerun_embeds_nothing(self):
+        self.run_pipeline(FakeEmbedder())
+        embedder = FakeEmbedder()
+        stats = self.run_pipeline(embedder)
+        self.assertEqual(stats["unchanged_files"], 2)
+        self.assertEqual(embedder.calls, 0)
+        self.assertEqual(self.pipeline.diff_report()["embedding_saved"], 1.0)
+
+    def test_only_changed_chunks_are_embedded(self):
+        first = self.run_pipeline(FakeEmbedder())
+        # Same length, so only the last chunk of the filing changes; the tail is cut, so its last chunk goes away
+        self.write("3M_2018_10K.txt", FILING[:-12] + "was higher. ")
+        self.write("PFIZER_2021_10K.txt", FILING[:900])
+        embedder = FakeEmbedder()
+        stats = self.run_pipeline(embedder)
+
+        report = self.pipeline.diff_report()
+        self.assertEqual(report["files"]["3M_2018_10K.txt"]["status"], "modified")
+        # Keys follow the text: the edited chunk is a new key and its old key is removed
+        self.assertEqual((report["files"]["3M_2018_10K.txt"]["added"], report["files"]["3M_2018_10K.txt"]["removed"]), (1, 1))
+        self.assertGreater(report["files"]["PFIZER_2021_10K.txt"]["removed"], 0)
+        self.assertEqual(embedder.texts, report["totals"]["added"])
+        self.assertLess(embedder.texts, first["chunks"] // 4)
+
+        index = LocalSearchIndex.load(self.index_dir)
+        self.assertEqual(len(index.documents), stats["chunks"])
+        self.assertTrue(any(document["document"].endswith("was higher.") for document in index.documents))
+
+    def test_inserted_text_only_embeds_the_new_chunk(self):
+        self.write("3M_2018_10K.txt", SEGMENTS)
+        self.run_pipeline(FakeEmbedder())
+        self.write("3M_2018_10K.txt", "Restated. " + SEGMENTS)
+        embedder = FakeEmbedder()
+        self.run_pipeline(embedder)
+
+        entry = self.pipeline.diff_report()["files"]["3M_2018_10K.txt"]
+        self.assertEqual((entry["added"], entry["removed"], entry["embedded"]), (1, 1, 1))
+        self.assertEqual(embedder.texts, 1)
+        index = LocalSearchIndex.load(self.index_dir)
+        self.assertTrue(any(document["document"].startswith("Restated.") for document in index.documents))
+
+    def test_new_page_keeps_the_vectors_of_later_pages(self):
+        pages = [(1, SEGMENTS)]
+        original_read_pages = ingestion.read_pages
+        ingestion.read_pages = lambda path: iter(pages) if path.endswith("3M_2018_10K.txt") else original_read_pages(path)
+        try:
+            self.run_pipeline(FakeEmbedder())
+            index = LocalSearchIndex.load(self.index_dir)
+            vectors = {document["id"]: index.vectors["embedding"][i].tolist() for i, document in enumerate(index.documents)}
+
+            # A cover page is inserted: the filing's chunks move to page 2 and keep their vectors
+            pages = [(1, "Cover page."), (2, SEGMENTS)]
+            self.write("3M_2018_10K.txt", "cover page added")
+            embedder = FakeEmbedder()
+            self.run_pipeline(embedder)
+        finally:
+            ingestion.read_pages = original_read_pages
+
+        entry = self.pipeline.diff_report()["files"]["3M_2018_10K.txt"]
+        self.assertEqual((entry["added"], entry["removed"], entry["embedded"]), (1, 0, 1))
+        self.assertEqual(embedder.texts, 1)
+        index = LocalSearchIndex.load(self.index_dir)
+        moved = [i for i, document in enumerate(index.documents) if document["id"] in vectors and document["filename"] == "3M_2018_10K.txt"]
+        self.assertGreater(entry["changed"], 0)
+        self.assertEqual(len(moved), entry["changed"])
+        for i in moved:
+            self.assertEqual(index.documents[i]["page"], 2)
+            self.assertEqual(index.vectors["embedding"][i].tolist(), vectors[index.documents[i]["id"]])
+
+    def test_prune_deletes_missing_files(self):
+        self.run_pipeline(FakeEmbedder())
+        os.remove(os.path.join(self.filings, "PFIZER_2021_10K.txt"))
+        stats = self.run_pipeline(FakeEmbedder(), prune=True)
+        self.assertEqual(stats["deleted_files"], 1)
+        index = LocalSearchIndex.load(self.index_dir)
+        self.assertEqual({document["filename"] for document in index.documents}, {"3M_2018_10K.txt"})
+
+    def test_new_model_embeds_everything_again(self):
+        first = self.run_pipeline(FakeEmbedder())
+        embedder = FakeEmbedder()
+        stats = self.run_pipeline(embedder, model="text-embedding-3-small")
+        self.assertEqual(embedder.texts, first["chunks"])
+        self.assertEqual(stats["deleted"], 0)
+
+    def test_failed_chunks_are_retried(self):
+        class FailingUploader(LocalUploader):
+            def upload(self, documents):
+                # The service rejects the first chunk of every upload
+                self.failed_keys.add(documents[0]["id"])
+                super().upload(documents[1:])
+
+        self.pipeline = IngestionPipeline(
+            FakeEmbedder().embed_many, FailingUploader(self.index_dir), manifest=Manifest(self.manifest_path, model="ada"),
+            chunk_size=300, overlap=30, checkpoint_every=1,
+        )
+        stats = asyncio.run(self.pipeline.run(list_filings([self.filings])))
+        self.assertEqual(stats["failed_chunks"], 2)
+        self.assertEqual(self.pipeline.diff_report()["files"]["3M_2018_10K.txt"]["failed"], 1)
+
+        embedder = FakeEmbedder()
+        stats = self.run_pipeline(embedder)
+        self.assertEqual((stats["unchanged_files"], embedder.texts), (0, 2))
+        self.assertEqual(len(LocalSearchIndex.load(self.index_dir).documents), stats["chunks"])
+
+    def test_aisearch_schema(self):
+        documents = list(build_documents(os.path.join(self.filings, "3M_2018_10K.txt"), schema="aisearch", chunk_size=300, overlap=30))
+        self.assertEqual(documents[0]["Description"], "MMM")
+        self.assertEqual(documents[0]["AdditionalMetadata"], "2018_10K_1_0")
+        self.assertEqual(len({document["Id"] for document in documents}), len(documents))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.pipeline import Pipeline
+from plugins.AISearch.vsearch import VSearch
+
+
+class TestPipeline(unittest.TestCase):
+    def test_independent_stages_overlap(self):
+        async def slow(value):
+            await asyncio.sleep(0.2)
+            return value
+
+        pipeline = Pipeline()
+        pipeline.add("a", lambda: slow(1))
+        pipeline.add("b", lambda: slow(2))
+        pipeline.add("sum", lambda a, b: a + b, "a", "b")
+
+        start = time.perf_counter()
+        results = asyncio.run(pipeline.run())
+        self.assertLess(time.perf_counter() - start, 0.35)
+        self.assertEqual(results["sum"], 3)
+        self.assertGreaterEqual(pipeline.timings["sum"]["start_ms"], pipeline.timings["a"]["end_ms"])
+        self.assertIn("total", pipeline.timings)
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            Pipeline().add("search", lambda filters: filters, "build_filters")
+
+    def test_failure_propagates(self):
+        def fail():
+            raise RuntimeError("extraction failed")
+
+        pipeline = Pipeline()
+        pipeline.add("extract", fail)
+        pipeline.add("filters", lambda entities: entities, "extract")
+        with self.assertRaises(RuntimeError):
+            asyncio.run(pipeline.run())
+
+
+class TestVSearchRetrieve(unittest.TestCase):
+    def setUp(self):
+        self.vsearch = VSearch()
+
+    def test_extraction_and_embedding_run_together(self):
+        async def extract_entities(context):
+            await asyncio.sleep(0.2)
+            return {"ticker": ["MMM"], "dates": ["2018-01-01", "2018-12-31"]}
+
+        async def generate_embeddings(text):
+            await asyncio.sleep(0.2)
+            return [0.1, 0.2]
+
+        async def run_grouped_search(search_client, ask, vector_query, entities):
+            return [{"filter": f"referenced_entity eq '{t}'", "retrieved_info": [{"id": "1"}]} for t in entities["ticker"]]
+
+        self.vsearch.extract_entities = extract_entities
+        self.vsearch.generate_embeddings = generate_embeddings
+        self.vsearch.run_grouped_search = run_grouped_search
+
+        retrieval = asyncio.run(self.vsearch.retrieve("What is the FY2018 revenue of 3M?"))
+        self.assertEqual(retrieval["filters"], ["referenced_entity eq 'MMM' and referenced_year eq '2018'"])
+        self.assertLess(retrieval["timings"]["total"]["duration_ms"], 350)
+        self.assertLess(retrieval["timings"]["embed_query"]["start_ms"], 50)
+
+    def test_failed_extraction_falls_back_to_unfiltered_search(self):
+        self.assertIsNone(self.vsearch.filters_from_entities("Error converting string to JSON"))
+
+
+if __name__ == '__main__':
+    unittest.main()
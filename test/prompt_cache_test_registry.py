@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.prompt_cache import PromptCache, is_deterministic
+from plugins.registry import KernelRegistry, PLUGINS_DIR
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPromptCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = PromptCache(path=None, ttl=60, clock=self.clock)
+        self.key = PromptCache.make_key("ASKProcess", "extractEntities", "Q: 3M sales?", "gpt", {"temperature": 0.0})
+
+    def test_key_covers_prompt_model_and_settings(self):
+        self.assertNotEqual(self.key, PromptCache.make_key("ASKProcess", "extractEntities", "Q: 3M sales", "gpt", {"temperature": 0.0}))
+        self.assertNotEqual(self.key, PromptCache.make_key("ASKProcess", "extractEntities", "Q: 3M sales?", "gpt-4", {"temperature": 0.0}))
+        self.assertNotEqual(self.key, PromptCache.make_key("ASKProcess", "extractEntities", "Q: 3M sales?", "gpt", {"temperature": 0.0, "max_tokens": 9}))
+
+    def test_ttl_and_version(self):
+        self.cache.put(self.key, '{"ticker": ["MMM"]}', "ASKProcess", "extractEntities", version=1.0)
+        self.assertEqual(self.cache.get(self.key, version=1.0), '{"ticker": ["MMM"]}')
+        # The prompt files changed since the row was written
+        self.assertIsNone(self.cache.get(self.key, version=2.0))
+        self.cache.put(self.key, "later", version=2.0)
+        self.clock.now += 61
+        self.assertIsNone(self.cache.get(self.key, version=2.0))
+        self.assertEqual(
+            {name: self.cache.stats[name] for name in ("hits", "misses", "invalidations", "expirations")},
+            {"hits": 1, "misses": 2, "invalidations": 1, "expirations": 1},
+        )
+
+    def test_only_deterministic_settings(self):
+        self.assertTrue(is_deterministic({"temperature": 0.0, "top_p": 0.1, "number_of_responses": 1}))
+        self.assertFalse(is_deterministic({"temperature": 0.7}))
+        self.assertFalse(is_deterministic({"temperature": 0.0, "number_of_responses": 3}))
+        self.assertTrue(is_deterministic({"temperature": 0.3}, max_temperature=0.5))
+
+
+class TestRunPrompt(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        shutil.copytree(os.path.join(PLUGINS_DIR, "ASKProcess"), os.path.join(self.tmpdir, "ASKProcess"))
+        self.cache = PromptCache(path=None)
+        self.registry = KernelRegistry(plugins_dir=self.tmpdir, check_interval=0, prompt_cache=self.cache)
+        self.kernel = self.registry.kernel()
+        self.calls = []
+
+        async def fake_run(function, input_context=None, input_vars=None):
+            self.calls.append((function.name, input_context["ask"]))
+            input_context.variables.update(f'{{"ticker": ["{input_context["ask"].split()[0]}"]}}')
+            return input_context
+
+        self.kernel.run = fake_run
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def extract(self, ask):
+        function = self.registry.semantic_plugin("ASKProcess")["extractEntities"]
+        my_context = self.kernel.create_new_context()
+        my_context["ask"] = ask
+        return asyncio.run(self.registry.run_prompt(function, input_context=my_context))
+
+    def test_repeat_ask_skips_the_model(self):
+        first = self.extract("MMM net sales 2018")
+        second = self.extract("MMM net sales 2018")
+        self.assertEqual(second["input"], first["input"])
+        self.assertEqual(second["ask"], "MMM net sales 2018")
+        self.extract("PFE net sales 2018")
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_prompt_change_invalidates(self):
+        self.extract("MMM net sales 2018")
+        prompt_path = os.path.join(self.tmpdir, "ASKProcess", "extractEntities", "skprompt.txt")
+        later = time.time() + 10
+        os.utime(prompt_path, (later, later))
+        self.extract("MMM net sales 2018")
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.stats["invalidations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.registry import KernelRegistry, PLUGINS_DIR
+
+
+class TestKernelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        shutil.copytree(os.path.join(PLUGINS_DIR, "ASKProcess"), os.path.join(self.tmpdir, "ASKProcess"))
+        self.registry = KernelRegistry(plugins_dir=self.tmpdir, check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_kernel_is_shared(self):
+        self.assertIs(self.registry.kernel(), self.registry.kernel())
+
+    def test_plugin_is_loaded_once(self):
+        first = self.registry.semantic_plugin("ASKProcess")
+        second = self.registry.semantic_plugin("ASKProcess")
+        self.assertIs(first, second)
+        self.assertIn("extractEntities", first)
+        self.assertEqual(self.registry.stats, {"loads": 1, "reloads": 0})
+
+    def test_plugin_reloads_when_prompt_changes(self):
+        first = self.registry.semantic_plugin("ASKProcess")
+        prompt_path = os.path.join(self.tmpdir, "ASKProcess", "extractEntities", "skprompt.txt")
+        later = time.time() + 10
+        os.utime(prompt_path, (later, later))
+        second = self.registry.semantic_plugin("ASKProcess")
+        self.assertIsNot(first, second)
+        self.assertEqual(self.registry.stats["reloads"], 1)
+
+    def test_native_plugin_is_imported_once(self):
+        class Echo:
+            from semantic_kernel.plugin_definition import kernel_function
+
+            @kernel_function(description="Echo the input", name="echo")
+            def echo(self, input: str) -> str:
+                return input
+
+        first = self.registry.native_plugin(Echo(), "Echo")
+        second = self.registry.native_plugin(Echo(), "Echo")
+        self.assertIs(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.AISearch.rewrite import RewriteStage, parse_rewrite, unresolved_reference
+
+HISTORY = """
+User: Can you tell me if the growth in Johnson & Johnson's adjusted EPS is expected to accelerate in FY2023?
+Assistant: Analysts are forecasting a potential acceleration in Johnson & Johnson's adjusted EPS for FY2023.
+"""
+
+
+class TestUnresolvedReference(unittest.TestCase):
+    def test_no_history_or_named_company_skips(self):
+        self.assertIsNone(unresolved_reference("Is it expected to accelerate?", ""))
+        self.assertIsNone(unresolved_reference("Did Pfizer's margin improve in FY2022?", HISTORY))
+        # Companies missing from companies.txt still count as named
+        self.assertIsNone(unresolved_reference("What is the FY2019 total amount of inventories for Best Buy?", HISTORY))
+
+    def test_references_need_the_rewrite(self):
+        self.assertEqual(unresolved_reference("Is growth in its adjusted EPS expected to accelerate?", HISTORY), "reference: its")
+        self.assertEqual(unresolved_reference("What was Pfizer's revenue in that period?", HISTORY), "period reference")
+        self.assertEqual(unresolved_reference("And for Pfizer?", HISTORY), "follow-up")
+        # A company name next to a reference word does not resolve it
+        self.assertEqual(unresolved_reference("How does it compare to Pfizer?", HISTORY), "reference: it")
+        self.assertEqual(unresolved_reference("Compare their margin with Microsoft", HISTORY), "reference: their")
+        self.assertEqual(unresolved_reference("Is the adjusted EPS growing?", HISTORY), "no company")
+
+    def test_parse_rewrite(self):
+        self.assertEqual(parse_rewrite('{"rew_question": "Is JNJ growing?"}'), "Is JNJ growing?")
+        self.assertEqual(parse_rewrite('```json\n{"rew_question": "Is JNJ growing?"}\n```'), "Is JNJ growing?")
+        self.assertEqual(parse_rewrite('"Is JNJ growing?"'), "Is JNJ growing?")
+        self.assertIsNone(parse_rewrite(""))
+
+
+class TestRewriteStage(unittest.TestCase):
+    def setUp(self):
+        self.searched = []
+        self.cancelled = []
+
+    def make_stage(self, rewritten, rewrite_delay=0.05, fail=False):
+        async def retrieve(ask):
+            self.searched.append(ask)
+            try:
+                await asyncio.sleep(0.02)
+            except asyncio.CancelledError:
+                self.cancelled.append(ask)
+                raise
+            return [f"documents for {ask}"]
+
+        async def rewrite(ask, chat_history):
+            await asyncio.sleep(rewrite_delay)
+            if fail:
+                raise RuntimeError("throttled")
+            return '{"rew_question": "%s"}' % rewritten
+
+        return RewriteStage(retrieve, rewrite)
+
+    def test_skips_the_rewrite(self):
+        stage = self.make_stage("unused")
+        result = asyncio.run(stage.run("Did Pfizer's margin improve in FY2022?", HISTORY))
+        self.assertEqual((result["decision"], result["ask"]), ("skipped", "Did Pfizer's margin improve in FY2022?"))
+        self.assertEqual(stage.stats["skipped"], 1)
+
+    def test_rewritten_ask_replaces_the_speculative_search(self):
+        ask = "Is growth in its adjusted EPS expected to accelerate?"
+        rewritten = "Is growth in Johnson & Johnson's adjusted EPS expected to accelerate in FY2023?"
+        stage = self.make_stage(rewritten, rewrite_delay=0.01)
+        result = asyncio.run(stage.run(ask, HISTORY))
+        self.assertEqual(result["decision"], "rewritten")
+        self.assertEqual(result["retrieval"], [f"documents for {rewritten}"])
+        self.assertEqual(self.searched, [ask, rewritten])
+        self.assertEqual(self.cancelled, [ask])
+
+    def test_comparative_ask_keeps_the_reference(self):
+        ask = "How does it compare to Pfizer?"
+        rewritten = "How does Johnson & Johnson's adjusted EPS growth compare to Pfizer?"
+        stage = self.make_stage(rewritten, rewrite_delay=0.01)
+        result = asyncio.run(stage.run(ask, HISTORY))
+        self.assertEqual((result["decision"], result["ask"]), ("rewritten", rewritten))
+
+    def test_speculative_search_is_kept(self):
+        ask = "Is growth in its adjusted EPS expected to accelerate?"
+        for stage in (self.make_stage("Is growth in its adjusted EPS expected to accelerate"), self.make_stage("", fail=True)):
+            result = asyncio.run(stage.run(ask, HISTORY))
+            self.assertEqual((result["decision"], result["retrieval"]), ("speculative", [f"documents for {ask}"]))
+        self.assertEqual(self.searched, [ask, ask])
+        self.assertEqual(stage.stats["rewrite_errors"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
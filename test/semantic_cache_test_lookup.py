@@ -0,0 +1,205 @@
+import unittest
+import sys
+import os
+import asyncio
+import time
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+import plugins.AISearch.answer as answer_module
+from plugins.AISearch.semantic_cache import SemanticCache, scope_from_entities, scope_has_ticker
+
+MMM_2021 = scope_from_entities({"ticker": ["MMM"], "country": None, "dates": ["2021-01-01", "2021-12-31"]})
+PFE_2021 = scope_from_entities({"ticker": ["PFE"], "country": None, "dates": ["2021-01-01", "2021-12-31"]})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2, clock=self.clock)
+
+    def test_similar_ask_hits(self):
+        self.cache.put(MMM_2021, "What was 3M revenue in 2021?", [1.0, 0.0, 0.1], {"answer": "35 B"})
+        hit = self.cache.get(MMM_2021, [0.98, 0.05, 0.1])
+        self.assertEqual(hit["answer"], "35 B")
+        self.assertGreater(hit["similarity"], 0.9)
+        self.assertIsNone(self.cache.get(MMM_2021, [0.0, 1.0, 0.0]))
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_scopes_never_collide(self):
+        self.cache.put(MMM_2021, "What was the revenue in 2021?", [1.0, 0.0], {"answer": "3M"})
+        self.assertIsNone(self.cache.get(PFE_2021, [1.0, 0.0]))
+        self.assertIsNone(self.cache.get_exact(PFE_2021, "What was the revenue in 2021?"))
+
+    def test_unscoped_asks_only_match_exactly(self):
+        unscoped = scope_from_entities({"ticker": None, "country": None, "dates": ["2020-01-01", "2020-12-31"]})
+        self.assertFalse(scope_has_ticker(unscoped))
+        self.assertFalse(scope_has_ticker(scope_from_entities("Error occurred while extracting entities")))
+        self.assertTrue(scope_has_ticker(MMM_2021))
+        self.cache.put(unscoped, "what is apple revenue in 2020", [1.0, 0.0], {"answer": "apple"})
+        self.assertIsNone(self.cache.get(unscoped, [1.0, 0.0]))
+        self.assertEqual(self.cache.get_exact(unscoped, "What is apple revenue in 2020?")["answer"], "apple")
+
+    def test_exact_ask_needs_no_vector(self):
+        self.cache.put(MMM_2021, "What was 3M revenue in 2021?", [1.0, 0.0], {"answer": "35 B"})
+        self.assertEqual(self.cache.get_exact(MMM_2021, "what was 3m revenue in 2021")["answer"], "35 B")
+
+    def test_ttl_expiry(self):
+        self.cache.put(MMM_2021, "a", [1.0, 0.0], {"answer": "old"})
+        self.clock.now = 61
+        self.assertIsNone(self.cache.get(MMM_2021, [1.0, 0.0]))
+        self.assertEqual(self.cache.stats["expirations"], 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.put(MMM_2021, "a", [1.0, 0.0], {"answer": "a"})
+        self.cache.put(PFE_2021, "b", [1.0, 0.0], {"answer": "b"})
+        self.cache.get(MMM_2021, [1.0, 0.0])
+        self.cache.put(PFE_2021, "c", [0.0, 1.0], {"answer": "c"})
+        self.assertIsNone(self.cache.get_exact(PFE_2021, "b"))
+        self.assertEqual(self.cache.get(MMM_2021, [1.0, 0.0])["answer"], "a")
+        self.assertEqual(self.cache.stats["evictions"], 1)
+
+
+class FakeVSearch:
+    def __init__(self):
+        self.retrievals = 0
+        self.tickers = ["MMM"]
+
+    async def extract_entities(self, context):
+        return {"ticker": self.tickers, "country": None, "dates": ["2021-01-01", "2021-12-31"]}
+
+    async def generate_embeddings(self, text):
+        return [1.0, 0.0] if "revenue" in text else [0.0, 1.0]
+
+    async def retrieve(self, ask, entities=None, vector=None):
+        self.retrievals += 1
+        return {"documents": [{"filter": None, "retrieved_info": [{"id": "1", "filename": "3M_2021_10K.pdf", "referenced_entity": "MMM"}]}], "filters": None, "timings": {}}
+
+    def format_search_results(self, documents, metadata_filters=None, score_include=False):
+        return "docs"
+
+
+class SlowVSearch(FakeVSearch):
+    """Extraction takes DELAY seconds and embedding embedding_delay; records which calls have finished."""
+    DELAY = 0.2
+
+    def __init__(self, embedding_delay=DELAY):
+        super().__init__()
+        self.embedding_delay = embedding_delay
+        self.finished = []
+
+    async def extract_entities(self, context):
+        await asyncio.sleep(self.DELAY)
+        self.finished.append("entities")
+        return await super().extract_entities(context)
+
+    async def generate_embeddings(self, text):
+        await asyncio.sleep(self.embedding_delay)
+        self.finished.append("embedding")
+        return await super().generate_embeddings(text)
+
+
+class TestAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.vsearch = FakeVSearch()
+        self.generations = []
+        self.cache = SemanticCache(threshold=0.9)
+        self.originals = (answer_module.get_vsearch, answer_module.get_semantic_cache, answer_module.generate_answer, answer_module.stream_generate_answer)
+
+        async def generate_answer(ask, context):
+            self.generations.append(ask)
+            return "35 B"
+
+        async def stream_generate_answer(ask, context):
+            self.generations.append(ask)
+            for chunk in ["35", " B"]:
+                yield chunk
+
+        answer_module.get_vsearch = lambda: self.vsearch
+        answer_module.get_semantic_cache = lambda: self.cache
+        answer_module.generate_answer = generate_answer
+        answer_module.stream_generate_answer = stream_generate_answer
+
+    def tearDown(self):
+        (answer_module.get_vsearch, answer_module.get_semantic_cache,
+         answer_module.generate_answer, answer_module.stream_generate_answer) = self.originals
+
+    def collect_stream(self, ask):
+        async def run():
+            return [event async for event in answer_module.stream_answer(ask)]
+        return asyncio.run(run())
+
+    def test_paraphrase_skips_search_and_generation(self):
+        first = asyncio.run(answer_module.answer("What was 3M revenue in 2021?"))
+        second = asyncio.run(answer_module.answer("3M revenue for 2021, please"))
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["answer"], "35 B")
+        self.assertEqual(self.vsearch.retrievals, 1)
+        self.assertEqual(len(self.generations), 1)
+
+    def test_dissimilar_ask_misses(self):
+        asyncio.run(answer_module.answer("What was 3M revenue in 2021?"))
+        result = asyncio.run(answer_module.answer("Who is the CEO of 3M in 2021?"))
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.vsearch.retrievals, 2)
+
+    def test_unscoped_companies_never_share_an_answer(self):
+        # Lower-case names the extractor does not resolve to a ticker; the embeddings are as close as ada-002's
+        self.vsearch.tickers = None
+        asyncio.run(answer_module.answer("what is apple revenue in 2021"))
+        result = asyncio.run(answer_module.answer("what is microsoft revenue in 2021"))
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.vsearch.retrievals, 2)
+        self.assertTrue(asyncio.run(answer_module.answer("What is apple revenue in 2021?"))["cached"])
+
+    def test_stream_emits_citations_first(self):
+        events = self.collect_stream("What was 3M revenue in 2021?")
+        self.assertEqual([event["type"] for event in events], ["citations", "token", "token", "done"])
+        self.assertEqual(events[0]["citations"], [{"filename": "3M_2021_10K.pdf", "referenced_entity": "MMM"}])
+        self.assertEqual(events[-1]["answer"], "35 B")
+        self.assertIn("first_token", events[-1]["timings"])
+
+    def test_stream_replays_cached_answer(self):
+        self.collect_stream("What was 3M revenue in 2021?")
+        events = self.collect_stream("3M revenue for 2021, please")
+        self.assertTrue(events[0]["cached"])
+        self.assertEqual(events[-1]["answer"], "35 B")
+        self.assertEqual(self.vsearch.retrievals, 1)
+
+    def test_embedding_overlaps_entity_extraction(self):
+        self.vsearch = SlowVSearch()
+        started_at = time.perf_counter()
+        asyncio.run(answer_module.retrieve_or_hit("What was 3M revenue in 2021?"))
+        self.assertLess(time.perf_counter() - started_at, 2 * SlowVSearch.DELAY)
+        self.assertEqual(sorted(self.vsearch.finished), ["embedding", "entities"])
+
+    def test_verbatim_repeat_does_not_wait_for_the_embedding(self):
+        asyncio.run(answer_module.answer("What was 3M revenue in 2021?"))
+        self.vsearch = SlowVSearch(embedding_delay=2 * SlowVSearch.DELAY)
+
+        async def run():
+            state = await answer_module.retrieve_or_hit("What was 3M revenue in 2021?")
+            finished = list(self.vsearch.finished)
+            await asyncio.sleep(self.vsearch.embedding_delay)
+            return state, finished
+
+        state, finished = asyncio.run(run())
+        self.assertEqual(state["hit"]["answer"], "35 B")
+        self.assertIsNone(state["vector"])
+        self.assertNotIn("embedding", finished)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from aiohttp.test_utils import TestClient, TestServer
+from src.server import AnswerServer, create_app, stub_pipeline
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append(lines["event"])
+    return events
+
+
+class TestCleanup(unittest.IsolatedAsyncioTestCase):
+    async def test_pooled_clients_are_closed_on_cleanup(self):
+        from plugins.AISearch.clients import registry
+        app = create_app()
+        client = registry.async_openai(api_key="key", azure_endpoint="https://example.openai.azure.com", api_version="2024-02-01")
+        app.freeze()
+        await app.cleanup()
+        self.assertTrue(client.is_closed())
+
+
+class TestAnswerServer(unittest.IsolatedAsyncioTestCase):
+    async def start(self, answer_fn=None, stream_fn=None, **kwargs):
+        stub_answer, stub_stream_answer = stub_pipeline(0.01)
+        self.server = AnswerServer(answer_fn or stub_answer, stream_fn or stub_stream_answer, **kwargs)
+        self.client = TestClient(TestServer(self.server.app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_answer_and_health(self):
+        await self.start()
+        response = await self.client.post("/answer", json={"ask": "Revenue of 3M in 2018?"})
+        self.assertEqual(response.status, 200)
+        self.assertEqual((await response.json())["answer"], "Stub answer to: Revenue of 3M in 2018?")
+        self.assertEqual((await (await self.client.get("/healthz")).json())["status"], "ok")
+
+        metrics = await (await self.client.get("/metrics")).json()
+        self.assertEqual(metrics["ok"], 1)
+        self.assertIn("p95", metrics["latency_ms"])
+
+    async def test_bad_request(self):
+        await self.start()
+        response = await self.client.post("/answer", data="not json")
+        self.assertEqual(response.status, 400)
+        response = await self.client.post("/answer", json={"ask": "  "})
+        self.assertEqual(response.status, 400)
+
+    async def test_stream_events(self):
+        await self.start()
+        response = await self.client.post("/answer/stream", json={"ask": "Revenue of 3M?"})
+        self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+        events = parse_sse(await response.text())
+        self.assertEqual(events[0], "citations")
+        self.assertEqual(events[-1], "done")
+        self.assertIn("token", events)
+        metrics = await (await self.client.get("/metrics")).json()
+        self.assertIn("p50", metrics["first_token_ms"])
+
+    async def test_queue_full_is_rejected(self):
+        release = asyncio.Event()
+
+        async def slow_answer(**kwargs):
+            await release.wait()
+            return {"answer": "ok"}
+
+        await self.start(answer_fn=slow_answer, max_concurrency=1, max_queue=1)
+        requests = [asyncio.create_task(self.client.post("/answer", json={"ask": f"ask {i}"})) for i in range(3)]
+        while self.server.admission.in_flight + self.server.admission.waiting < 2 or self.server.metrics.counters["requests"] < 3:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        release.set()
+        statuses = sorted([(await request).status for request in requests])
+        self.assertEqual(statuses, [200, 200, 503])
+        self.assertEqual(self.server.metrics.counters["rejected"], 1)
+
+    async def test_timeout(self):
+        async def hanging_answer(**kwargs):
+            await asyncio.sleep(10)
+
+        await self.start(answer_fn=hanging_answer, timeout=0.05)
+        response = await self.client.post("/answer", json={"ask": "Revenue?"})
+        self.assertEqual(response.status, 504)
+        self.assertEqual(self.server.admission.in_flight, 0)
+
+    async def test_stream_timeout_ends_with_error_event(self):
+        async def hanging_stream(**kwargs):
+            yield {"type": "citations", "citations": []}
+            await asyncio.sleep(10)
+
+        await self.start(stream_fn=hanging_stream, timeout=0.05)
+        response = await self.client.post("/answer/stream", json={"ask": "Revenue?"})
+        self.assertEqual(parse_sse(await response.text()), ["citations", "error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
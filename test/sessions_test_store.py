@@ -0,0 +1,216 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from plugins.history import ConversationHistory
+from plugins.sessions import ChatSession, MemorySessionStore, RedisSessionStore, SessionStore, SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """
+    The subset of redis.Redis used by RedisSessionStore, with key expiry on a fake clock.
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}
+
+    def get(self, name):
+        value, expires_at = self.values.get(name, (None, None))
+        if expires_at is not None and expires_at <= self.clock():
+            del self.values[name]
+            return None
+        return value
+
+    def set(self, name, value, ex=None):
+        self.values[name] = (value.encode("utf-8"), self.clock() + ex if ex else None)
+
+    def delete(self, name):
+        self.values.pop(name, None)
+
+    def transaction(self, func, *watches):
+        func(self)
+
+    def multi(self):
+        pass
+
+
+async def summarize(summary, chat_history):
+    return (summary + " " + chat_history.replace("\n", " ")).strip()
+
+
+async def fail_to_summarize(summary, chat_history):
+    raise RuntimeError("throttled")
+
+
+def gated(gate):
+    async def summarize_after_gate(summary, chat_history):
+        await gate.wait()
+        return await summarize(summary, chat_history)
+    return summarize_after_gate
+
+
+class StoreContract:
+    """
+    Behaviour shared by every SessionStore; subclasses set self.store and self.clock.
+    """
+    def test_put_get_delete(self):
+        self.store.put("alice", {"history": {"summary": "s"}})
+        self.assertEqual(self.store.get("alice"), {"history": {"summary": "s"}})
+        self.assertIsNone(self.store.get("bob"))
+        self.store.delete("alice")
+        self.assertIsNone(self.store.get("alice"))
+
+    def test_states_are_copies(self):
+        state = {"retrievals": {}}
+        self.store.put("alice", state)
+        state["retrievals"]["x"] = 1
+        self.assertEqual(self.store.get("alice"), {"retrievals": {}})
+
+    def test_ttl_eviction(self):
+        self.store.put("alice", {"n": 1})
+        self.clock.now += 50
+        self.store.put("bob", {"n": 2})
+        self.clock.now += 60
+        self.assertIsNone(self.store.get("alice"))
+        self.assertEqual(self.store.get("bob"), {"n": 2})
+
+    def test_session_resumes_on_another_worker(self):
+        async def first_worker():
+            session = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=summarize))
+            session.history.add_turn("Revenue of 3M in 2018?", "32.8 billion")
+            session.history.add_turn("And in 2019?", "32.1 billion")
+            session.cache_retrieval("And in 2019?", {"documents": ["3M_2019_10K"]})
+            session.save()
+            await session.history.flush()
+
+        asyncio.run(first_worker())
+        # A new process: nothing in memory but the store
+        session = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=summarize))
+        self.assertIn("32.8 billion", session.history.summary)
+        self.assertEqual(session.history.turns, [("And in 2019?", "32.1 billion")])
+        self.assertEqual(session.cached_retrieval("and in 2019"), {"documents": ["3M_2019_10K"]})
+        self.assertIsNone(ChatSession.load(self.store, "bob").cached_retrieval("And in 2019?"))
+
+    def test_late_summary_keeps_newer_turns(self):
+        async def run():
+            gate = asyncio.Event()
+            first = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=gated(gate)))
+            first.history.add_turn("Revenue of 3M in 2018?", "32.8 billion")
+            first.history.add_turn("And in 2019?", "32.1 billion")
+            first.save()
+
+            # Another worker serves the next turn while the first one is still summarizing
+            second = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=fail_to_summarize))
+            second.history.add_turn("And in 2020?", "32.2 billion")
+            second.save()
+            await second.history.flush()
+
+            gate.set()
+            await first.history.flush()
+
+        asyncio.run(run())
+        history = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1)).history
+        # The first worker also folded the turn it merged in as pending
+        self.assertEqual((history.summary.count("32.8 billion"), history.summary.count("32.1 billion")), (1, 1))
+        self.assertEqual((history.pending, history.turns), ([], [("And in 2020?", "32.2 billion")]))
+        self.assertEqual(history.turn_count, 3)
+
+    def test_stale_summary_is_not_saved(self):
+        async def run():
+            gate = asyncio.Event()
+            first = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=gated(gate)))
+            first.history.add_turn("Revenue of 3M in 2018?", "32.8 billion")
+            first.history.add_turn("And in 2019?", "32.1 billion")
+            first.save()
+
+            # The next worker folds the same pending turn and one more
+            second = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1, summarize=summarize))
+            second.history.add_turn("And in 2020?", "32.2 billion")
+            second.save()
+            await second.history.flush()
+
+            gate.set()
+            await first.history.flush()
+
+        asyncio.run(run())
+        history = ChatSession.load(self.store, "alice", ConversationHistory(keep_turns=1)).history
+        self.assertEqual(history.summary.count("32.8 billion"), 1)
+        self.assertIn("32.1 billion", history.summary)
+        self.assertEqual((history.pending, history.turns), ([], [("And in 2020?", "32.2 billion")]))
+
+
+class TestMemorySessionStore(StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.store = MemorySessionStore(ttl=100, clock=self.clock)
+
+    def test_expired_sessions_are_dropped_on_write(self):
+        self.store.put("alice", {})
+        self.clock.now += 200
+        self.store.put("bob", {})
+        self.assertEqual(len(self.store), 1)
+
+    def test_zero_ttl_put(self):
+        store = MemorySessionStore(ttl=0, clock=self.clock)
+        store.put("alice", {"turns": 1})
+        self.assertEqual(len(store), 0)
+        self.assertIsNone(store.get("alice"))
+
+
+class TestSQLiteSessionStore(StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        self.path = os.path.join(self.directory.name, "sessions.sqlite")
+        self.store = SQLiteSessionStore(self.path, ttl=100, clock=self.clock)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_shared_between_connections(self):
+        self.store.put("alice", {"n": 1})
+        other = SQLiteSessionStore(self.path, ttl=100, clock=self.clock)
+        self.assertEqual(other.get("alice"), {"n": 1})
+        self.clock.now += 200
+        self.assertEqual(other.evict_expired(), 1)
+        other.close()
+
+
+class TestRedisSessionStore(StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.store = RedisSessionStore(FakeRedis(self.clock), ttl=100)
+
+    def test_keys_are_prefixed(self):
+        self.store.put("alice", {})
+        self.assertEqual(list(self.store.client.values), ["session:alice"])
+
+
+class TestSessionStoreInterface(unittest.TestCase):
+    def test_stores_must_implement_the_interface(self):
+        class GetOnly(SessionStore):
+            def get(self, session_id):
+                return None
+
+        with self.assertRaises(TypeError):
+            SessionStore()
+        with self.assertRaises(TypeError):
+            GetOnly()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -63,6 +63,25 @@ class TestVSearch(unittest.TestCase):
         json_object = {"ticker": None, "location": None, "dates": None}
         self.assertIsNone(self.vsearch.build_query_filter(json_object))    
 
+    def test_compact_filter_covers_all_tickers_and_years(self):
+        json_object = {"ticker": ["aapl", "MSFT"], "location": ["USA", "CAN"], "dates": ["2015-01-01", "2017-12-31"]}
+        expected = (
+            "search.in(referenced_entity, 'AAPL,MSFT', ',') and search.in(referenced_location, 'USA,CAN', ',')"
+            " and search.in(referenced_year, '2015,2016,2017', ',')"
+        )
+        self.assertEqual(self.vsearch.build_compact_filter(json_object, locations=True), expected)
+
+    def test_compact_filter_single_values(self):
+        json_object = {"ticker": ["AAPL"], "country": ["US"], "dates": ["2021-01-01", "2021-12-31"]}
+        expected = "referenced_entity eq 'AAPL' and referenced_location eq 'US' and referenced_year eq '2021'"
+        self.assertEqual(self.vsearch.build_compact_filter(json_object, locations=True), expected)
+        self.assertIsNone(self.vsearch.build_compact_filter({"ticker": [], "location": None, "dates": None}))
+
+    def test_compact_filter_leaves_out_locations_by_default(self):
+        json_object = {"ticker": ["ADBE"], "country": ["IT"], "dates": ["2021-01-01", "2021-12-31"]}
+        self.assertEqual(self.vsearch.build_compact_filter(json_object), "referenced_entity eq 'ADBE' and referenced_year eq '2021'")
+        self.assertIsNone(self.vsearch.build_compact_filter({"ticker": None, "country": ["IT"], "dates": None}))
+
     def test_exception_handling(self):
         json_object = "Not a JSON object"
         with self.assertRaises(TypeError):
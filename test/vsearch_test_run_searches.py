@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+root_dir = os.getenv("ROOT")
+sys.path.insert(0, root_dir)
+from azure.search.documents.models import VectorizedQuery
+from plugins.AISearch.vsearch import VSearch
+
+
+class FakeSearchClient:
+    """Blocking stand-in for SearchClient: every search takes `delay` seconds."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+
+    def search(self, search_text, vector_queries, select, top, filter=None, vector_filter_mode=None):
+        time.sleep(self.delay)
+        if filter and "FAIL" in filter:
+            raise RuntimeError("index unavailable")
+        return iter([{"id": f"{filter}-1", "document": search_text}])
+
+
+class TestVSearchRunSearches(unittest.TestCase):
+    def setUp(self):
+        self.vsearch = VSearch()
+
+    def test_filters_run_concurrently_in_order(self):
+        filters = [f"referenced_entity eq '{t}'" for t in ["MMM", "PFE", "JNJ", "ABT"]]
+        start = time.perf_counter()
+        documents = asyncio.run(self.vsearch.run_searches(FakeSearchClient(), "revenue", None, filters))
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([d["filter"] for d in documents], filters)
+        self.assertEqual([d["retrieved_info"][0]["id"] for d in documents], [f"{f}-1" for f in filters])
+
+    def test_no_filters_runs_one_search(self):
+        documents = asyncio.run(self.vsearch.run_searches(FakeSearchClient(delay=0), "revenue", None, None))
+        self.assertEqual(len(documents), 1)
+        self.assertIsNone(documents[0]["filter"])
+
+    def test_failed_filter_is_reported(self):
+        filters = ["referenced_entity eq 'MMM'", "referenced_entity eq 'FAIL'"]
+        documents = asyncio.run(self.vsearch.run_searches(FakeSearchClient(delay=0), "revenue", None, filters))
+        self.assertEqual(len(documents[0]["retrieved_info"]), 1)
+        self.assertEqual(documents[1]["retrieved_info"], [])
+        self.assertIn("index unavailable", documents[1]["error"])
+        formatted = self.vsearch.format_search_results(documents, filters)
+        self.assertIn("Search failed for filter referenced_entity eq 'FAIL'", formatted)
+
+
+class PagedSearchClient:
+    """Returns `documents` (filtered by ticker for single-ticker filters) and records every request."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+
+    def search(self, search_text, vector_queries, select, top, filter=None, vector_filter_mode=None):
+        self.requests.append({"filter": filter, "top": top, "k": vector_queries[0].k_nearest_neighbors})
+        if filter and "FAIL" in filter:
+            raise RuntimeError("index unavailable")
+        documents = self.documents
+        if filter and filter.startswith("referenced_entity eq"):
+            documents = [d for d in documents if f"'{d['referenced_entity']}'" in filter]
+        return iter(documents[:top])
+
+
+class TestVSearchGroupedSearch(unittest.TestCase):
+    def setUp(self):
+        self.vsearch = VSearch()
+        self.vector_query = VectorizedQuery(vector=[0.1, 0.2], k_nearest_neighbors=5, fields="embedding")
+        self.entities = {"ticker": ["MMM", "PFE"], "dates": ["2015-01-01", "2017-12-31"]}
+
+    def run_grouped(self, client, entities=None):
+        return asyncio.run(self.vsearch.run_grouped_search(client, "revenue", self.vector_query, entities or self.entities))
+
+    def test_one_request_split_per_ticker(self):
+        rows = [{"id": str(i), "referenced_entity": ticker} for i, ticker in enumerate(["MMM", "PFE", "MMM", "PFE", "PFE", "MMM"])]
+        client = PagedSearchClient(rows)
+        documents = self.run_grouped(client)
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(client.requests[0]["top"], 6)
+        self.assertIn("search.in(referenced_year, '2015,2016,2017', ',')", client.requests[0]["filter"])
+        self.assertEqual([[r["id"] for r in d["retrieved_info"]] for d in documents], [["0", "2", "5"], ["1", "3", "4"]])
+        self.assertEqual(documents[1]["filter"], "referenced_entity eq 'PFE' and search.in(referenced_year, '2015,2016,2017', ',')")
+
+    def test_crowded_out_ticker_is_searched_again(self):
+        rows = [{"id": str(i), "referenced_entity": "MMM"} for i in range(6)] + [{"id": "p", "referenced_entity": "PFE"}]
+        client = PagedSearchClient(rows)
+        documents = self.run_grouped(client)
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual([r["id"] for r in documents[1]["retrieved_info"]], ["p"])
+
+    def test_small_page_is_not_retried(self):
+        client = PagedSearchClient([{"id": "m", "referenced_entity": "MMM"}])
+        documents = self.run_grouped(client)
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(documents[1]["retrieved_info"], [])
+
+    def test_failed_request_falls_back_per_ticker(self):
+        client = PagedSearchClient([{"id": "m", "referenced_entity": "MMM"}])
+        documents = self.run_grouped(client, {"ticker": ["FAIL"], "dates": ["2021-01-01", "2021-12-31"]})
+        self.assertEqual(len(client.requests), 2)
+        self.assertIn("index unavailable", documents[0]["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()